@@ -0,0 +1,184 @@
+"""
+The json parsers of mon/sacct.py before cbj_smon.jobs, unchanged, i.e. the
+baseline of bench_slurm_json.py: The whole output is buffered, decoded with
+json.loads, slurm_nums_to_python rebuilds the whole document and the
+parsers access the dicts.
+"""
+import json
+
+
+def slurm_nums_to_python(obj):
+    """
+    >>> slurm_nums_to_python({"set": True, "infinite": False, "number": 1720527843})
+    1720527843
+    >>> print(slurm_nums_to_python({"set": False, "infinite": False, "number": 0}))
+    None
+    """
+    if isinstance(obj, dict):
+        if obj.keys() == {'set', 'infinite', 'number'}:
+            if obj['set']:
+                assert not obj['infinite'], obj
+                return obj['number']
+            else:
+                return None
+        else:
+            return {k: slurm_nums_to_python(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [slurm_nums_to_python(v) for v in obj]
+    else:
+        return obj
+
+
+def parse_sacct_stdout(sacct_stdout, now):
+    sacct_out = slurm_nums_to_python(json.loads(sacct_stdout))
+
+    id_to_submit_time = {}
+    table: 'dict[dict]' = {}
+    for job in sacct_out['jobs']:
+        allocated = {r['type']: r['count'] for r in job['tres']['allocated']}
+        requested = {r['type']: r['count'] for r in job['tres']['requested']}
+        tres = allocated if allocated else requested
+
+        if job['required']['memory_per_node'] is not None:
+            mem = job['required']['memory_per_node'] * job['allocation_nodes']
+        elif job['required']['memory_per_cpu'] is not None:
+            mem = job['required']['memory_per_cpu'] * job['required']['CPUs']
+        else:
+            raise ValueError(f'No memory information found for job {job["job_id"]} by sacct')
+
+        id_to_submit_time[job['job_id']] = job['time']['submission']
+
+        state = ','.join(job['state']['current'])
+
+        if job['kill_request_user']:
+            if state == 'CANCELLED':
+                state += f' by {job["kill_request_user"]}'
+            else:
+                state += f' (Killed by {job["kill_request_user"]})'
+
+        if job['state']['reason'] != 'None':
+            state += f' ({job["state"]["reason"]})'
+
+        tasks = max([s['tasks']['count'] for s in job['steps']], default='-')
+
+        billing = tres.get('billing', '?')
+
+        elapsed = job['time']['elapsed']
+
+        if elapsed == 0 and job['time']['start'] < now:
+            elapsed = job['time']['end'] - job['time']['start']
+
+        billing = (billing * elapsed / 3600, billing)
+
+        table[job['job_id']] = {
+            'User': job['association']['user'],
+            'JobID': job['job_id'],
+            'Name': job['name'],
+            'State': state,
+            'Elapsed': (elapsed, job['time']['limit'] * 60),
+            'Submit': job['time']['submission'],
+            'Start': job['time']['start'],
+            'End': job['time']['end'],
+            'n': tasks,
+            'cpu': job['required']['CPUs'],
+            'gpu': tres.get('gres', 0),
+            'mem': mem,
+            'N': job['allocation_nodes'],
+            'Partition': job['partition'],
+            'billing': billing,
+            'Acc': job['association']['account'].removeprefix('hpc-prf-'),
+            'QoS': job['qos'],
+            'Nodes': job['nodes'],
+            'Priority': job['priority'],
+            'Tool': 'sacct',
+        }
+    return table, id_to_submit_time, sacct_out['jobs']
+
+
+def _get_gpu(job):
+    """
+    >>> job = {
+    ...     'gres_detail': ["gpu:a40:1(IDX:1)"],
+    ...     "tres_per_node": "gres/gpu:a40:1",
+    ...     'tres_req_str': "cpu=2,mem=20G,node=1,billing=4,gres/gpu=1,gres/gpu:a40=1"
+    ... }
+    >>> _get_gpu(job)
+    'a40:1'
+    >>> job['gres_detail'] = []
+    >>> _get_gpu({'gres_detail': None, 'tres_req_str': "cpu=2,mem=20G,node=1,billing=4,gres/gpu=1,gres/gpu:a40=1",})
+    '1'
+    """
+    if job['gres_detail']:
+        # Running job
+        gpus = ','.join([
+            d.removeprefix('gpu:').removesuffix('(IDX:0)').removesuffix('(IDX:1)').removesuffix('(IDX:2)').removesuffix('(IDX:3)')
+            for d in job['gres_detail']
+        ])
+    elif 'gres/gpu=' in job['tres_req_str']:
+        # Pending gpu job
+        gpus = job['tres_req_str'].split(r'gres/gpu=')[-1].split(',')[0]
+    else:
+        # Pending cpu job
+        gpus = '0'
+    return gpus
+
+
+def parse_squeue_stdout(squeue_stdout, now):
+    squeue_out = slurm_nums_to_python(json.loads(squeue_stdout))
+    id_to_submit_time = {}
+    table: 'dict[dict]' = {}
+    for job in squeue_out['jobs']:
+        # calculated elapsed from difference between now and start (time_limit is the total time limit, not the remaining time limit)
+        if job['start_time'] == 0:
+            elapsed = 0
+        else:
+            elapsed = max(0, now - job['start_time'])
+        time_limit = job['time_limit'] * 60
+
+        # sum from job resources
+        if job['job_resources'] and 'allocated_nodes' in job['job_resources']:
+            mem = sum(node['memory_allocated'] for node in job['job_resources']['allocated_nodes'])
+        elif job['memory_per_node'] is not None:
+            mem = job['memory_per_node'] * job['node_count']
+        elif job['memory_per_cpu'] is not None:
+            mem = job['memory_per_cpu'] * job['cpus']
+        else:
+            raise ValueError(f'No memory information found for job {job["job_id"]}')
+
+        state = ','.join(job['job_state'])
+        if job['state_reason'] != 'None':
+            state += f' ({job["state_reason"]})'
+        if job['state_description']:
+            state += f' ({job["state_description"]})'
+        # Add info from dependency field?
+        # e.g. "dependency": "afternotok:5516697(unfulfilled)",
+
+        billing = job['billable_tres']
+        if billing is not None:
+            billing = (billing * elapsed / 3600, billing)
+
+        id_to_submit_time[job['job_id']] = job['submit_time']
+
+        table[job['job_id']] = {
+            'User': job['user_name'],
+            'JobID': job['job_id'],
+            'Name': job['name'],
+            'State': state,
+            'Elapsed': (elapsed, time_limit),
+            'Submit': (job['submit_time']),
+            'Start': (job['start_time']),
+            'End': (job['end_time']),
+            'n': job['tasks'],
+            'cpu': job['cpus'],
+            'gpu': _get_gpu(job),
+            'mem': (mem),
+            'billing': billing,
+            'N': job['node_count'],
+            'Partition': job['partition'],
+            'Acc': job['account'].removeprefix('hpc-prf-'),
+            'QoS': job['qos'],
+            'Nodes': job['nodes'],
+            'Priority': job['priority'],
+            'Tool': 'squeue',
+        }
+    return table, id_to_submit_time, squeue_out['jobs']
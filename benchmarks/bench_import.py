@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+"""
+Import time of the scripts in mon (python -X importtime), i.e. the part of
+the start, that each refresh of vatch.py without --py pays again.
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --budget 30 --top 10 --modes sacct sacct-restd
+
+The scripts run against a small synthetic cluster (fake_slurm), hence the
+imports on demand of each mode are included. The import time of a mode is
+the sum of the self times of all imports minus that of a bare interpreter
+(site, encodings, ...) right before it, the minimum of --repeat such pairs,
+i.e. a load of the machine affects both. The exit code is 1, when a mode
+exceeds the budget.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCHMARKS = Path(__file__).resolve().parent
+MON = BENCHMARKS.parent / 'mon'
+FAKE = BENCHMARKS / 'fake_slurm'
+
+# mode -> command line, budget in ms (None: --budget)
+MODES = {
+    'sacct-help': ('sacct.py --help', None),
+    'sacct': ('sacct.py --no-cache now-2hours', None),
+    'sacct-cached': ('sacct.py now-2hours', None),
+    'sacct-columns': ('sacct.py --no-cache --columns User,JobID,State now-2hours', None),
+    'sacct-parsable': ('sacct.py --no-cache --backend parsable now-2hours', None),
+    # http.client imports ssl and email.
+    'sacct-restd': ('sacct.py --no-cache --backend restd now-2hours', 70),
+    'sacct-arrays': ('sacct.py --no-cache --collapse-arrays now-2hours', None),
+    'sjobwait': ('sjobwait.py --help', None),
+    'soverview': ('soverview.py', None),
+}
+
+
+def import_times(argv, env):
+    """module -> self import time in us of one run with -X importtime."""
+    p = subprocess.run(
+        [sys.executable, '-X', 'importtime', *argv], cwd=MON, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True,
+    )
+    if p.returncode:
+        raise RuntimeError(f'{argv} failed ({p.returncode}):\n{p.stderr}')
+    times = {}
+    for line in p.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if line.startswith('import time:') and '[us]' not in line:
+            self_us, _, module = line.removeprefix('import time:').split('|')
+            times[module.strip()] = int(self_us)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--modes', nargs='+', default=list(MODES), choices=list(MODES))
+    parser.add_argument(
+        '--budget', type=float, default=40,
+        help='ms per mode, unless MODES has another budget. Default: 40')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=5, help='Show the slowest imports of each mode.')
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory(prefix='fake_slurm_')
+    env = {
+        **os.environ,
+        'PATH': f'{FAKE / "bin"}{os.pathsep}{os.environ["PATH"]}',
+        'USER': os.environ.get('USER', 'cbj'),
+        'FAKE_SLURM_CACHE': os.path.join(tmp.name, 'cache'),
+        'FAKE_SLURM_WORKDIR': os.path.join(tmp.name, 'work'),
+        'FAKE_SLURM_JOBS': '200',
+        'FAKE_SLURM_NODES': '20',
+        'FAKE_SLURM_NOW': str(int(time.time()) // 3600 * 3600),
+        'XDG_CACHE_HOME': os.path.join(tmp.name, 'xdg'),
+        'CBJ_SMON_SNAPSHOT': '0',
+    }
+    env.pop('CBJ_SMON_TIMINGS', None)
+    # Like a usual installation, the warm up run writes __pycache__.
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+
+    server = None
+    if 'sacct-restd' in args.modes:
+        server = subprocess.Popen(
+            [sys.executable, str(FAKE / 'slurmrestd.py'), '--port', '0'],
+            env=env, stderr=subprocess.PIPE, universal_newlines=True,
+        )
+        env['CBJ_SMON_SLURMRESTD'] = server.stderr.readline().split()[-1]
+
+    over = []
+    try:
+        print(f'{"mode":>15} {"ms":>6} {"modules":>8}  slowest imports (ms)')
+        for mode in args.modes:
+            command, budget = MODES[mode]
+            argv = command.split()
+            budget = args.budget if budget is None else budget
+            import_times(argv, env)  # Warm up, fills the cache of the fake commands and __pycache__.
+            runs = []
+            for _ in range(args.repeat):
+                bare = sum(import_times(['-c', 'pass'], env).values())
+                times = import_times(argv, env)
+                runs.append((sum(times.values()) - bare, times))
+            us, best = min(runs, key=lambda run: run[0])
+            ms = us / 1000
+            slowest = sorted(best.items(), key=lambda item: -item[1])[:args.top]
+            print(f'{mode:>15} {ms:6.1f} {len(best):>8}  '
+                  + ', '.join(f'{m} {t / 1000:.1f}' for m, t in slowest), flush=True)
+            if ms > budget:
+                over.append(mode)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    if over:
+        print(f'Over the budget: {", ".join(over)}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+"""
+Memory of the parsed table of sacct.py (the rows of parse_sacct_job and
+parse_squeue_job) for the jobs of the synthetic cluster in fake_slurm:
+
+ - dict:        A dict per row and a str object per value, i.e. the rows
+                before JobRow (json.loads creates a new str for each value).
+ - dict+intern: A dict per row, the values of JobRow.INTERNED are shared.
+ - JobRow:      The slotted rows with the shared values, i.e. the rows of
+                gather_sacct and gather_squeue.
+
+    python benchmarks/bench_memory.py
+    python benchmarks/bench_memory.py --jobs 100000 --kind sacct squeue
+
+The size is the sum of sys.getsizeof of all objects, that the table
+references (each object once, i.e. shared strings count once), without
+the job ids, that are the keys of any table. The jobs are generated without
+steps (like sacct -X), the steps don't change the rows.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+BENCHMARKS = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCHMARKS.parent / 'mon'))
+sys.path.insert(0, str(BENCHMARKS / 'fake_slurm'))
+
+import cluster  # noqa: E402
+from cbj_smon.jobs.util import compile_fields  # noqa: E402
+from cbj_smon.jobs.rows import JobRow  # noqa: E402
+from cbj_smon.jobs.gather_sacct import parse_sacct_job, SACCT_JOB_FIELDS  # noqa: E402
+from cbj_smon.jobs.gather_squeue import parse_squeue_job, SQUEUE_JOB_FIELDS  # noqa: E402
+
+
+def deep_size(obj, seen):
+    """The size of obj and of all objects, that it references, except seen."""
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_size(k, seen) + deep_size(v, seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(deep_size(v, seen) for v in obj)
+    elif isinstance(obj, JobRow):
+        size += sum(deep_size(v, seen) for v in obj.values())
+    return size
+
+
+def table_size(table):
+    # The keys (column names and job ids) exist anyway.
+    seen = {id(k) for k in table}
+    seen.update(id(k) for k in JobRow.__slots__)
+    return deep_size(table, seen)
+
+
+def unshared(value):
+    """A copy of a str, like json.loads creates it for each value."""
+    if isinstance(value, str) and len(value) > 1:
+        return value.encode().decode()
+    return value
+
+
+def parse_jobs(kind, config):
+    """job_id -> JobRow of the generated jobs, like gather_sacct/gather_squeue."""
+    if kind == 'sacct':
+        project, parse = compile_fields(SACCT_JOB_FIELDS), parse_sacct_job
+        dump = lambda job: job.sacct_json(steps=False)  # noqa: E731
+    else:
+        project, parse = compile_fields(SQUEUE_JOB_FIELDS), parse_squeue_job
+        dump = lambda job: job.squeue_json()  # noqa: E731
+    table = {}
+    for job in cluster.iter_jobs(config):
+        # The round trip creates new str objects, like the output of slurm.
+        job = project(json.loads(json.dumps(dump(job))))
+        table[job['job_id']] = parse(job, config.now)
+    return table
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--jobs', type=int, default=20_000)
+    parser.add_argument('--kind', nargs='+', default=['sacct', 'squeue'], choices=['sacct', 'squeue'])
+    args = parser.parse_args()
+
+    config = cluster.Config({**os.environ, 'FAKE_SLURM_JOBS': str(args.jobs)})
+    print(f'{"":>6} {"rows":>7} {"representation":>15} {"MB":>8} {"B/row":>7}')
+    for kind in args.kind:
+        t = time.perf_counter()
+        rows = parse_jobs(kind, config)
+        seconds = time.perf_counter() - t
+        tables = {
+            'dict': {k: {c: v if c == 'Tool' else unshared(v) for c, v in row.items()}
+                     for k, row in rows.items()},
+            'dict+intern': {k: dict(row.items()) for k, row in rows.items()},
+            'JobRow': rows,
+        }
+        for name, table in tables.items():
+            size = table_size(table)
+            print(f'{kind:>6} {len(table):>7} {name:>15} {size / 1e6:8.1f} {size / max(1, len(table)):7.0f}')
+        print(f'{kind:>6} generated and parsed in {seconds:.1f} s')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python
+"""
+Compare the decoding of a recorded sacct/squeue json dump:
+ - baseline: The parsers of mon/sacct.py before cbj_smon.jobs (see
+        baseline_parsers.py), i.e. the buffered output, json.loads,
+        slurm_nums_to_python and the access of the dicts.
+ - old: The parsers of cbj_smon.jobs after json.loads and
+        slurm_nums_to_python, i.e. only the decoding of the baseline.
+ - new: json.loads, then a compiled projection to the used fields, that
+        converts the slurm numbers only for the kept fields.
+ - stream: iter_json_array on the dump file, i.e. the path of gather_sacct.
+
+Record a dump on the cluster with e.g.
+    sacct --json -S now-7days --allusers > sacct.json
+    squeue --json > squeue.json
+and run
+    python benchmarks/bench_slurm_json.py sacct.json
+    python benchmarks/bench_slurm_json.py squeue.json squeue
+"""
+import json
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'mon'))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import baseline_parsers  # noqa: E402
+
+from cbj_smon.jobs.util import slurm_nums_to_python, compile_fields, iter_json_array  # noqa: E402
+from cbj_smon.jobs.gather_sacct import parse_sacct_job, SACCT_JOB_FIELDS  # noqa: E402
+from cbj_smon.jobs.gather_squeue import parse_squeue_job, SQUEUE_JOB_FIELDS  # noqa: E402
+
+
+def baseline(path, now, kind):
+    # Like subprocess.run, the whole output is in memory.
+    stdout = Path(path).read_text()
+    parse_stdout = {
+        'sacct': baseline_parsers.parse_sacct_stdout,
+        'squeue': baseline_parsers.parse_squeue_stdout,
+    }[kind]
+    return parse_stdout(stdout, now)[0]
+
+
+def old(path, now, kind):
+    stdout = Path(path).read_text()
+    out = slurm_nums_to_python(json.loads(stdout))
+    parse_job = {'sacct': parse_sacct_job, 'squeue': parse_squeue_job}[kind]
+    return {job['job_id']: parse_job(job, now) for job in out['jobs']}
+
+
+def new(path, now, kind):
+    stdout = Path(path).read_text()
+    parse_job, fields = {
+        'sacct': (parse_sacct_job, SACCT_JOB_FIELDS),
+        'squeue': (parse_squeue_job, SQUEUE_JOB_FIELDS),
+    }[kind]
+    project = compile_fields(fields)
+    return {
+        job['job_id']: parse_job(job, now)
+        for job in map(project, json.loads(stdout)['jobs'])
+    }
+
+
+def stream(path, now, kind):
+    parse_job, fields = {
+        'sacct': (parse_sacct_job, SACCT_JOB_FIELDS),
+        'squeue': (parse_squeue_job, SQUEUE_JOB_FIELDS),
+    }[kind]
+    project = compile_fields(fields)
+    with open(path) as fd:
+        return {
+            job['job_id']: parse_job(job, now)
+            for job in map(project, iter_json_array(fd, 'jobs'))
+        }
+
+
+def measure(fn, *args, repeat=3):
+    times = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = fn(*args)
+        times.append(time.perf_counter() - t)
+    del result
+
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def main(path, kind='sacct', repeat=3):
+    now = time.time()
+    repeat = int(repeat)
+
+    reference = old(path, now, kind)
+    print(f'{path}: {Path(path).stat().st_size / 1e6:.1f} MB, {len(reference)} jobs')
+    for fn in [baseline, old, new, stream]:
+        result = fn(path, now, kind)
+        if fn is baseline:
+            # The rows of the baseline have other values (e.g. no JobRow).
+            assert result.keys() == reference.keys(), fn.__name__
+        else:
+            assert result == reference, fn.__name__
+        seconds, peak = measure(fn, path, now, kind, repeat=repeat)
+        print(f'{fn.__name__:>8}: {seconds:7.3f} s, peak {peak / 1e6:8.1f} MB (tracemalloc)')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+"""
+Run the tools in mon against the synthetic cluster in fake_slurm (fake
+sacct, squeue, scontrol, seff and sinfo on PATH) and report the wall time
+and the peak RSS for each cluster size.
+
+    python benchmarks/bench_tools.py
+    python benchmarks/bench_tools.py --jobs 1000 10000 100000 1000000 --nodes 100 1000 20000
+    python benchmarks/bench_tools.py --tools sacct sacct-X --jobs 100000 --steps 4
+
+The outputs of the fake commands are cached (FAKE_SLURM_CACHE) and a warm up
+run fills the cache, hence the timed runs measure the tools and not the
+generator. Like Slurm, the sacct json is large: ca. 55 kB per job with 2 srun
+steps (23 kB with --indent 0), i.e. 1M jobs need a lot of disk for the cache
+and a lot of time for the warm up (ca. 5 ms per job).
+
+The restd tools ask the fake slurmrestd (fake_slurm/slurmrestd.py), that is
+started for each cluster size.
+
+The peak RSS is ru_maxrss from os.wait4, i.e. the maximum of the tool and the
+fake commands, that it started. The fake commands only copy the cached
+output, hence they are small compared to the tools.
+"""
+import argparse
+import os
+import shlex
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BENCHMARKS = Path(__file__).resolve().parent
+MON = BENCHMARKS.parent / 'mon'
+FAKE = BENCHMARKS / 'fake_slurm'
+
+sys.path.insert(0, str(FAKE))
+
+import cluster  # noqa: E402
+
+COLUMNS = 'User,JobID,Name,State,Elapsed,Submit,End,gpu,mem'
+
+# name: (command, depends on jobs, depends on nodes)
+TOOLS = {
+    'sacct': ('sacct.py --no-cache now-{span}hours', True, False),
+    'sacct-cached': ('sacct.py now-{span}hours', True, False),
+    'sacct-parsable': ('sacct.py --no-cache --backend parsable now-{span}hours', True, False),
+    'sacct-parsable-cached': ('sacct.py --backend parsable now-{span}hours', True, False),
+    # Without CEff and MEff, i.e. without steps.
+    'sacct-columns': ('sacct.py --no-cache --columns {columns} now-{span}hours', True, False),
+    'sacct-parsable-columns': ('sacct.py --no-cache --backend parsable --columns {columns} now-{span}hours', True, False),
+    'sacct-X': ('sacct.py --no-cache -X now-{span}hours', True, False),
+    'sacct-restd': ('sacct.py --no-cache --backend restd now-{span}hours', True, False),
+    'soverview': ('soverview.py', False, True),
+    'soverview_gpus': ('soverview_gpus.py', False, True),
+    'smaintenence': ('smaintenence.py', False, True),
+    'stail-running': ('-c "import stail; stail.file_from_job_id_2({running!r})"', True, False),
+    'stail-finished': ('-c "import stail; stail.file_from_job_id_2({finished!r})"', True, False),
+    'stail-squeue': ('-c "import stail; stail.squeue(); stail.jobid_to_workdir()"', True, False),
+}
+
+
+def run(cmd, env):
+    """Run cmd and return the wall time and the peak RSS in bytes."""
+    t = time.perf_counter()
+    p = subprocess.Popen(
+        [sys.executable, *shlex.split(cmd)], cwd=MON, env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+    )
+    stderr = p.stderr.read()
+    _, status, rusage = os.wait4(p.pid, 0)
+    seconds = time.perf_counter() - t
+    p.returncode = os.waitstatus_to_exitcode(status)
+    if p.returncode:
+        raise RuntimeError(f'{cmd} failed ({p.returncode}):\n{stderr.decode()}')
+    return seconds, rusage.ru_maxrss * 1024
+
+
+def start_slurmrestd(env):
+    """Start the fake slurmrestd on a free port and return it and its URL."""
+    p = subprocess.Popen(
+        [sys.executable, str(FAKE / 'slurmrestd.py'), '--port', '0'],
+        env=env, stderr=subprocess.PIPE, universal_newlines=True,
+    )
+    return p, p.stderr.readline().split()[-1]
+
+
+def stail_jobs(config):
+    """A running and a finished job of the user with an existing stdout file."""
+    running = finished = None
+    for job in cluster.iter_jobs(config):
+        if job.user != config.user:
+            continue
+        if running is None and job.state == 'RUNNING':
+            running = job.job_id_str
+        if finished is None and job.end and job.end < config.now - 300:
+            finished = job.job_id_str
+            os.makedirs(job.workdir, exist_ok=True)
+            Path(job.stdout).touch()
+        if running and finished:
+            break
+    return running, finished
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+    parser.add_argument('--nodes', type=int, nargs='+', default=[100, 1_000, 20_000])
+    parser.add_argument('--steps', type=int, default=2)
+    parser.add_argument('--array', type=int, default=10)
+    parser.add_argument('--span', type=int, default=48, help='Hours')
+    parser.add_argument('--indent', type=int, default=2, help='Indentation of the json, 0 is compact.')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--tools', nargs='+', default=list(TOOLS), choices=list(TOOLS))
+    parser.add_argument('--cache', help='Directory for the outputs of the fake commands. Default: A temporary directory.')
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory(prefix='fake_slurm_')
+    cache = args.cache or os.path.join(tmp.name, 'cache')
+    env = {
+        **os.environ,
+        'PATH': f'{FAKE / "bin"}{os.pathsep}{os.environ["PATH"]}',
+        'USER': os.environ.get('USER', 'cbj'),
+        'FAKE_SLURM_CACHE': cache,
+        'FAKE_SLURM_WORKDIR': os.path.join(tmp.name, 'work'),
+        'FAKE_SLURM_STEPS': str(args.steps),
+        'FAKE_SLURM_ARRAY': str(args.array),
+        'FAKE_SLURM_SPAN': str(args.span),
+        'FAKE_SLURM_INDENT': str(args.indent),
+        'FAKE_SLURM_NOW': str(int(time.time()) // 3600 * 3600),
+    }
+
+    # Each tool depends either on the jobs or on the nodes, hence vary only
+    # that one and keep the other at the smallest size.
+    sizes = []
+    for tool in args.tools:
+        _, jobs, nodes = TOOLS[tool]
+        for n_jobs in (args.jobs if jobs else args.jobs[:1]):
+            for n_nodes in (args.nodes if nodes else args.nodes[:1]):
+                sizes.append((tool, n_jobs, n_nodes))
+
+    print(f'{"tool":>22} {"jobs":>9} {"nodes":>6} {"wall / s":>9} {"peak RSS / MB":>14}')
+    for tool, n_jobs, n_nodes in sizes:
+        env['FAKE_SLURM_JOBS'] = str(n_jobs)
+        env['FAKE_SLURM_NODES'] = str(n_nodes)
+        # The sqlite cache of sacct.py must not mix the clusters.
+        env['XDG_CACHE_HOME'] = os.path.join(tmp.name, f'xdg-{n_jobs}-{n_nodes}')
+        config = cluster.Config(env)
+        running, finished = stail_jobs(config) if tool.startswith('stail') else (None, None)
+        cmd = TOOLS[tool][0].format(span=args.span, running=running, finished=finished, columns=COLUMNS)
+        if 'None' in cmd:
+            print(f'{tool:>22} {n_jobs:>9} {n_nodes:>6} {"no job of " + config.user:>24}')
+            continue
+
+        server = None
+        if tool.endswith('-restd'):
+            server, env['CBJ_SMON_SLURMRESTD'] = start_slurmrestd(env)
+        try:
+            run(cmd, env)  # Warm up, fills the cache of the fake commands.
+            results = [run(cmd, env) for _ in range(args.repeat)]
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+        seconds = min(r[0] for r in results)
+        rss = max(r[1] for r in results)
+        print(f'{tool:>22} {n_jobs:>9} {n_nodes:>6} {seconds:9.3f} {rss / 1e6:14.1f}', flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,1351 @@
+"""
+Synthetic cluster and workload for benchmarks, without a Slurm cluster.
+
+The cluster is fully determined by environment variables, hence the fake
+commands in bin/ (sacct, squeue, scontrol, seff, sinfo) agree with each
+other, when they are called by the tools:
+
+    FAKE_SLURM_NODES         Number of nodes (default 100)
+    FAKE_SLURM_JOBS          Number of jobs (default 1000)
+    FAKE_SLURM_ARRAY         Size of the job arrays, 1 disables them (default 10)
+    FAKE_SLURM_STEPS         Number of srun steps per job, additional to batch
+                             and extern (default 2)
+    FAKE_SLURM_SPAN          The jobs were submitted in the last that many
+                             hours (default 48)
+    FAKE_SLURM_NOW           Timestamp of "now" (default: the current hour)
+    FAKE_SLURM_SEED          (default 0)
+    FAKE_SLURM_WORKDIR       Root of the working directories of the jobs
+                             (default /tmp/fake_slurm)
+    FAKE_SLURM_INDENT        Indentation of the json, 0 is compact and
+                             several times faster to generate (default 2,
+                             like Slurm)
+    FAKE_SLURM_CACHE         Optional directory, to cache the generated jobs
+                             and outputs in a sqlite database per cluster.
+                             The first call generates the output of all jobs,
+                             later calls only select and copy, i.e. the fake
+                             costs (nearly) no time, also for the changing
+                             time ranges of the tools.
+
+The user of the calling process (USER) is one of the users of the
+workload, i.e. `--user $USER` and `--mine` find jobs.
+
+The output follows Slurm 23.11: The json is pretty printed and contains
+the fields, that Slurm emits (most of them), not only the fields, that
+the tools use.
+
+Usage as a module:
+
+    python cluster.py sacct --json -S now-1days --allusers
+"""
+import io
+import os
+import sys
+import json
+import time
+import shlex
+import random
+import sqlite3
+import hashlib
+import datetime
+import itertools
+
+
+USERS = [
+    'cbj', 'alice', 'bob', 'carol', 'dave', 'erin', 'frank', 'grace',
+    'heidi', 'ivan', 'judy', 'mallory', 'nick', 'olivia', 'peggy', 'rupert',
+    'sybil', 'trent', 'victor', 'walter',
+]
+
+JOB_NAMES = [
+    'train', 'eval', 'preprocess', 'bash', 'decode', 'extract', 'jupyter',
+    'simulate', 'tune', 'sweep',
+]
+
+# (prefix, partitions, share of the nodes, cpus, memory in MB, gpus)
+NODE_TYPES = [
+    ('n2cn', ['all', 'normal'], 0.80, 128, 240_000, 0),
+    ('n2gpu', ['all', 'gpu'], 0.10, 128, 485_000, 4),
+    ('n2lcn', ['all', 'largemem'], 0.06, 128, 950_000, 0),
+    ('n2hcn', ['all', 'hugemem'], 0.02, 128, 1_900_000, 0),
+    ('n2fpga', ['all', 'fpga'], 0.02, 128, 485_000, 0),
+]
+
+ACTIVE_STATES = {'PENDING', 'RUNNING'}
+
+# Part of the key of the cache, increase it, when the cached tables change.
+CACHE_VERSION = 3
+
+
+class Config:
+    def __init__(self, environ=None):
+        environ = os.environ if environ is None else environ
+        self.nodes = int(environ.get('FAKE_SLURM_NODES', 100))
+        self.jobs = int(environ.get('FAKE_SLURM_JOBS', 1000))
+        self.array = max(1, int(environ.get('FAKE_SLURM_ARRAY', 10)))
+        self.steps = int(environ.get('FAKE_SLURM_STEPS', 2))
+        self.span = float(environ.get('FAKE_SLURM_SPAN', 48)) * 3600
+        self.now = int(environ.get('FAKE_SLURM_NOW', int(time.time()) // 3600 * 3600))
+        self.seed = int(environ.get('FAKE_SLURM_SEED', 0))
+        self.workdir = environ.get('FAKE_SLURM_WORKDIR', '/tmp/fake_slurm')
+        self.indent = int(environ.get('FAKE_SLURM_INDENT', 2))
+        self.cache = environ.get('FAKE_SLURM_CACHE')
+        self.user = environ.get('USER', 'cbj')
+        self.first_job_id = 4_000_000
+
+    @property
+    def users(self):
+        if self.user in USERS:
+            return USERS
+        return [self.user] + USERS[1:]
+
+    def key(self):
+        return [
+            CACHE_VERSION,
+            self.nodes, self.jobs, self.array, self.steps, self.span,
+            self.now, self.seed, self.workdir, self.user, self.indent,
+        ]
+
+
+def num(value, infinite=False):
+    """The number representation of Slurm >= 23.02."""
+    return {'set': value is not None, 'infinite': infinite, 'number': value or 0}
+
+
+def tres(**counts):
+    ids = {'cpu': 1, 'mem': 2, 'energy': 3, 'node': 4, 'billing': 5,
+           'fs/disk': 6, 'vmem': 7, 'pages': 8, 'gres/gpu': 1001,
+           'gres/gpu:a100': 1002}
+    entries = []
+    for k, count in counts.items():
+        k = k.replace('__', ':').replace('_', '/')
+        type_, _, name = k.partition('/')
+        entries.append({'type': type_, 'name': name, 'id': ids.get(k, 9999), 'count': count})
+    return entries
+
+
+def tres_str(entries, mem_unit='M'):
+    return ','.join(
+        f"{e['type']}{'/' + e['name'] if e['name'] else ''}={e['count']}"
+        f"{mem_unit if e['type'] == 'mem' else ''}"
+        for e in entries
+    )
+
+
+def fmt_duration(seconds):
+    """
+    >>> fmt_duration(3723), fmt_duration(90000)
+    ('01:02:03', '1-01:00:00')
+    """
+    days, seconds = divmod(int(seconds), 86400)
+    s = f'{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
+    return f'{days}-{s}' if days else s
+
+
+###############################################################################
+# Nodes
+###############################################################################
+
+def node_names(config):
+    names = []
+    for prefix, partitions, share, cpus, mem, gpus in NODE_TYPES:
+        count = max(1, round(config.nodes * share))
+        names.extend((f'{prefix}{i + 1:04d}', partitions, cpus, mem, gpus)
+                     for i in range(count))
+    return names[:max(config.nodes, len(NODE_TYPES))]
+
+
+def node(config, index, name, partitions, cpus, mem, gpus):
+    rnd = random.Random(f'{config.seed}-node-{index}')
+    state = rnd.choices(
+        [['ALLOCATED'], ['MIXED'], ['IDLE'], ['IDLE', 'DRAIN'],
+         ['MIXED', 'RESERVED'], ['IDLE', 'PLANNED'], ['DOWN', 'NOT_RESPONDING']],
+        [45, 25, 15, 4, 5, 4, 2])[0]
+    if state[0] == 'ALLOCATED':
+        alloc_cpus = cpus
+    elif state[0] == 'MIXED':
+        alloc_cpus = rnd.randrange(1, cpus)
+    else:
+        alloc_cpus = 0
+    alloc_mem = min(mem, alloc_cpus * rnd.choice([500, 1000, 1875, 3750]))
+    alloc_gpus = rnd.randint(0, gpus) if alloc_cpus else 0
+
+    total = dict(cpu=cpus, mem=mem, billing=cpus)
+    used = dict(cpu=alloc_cpus, mem=alloc_mem)
+    gres = gres_used = ''
+    if gpus:
+        total.update({'gres_gpu': gpus, 'gres_gpu__a100': gpus})
+        used.update({'gres_gpu': alloc_gpus, 'gres_gpu__a100': alloc_gpus})
+        gres = f'gpu:a100:{gpus}(S:0-1)'
+        gres_used = f'gpu:a100:{alloc_gpus}(IDX:{"0-" + str(alloc_gpus - 1) if alloc_gpus else "N/A"})'
+    boot_time = config.now - rnd.randint(86400, 90 * 86400)
+    reason = ''
+    if 'DRAIN' in state or 'DOWN' in state:
+        reason = rnd.choice(['Kill task failed', 'NHC: check_fs_mount', 'maintenance'])
+    return {
+        'architecture': 'x86_64',
+        'burstbuffer_network_address': '',
+        'boards': 1,
+        'boot_time': num(boot_time),
+        'cluster_name': '',
+        'cores': cpus // 2,
+        'specialized_cores': 0,
+        'cpu_binding': 0,
+        'cpu_load': alloc_cpus * 100 + rnd.randint(0, 300),
+        'free_mem': num(mem - alloc_mem + rnd.randint(0, 1000)),
+        'cpus': cpus,
+        'effective_cpus': cpus,
+        'specialized_cpus': '',
+        'energy': {
+            'average_watts': 0, 'base_consumed_energy': 0,
+            'consumed_energy': 0, 'current_watts': num(0),
+            'previous_consumed_energy': 0, 'last_collected': 0,
+        },
+        'external_sensors': {
+            'consumed_energy': num(None), 'temperature': num(None),
+            'energy_update_time': 0, 'current_watts': 0,
+        },
+        'extra': '',
+        'power': {},
+        'features': [],
+        'active_features': [],
+        'gres': gres,
+        'gres_drained': 'N/A',
+        'gres_used': gres_used,
+        'instance_id': '',
+        'instance_type': '',
+        'last_busy': num(config.now - rnd.randint(0, 86400)),
+        'mcs_label': '',
+        'specialized_memory': 0,
+        'name': name,
+        'next_state_after_reboot': ['INVALID'],
+        'address': name,
+        'hostname': name,
+        'state': state,
+        'operating_system': 'Linux 4.18.0-477.27.1.el8_8.x86_64 #1 SMP Thu Aug 31 10:29:22 EDT 2023',
+        'owner': '',
+        'partitions': partitions,
+        'port': 6818,
+        'real_memory': mem,
+        'comment': '',
+        'reason': reason,
+        'reason_changed_at': num(config.now - rnd.randint(0, 86400) if reason else 0),
+        'reason_set_by_user': 'root' if reason else '',
+        'resume_after': num(0),
+        'reservation': 'maintenance' if 'RESERVED' in state else '',
+        'alloc_memory': alloc_mem,
+        'alloc_cpus': alloc_cpus,
+        'alloc_idle_cpus': cpus - alloc_cpus,
+        'tres_used': tres_str(tres(**used)),
+        'tres_weighted': float(alloc_cpus),
+        'slurmd_start_time': num(boot_time + 120),
+        'sockets': 2,
+        'threads': 1,
+        'temporary_disk': 0,
+        'weight': 1,
+        'tres': tres_str(tres(**total)),
+        'version': '23.11.4',
+    }
+
+
+def iter_nodes(config):
+    for index, args in enumerate(node_names(config)):
+        yield node(config, index, *args)
+
+
+def reservations(config):
+    """The reservations for `scontrol show reservation` as list of dicts."""
+    names = node_names(config)
+    rnd = random.Random(f'{config.seed}-reservations')
+    result = []
+    for i in range(max(1, len(names) // 100)):
+        count = rnd.choice([1, 1, 2, 4, 16, 64])
+        first = rnd.randrange(len(names))
+        nodes = [n[0] for n in names[first:first + count]]
+        start = config.now + rnd.randint(-7, 14) * 86400
+        duration = rnd.choice([3600, 4 * 3600, 86400, 7 * 86400])
+        result.append({
+            'ReservationName': rnd.choice(['maintenance', 'fpga_aurora', 'hsmptest', 'course']) + f'_{i}',
+            'StartTime': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(start)),
+            'EndTime': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(start + duration)),
+            'Duration': fmt_duration(duration),
+            'Nodes': compress_hostlist(nodes),
+            'NodeCnt': len(nodes),
+            'CoreCnt': 128 * len(nodes),
+            'Features': '(null)',
+            'PartitionName': '(null)',
+            'Flags': rnd.choice(['MAINT,SPEC_NODES', 'SPEC_NODES', 'IGNORE_JOBS,SPEC_NODES']),
+            'TRES': f'cpu={128 * len(nodes)}',
+            'Users': rnd.choice(['root', config.user, '(null)']),
+            'Groups': '(null)',
+            'Accounts': '(null)',
+            'Licenses': '(null)',
+            'State': 'ACTIVE' if start <= config.now else 'INACTIVE',
+            'BurstBuffer': '(null)',
+            'Watts': 'n/a',
+            'MaxStartDelay': '(null)',
+        })
+    return result
+
+
+def compress_hostlist(names):
+    """
+    >>> compress_hostlist(['n2cn0001', 'n2cn0002', 'n2cn0004', 'n2gpu0001'])
+    'n2cn[0001-0002,0004],n2gpu0001'
+    """
+    groups = {}
+    for name in names:
+        prefix = name.rstrip('0123456789')
+        groups.setdefault(prefix, []).append(name[len(prefix):])
+    parts = []
+    for prefix, numbers in groups.items():
+        if len(numbers) == 1:
+            parts.append(prefix + numbers[0])
+            continue
+        ranges = []
+        for number in numbers:
+            if ranges and int(number) == int(ranges[-1][1]) + 1:
+                ranges[-1][1] = number
+            else:
+                ranges.append([number, number])
+        parts.append(prefix + '[' + ','.join(
+            a if a == b else f'{a}-{b}' for a, b in ranges) + ']')
+    return ','.join(parts)
+
+
+###############################################################################
+# Jobs
+###############################################################################
+
+class Job:
+    """
+    The attributes of a job, from which all outputs are derived. All random
+    choices are seeded with the job index, hence the jobs can be generated
+    independently (streaming) and in any order.
+    """
+    def __init__(self, config, index, nodes):
+        self.config = config
+        self.index = index
+        now = config.now
+        array_index, task = divmod(index, config.array)
+        group = random.Random(f'{config.seed}-array-{array_index}')
+        is_array = config.array > 1 and group.random() < 0.5
+        rnd = random.Random(f'{config.seed}-job-{index}')
+        # Array tasks share the submission, user and resources.
+        shared = group if is_array else rnd
+
+        self.job_id = config.first_job_id + index
+        if is_array:
+            self.array_job_id = config.first_job_id + array_index * config.array
+            self.array_task_id = task
+        else:
+            self.array_job_id = 0
+            self.array_task_id = None
+
+        self.user = shared.choice(config.users)
+        self.uid = 1000 + config.users.index(self.user)
+        self.account = f'hpc-prf-{self.user[:3]}'
+        self.name = shared.choice(JOB_NAMES)
+        if shared.random() < 0.05:
+            self.name += '|with pipe'
+        self.submit = int(now - config.span + config.span * (
+            (array_index * config.array) / max(config.jobs, 1)))
+
+        prefix, self.partitions, _, node_cpus, node_mem, node_gpus = shared.choices(
+            NODE_TYPES, [0.70, 0.20, 0.07, 0.02, 0.01])[0]
+        self.partition = self.partitions[-1]
+        self.node_count = shared.choice([1] * 8 + [2, 4])
+        self.cpus = shared.choice([1, 4, 16, 32, 128]) * self.node_count
+        self.gpus = shared.randint(1, 4) * self.node_count if node_gpus else 0
+        self.mem_per_cpu = min(shared.choice([1000, 1875, 3750, 7500]),
+                               node_mem * self.node_count // self.cpus)
+        self.mem = self.cpus * self.mem_per_cpu
+        self.time_limit = shared.choice([60, 240, 720, 1440, 4320])  # minutes
+        self.qos = shared.choice(['cont', 'cont', 'express', 'long'])
+        self.priority = rnd.randint(1, 100_000)
+        self.tasks = shared.choice([1, 1, 4, 8])
+
+        wait = int(rnd.expovariate(1 / 1800)) + task * 60
+        runtime = int(rnd.uniform(0.01, 1.1) * self.time_limit * 60)
+        kind = rnd.choices(
+            ['COMPLETED', 'FAILED', 'CANCELLED', 'OUT_OF_MEMORY', 'NODE_FAIL'],
+            [70, 17, 8, 4, 1])[0]
+        if runtime >= self.time_limit * 60:
+            runtime = self.time_limit * 60
+            kind = 'TIMEOUT'
+        self.cancelled_by = None
+        if kind == 'CANCELLED':
+            self.cancelled_by = rnd.choice([self.uid, self.uid, 0])
+
+        if self.submit + wait > now:
+            self.state = 'PENDING'
+            self.reason = rnd.choice(['Priority', 'Resources', 'Dependency', 'QOSMaxJobsPerUserLimit'])
+            self.start = self.end = 0
+            self.elapsed = 0
+        elif self.submit + wait + runtime > now:
+            self.state = 'RUNNING'
+            self.reason = 'None'
+            self.start = self.submit + wait
+            self.end = 0
+            self.elapsed = now - self.start
+        else:
+            self.state = kind
+            self.reason = 'None'
+            self.start = self.submit + wait
+            self.end = self.start + runtime
+            self.elapsed = runtime
+
+        if self.start:
+            first = rnd.randrange(len(nodes))
+            # Wrap around, i.e. a job has always node_count nodes.
+            self.nodes = [nodes[(first + i) % len(nodes)] for i in range(self.node_count)]
+            self.nodelist = compress_hostlist(self.nodes)
+        else:
+            self.nodes = []
+            self.nodelist = 'None assigned'
+
+        self.workdir = os.path.join(config.workdir, self.user, f'exp{array_index % 10}')
+        if is_array:
+            self.stdout = os.path.join(self.workdir, f'slurm-{self.array_job_id}_{task}.out')
+        else:
+            self.stdout = os.path.join(self.workdir, f'slurm-{self.job_id}.out')
+        self.submit_line = f'sbatch -p {self.partition} -t {fmt_duration(self.time_limit * 60)} ' \
+                           f'-n {self.tasks} --mem-per-cpu {self.mem_per_cpu}M {self.name.split("|")[0]}.sh'
+
+        self._rnd_state = rnd.getstate()
+
+    @property
+    def job_id_str(self):
+        if self.array_task_id is None:
+            return str(self.job_id)
+        return f'{self.array_job_id}_{self.array_task_id}'
+
+    @property
+    def active(self):
+        return self.state in ACTIVE_STATES
+
+    @property
+    def billing(self):
+        return self.cpus + 4 * self.gpus
+
+    def tres_requested(self):
+        kw = dict(cpu=self.cpus, mem=self.mem, node=self.node_count, billing=self.billing)
+        if self.gpus:
+            kw.update({'gres_gpu': self.gpus, 'gres_gpu__a100': self.gpus})
+        return tres(**kw)
+
+    def tres_allocated(self):
+        if not self.start:
+            return []
+        return self.tres_requested()
+
+    def steps(self):
+        """
+        The steps (batch, extern and the srun steps) with cpu time and
+        memory statistics. Running steps have no statistics yet.
+        """
+        if not self.start:
+            return []
+        rnd = random.Random()
+        rnd.setstate(self._rnd_state)
+        names = ['batch', 'extern'] + [str(i) for i in range(self.config.steps)]
+        # Each working step (not extern) uses a share of the cpus.
+        share = 1 / (len(names) - 1)
+        steps = []
+        for i, name in enumerate(names):
+            step_start = self.start + (0 if i < 2 else i)
+            finished = bool(self.end) or (name not in ('batch', 'extern') and i < len(names) - 1)
+            duration = (self.end or self.config.now) - step_start
+            tasks = 1 if name in ('batch', 'extern') else self.tasks
+            cpu_seconds = int(duration * self.cpus * share * rnd.uniform(0, 1)) if finished and name != 'extern' else 0
+            mem_max = int(self.mem * 1024 ** 2 / tasks * rnd.uniform(0.01, 1.05)) if finished and name != 'extern' else 0
+            steps.append(self._step(rnd, name, step_start, duration, tasks, cpu_seconds, mem_max, finished))
+        return steps
+
+    def _step(self, rnd, name, start, duration, tasks, cpu_seconds, mem_max, finished):
+        node = self.nodes[0]
+
+        def stats(with_node):
+            kw = dict(cpu=cpu_seconds * 1000, mem=mem_max, energy=0,
+                      fs_disk=rnd.randint(0, 10 ** 9) if finished else 0,
+                      vmem=mem_max * 2, pages=rnd.randint(0, 100) if finished else 0)
+            entries = tres(**kw)
+            if with_node:
+                for e in entries:
+                    e['node'] = node
+                    e['task'] = 0
+            return entries
+
+        user = int(cpu_seconds * 0.9)
+        system = cpu_seconds - user
+        return {
+            'time': {
+                'elapsed': duration if finished else 0,
+                'end': num(start + duration if finished else None),
+                'start': num(start),
+                'suspended': 0,
+                'system': {'seconds': system, 'microseconds': rnd.randint(0, 999_999)},
+                'limit': num(None),
+                'total': {'seconds': cpu_seconds, 'microseconds': rnd.randint(0, 999_999)},
+                'user': {'seconds': user, 'microseconds': rnd.randint(0, 999_999)},
+            },
+            'exit_code': {
+                'status': ['SUCCESS'], 'return_code': num(0),
+                'signal': {'id': num(None), 'name': ''},
+            },
+            'nodes': {'count': len(self.nodes), 'range': self.nodelist, 'list': self.nodes},
+            'tasks': {'count': tasks},
+            'pid': '',
+            'CPU': {'requested_frequency': {'min': num(None), 'max': num(None)}, 'governor': ''},
+            'kill_request_user': '',
+            'state': ['COMPLETED' if finished else 'RUNNING'],
+            'statistics': {'CPU': {'actual_frequency': 2250000}, 'energy': {'consumed': num(0)}},
+            'step': {'id': f'{self.job_id}.{name}', 'name': name if name in ('batch', 'extern') else self.name},
+            'task': {'distribution': 'Block'},
+            'tres': {
+                'requested': {
+                    'max': stats(True), 'min': stats(True),
+                    'average': stats(False), 'total': stats(False),
+                },
+                'consumed': {
+                    'max': stats(True), 'min': stats(True),
+                    'average': stats(False), 'total': stats(False),
+                },
+                'allocated': tres(cpu=self.cpus, mem=self.mem, node=len(self.nodes)),
+            },
+        }
+
+    def sacct_state(self):
+        if self.cancelled_by is not None and self.state == 'CANCELLED':
+            return f'CANCELLED by {self.cancelled_by}'
+        return self.state
+
+    def sacct_json(self, steps=True):
+        return {
+            'account': self.account,
+            'comment': {'administrator': '', 'job': '', 'system': ''},
+            'allocation_nodes': self.node_count,
+            'array': {
+                'job_id': self.array_job_id,
+                'limits': {'max': {'running': {'tasks': 0}}},
+                'task_id': num(self.array_task_id),
+                'task': '',
+            },
+            'association': {
+                'account': self.account, 'cluster': 'noctua2',
+                'partition': '', 'user': self.user, 'id': self.uid,
+            },
+            'block': '',
+            'cluster': 'noctua2',
+            'constraints': '',
+            'container': '',
+            'derived_exit_code': {
+                'status': ['SUCCESS'], 'return_code': num(0),
+                'signal': {'id': num(None), 'name': ''},
+            },
+            'time': {
+                'elapsed': self.elapsed,
+                'eligible': self.submit,
+                'end': self.end,
+                'planned': num(self.start - self.submit if self.start else None),
+                'start': self.start,
+                'submission': self.submit,
+                'suspended': 0,
+                'system': {'seconds': 0, 'microseconds': 0},
+                'limit': num(self.time_limit),
+                'total': {'seconds': 0, 'microseconds': 0},
+                'user': {'seconds': 0, 'microseconds': 0},
+            },
+            'exit_code': {
+                'status': ['SUCCESS' if self.state == 'COMPLETED' else 'ERROR'],
+                'return_code': num(0 if self.state == 'COMPLETED' else 1),
+                'signal': {'id': num(None), 'name': ''},
+            },
+            'extra': '',
+            'failed_node': '',
+            'flags': ['STARTED_ON_SUBMIT'] if self.start else [],
+            'group': self.account,
+            'het': {'job_id': 0, 'job_offset': num(None)},
+            'job_id': self.job_id,
+            'name': self.name,
+            'licenses': '',
+            'mcs': {'label': ''},
+            'nodes': self.nodelist,
+            'partition': self.partition,
+            'hold': False,
+            'priority': num(self.priority),
+            'qos': self.qos,
+            'required': {
+                'CPUs': self.cpus,
+                'memory_per_cpu': num(self.mem_per_cpu),
+                'memory_per_node': num(None),
+            },
+            'kill_request_user': (
+                self.user if self.cancelled_by else 'root'
+            ) if self.cancelled_by is not None else '',
+            'reservation': {'id': 0, 'name': ''},
+            'script': '',
+            'state': {'current': [self.state], 'reason': self.reason},
+            'steps': self.steps() if steps else [],
+            'submit_line': self.submit_line,
+            'tres': {'allocated': self.tres_allocated(), 'requested': self.tres_requested()},
+            'used_gres': '',
+            'user': self.user,
+            'wckey': {'wckey': '', 'flags': []},
+            'working_directory': self.workdir,
+        }
+
+    def squeue_json(self):
+        running = self.state == 'RUNNING'
+        per_node = self.gpus // max(self.node_count, 1)
+        gres_detail = [f'gpu:a100:{per_node}(IDX:0-{per_node - 1})' for _ in self.nodes] if running and self.gpus else []
+        tres_req = tres_str(self.tres_requested())
+        return {
+            'account': self.account,
+            'accrue_time': num(self.submit),
+            'admin_comment': '',
+            'allocating_node': 'n2login1',
+            'array_job_id': num(self.array_job_id),
+            'array_task_id': num(self.array_task_id),
+            'array_max_tasks': num(0),
+            'array_task_string': '',
+            'association_id': self.uid,
+            'batch_features': '',
+            'batch_flag': True,
+            'batch_host': self.nodes[0] if self.nodes else '',
+            'flags': ['EXACT_TASK_COUNT_REQUESTED', 'USING_DEFAULT_WCKEY'],
+            'burst_buffer': '',
+            'burst_buffer_state': '',
+            'cluster': 'noctua2',
+            'cluster_features': '',
+            'command': os.path.join(self.workdir, f'{self.name.split("|")[0]}.sh'),
+            'comment': '',
+            'container': '',
+            'container_id': '',
+            'contiguous': False,
+            'core_spec': 0,
+            'thread_spec': 0,
+            'cores_per_socket': num(None),
+            'billable_tres': num(float(self.billing)),
+            'cpus_per_task': num(self.cpus // self.tasks or 1),
+            'cpu_frequency_minimum': num(None),
+            'cpu_frequency_maximum': num(None),
+            'cpu_frequency_governor': num(None),
+            'cpus_per_tres': '',
+            'cron': '',
+            'deadline': num(0),
+            'delay_boot': num(0),
+            'dependency': '',
+            'derived_exit_code': {'status': ['SUCCESS'], 'return_code': num(0), 'signal': {'id': num(None), 'name': ''}},
+            'eligible_time': num(self.submit),
+            'end_time': num(self.start + self.time_limit * 60 if self.start else 0),
+            'excluded_nodes': '',
+            'exit_code': {'status': ['PENDING' if not running else 'SUCCESS'], 'return_code': num(0), 'signal': {'id': num(None), 'name': ''}},
+            'extra': '',
+            'failed_node': '',
+            'features': '',
+            'federation_origin': '',
+            'federation_siblings_active': '',
+            'federation_siblings_viable': '',
+            'gres_detail': gres_detail,
+            'group_id': self.uid,
+            'group_name': self.account,
+            'het_job_id': num(0),
+            'het_job_id_set': '',
+            'het_job_offset': num(0),
+            'job_id': self.job_id,
+            'job_resources': {
+                'nodes': self.nodelist if running else '',
+                'allocated_cores': self.cpus if running else 0,
+                'allocated_cpus': 0,
+                'allocated_hosts': len(self.nodes),
+                'allocated_nodes': [
+                    {
+                        'sockets': {}, 'nodename': n,
+                        'cpus_used': 0, 'memory_used': 0,
+                        'memory_allocated': self.mem // max(self.node_count, 1),
+                    }
+                    for n in self.nodes
+                ] if running else [],
+            },
+            'job_size_str': [],
+            'job_state': [self.state],
+            'last_sched_evaluation': num(self.config.now - 30),
+            'licenses': '',
+            'mail_type': [],
+            'mail_user': self.user,
+            'max_cpus': num(0),
+            'max_nodes': num(0),
+            'mcs_label': '',
+            'memory_per_tres': '',
+            'name': self.name,
+            'network': '',
+            'nodes': self.nodelist if running else '',
+            'nice': 0,
+            'tasks_per_core': num(None, infinite=True),
+            'tasks_per_tres': num(0),
+            'tasks_per_node': num(0),
+            'tasks_per_socket': num(None, infinite=True),
+            'tasks_per_board': num(0),
+            'cpus': num(self.cpus),
+            'node_count': num(self.node_count),
+            'tasks': num(self.tasks),
+            'partition': self.partition,
+            'prefer': '',
+            'memory_per_cpu': num(self.mem_per_cpu),
+            'memory_per_node': num(None),
+            'minimum_cpus_per_node': num(1),
+            'minimum_tmp_disk_per_node': num(0),
+            'power': {'flags': []},
+            'preempt_time': num(0),
+            'preemptable_time': num(0),
+            'pre_sus_time': num(0),
+            'hold': False,
+            'priority': num(self.priority),
+            'profile': ['NOT_SET'],
+            'qos': self.qos,
+            'reboot': False,
+            'required_nodes': '',
+            'minimum_switches': 0,
+            'requeue': False,
+            'resize_time': num(0),
+            'restart_cnt': 0,
+            'resv_name': '',
+            'scheduled_nodes': '',
+            'selinux_context': '',
+            'shared': [],
+            'exclusive': [],
+            'oversubscribe': False,
+            'show_flags': ['DETAIL', 'LOCAL'],
+            'sockets_per_board': 0,
+            'sockets_per_node': num(None),
+            'start_time': num(self.start),
+            'state_description': '',
+            'state_reason': self.reason,
+            'standard_error': self.stdout,
+            'standard_input': '/dev/null',
+            'standard_output': self.stdout,
+            'submit_time': num(self.submit),
+            'suspend_time': num(0),
+            'system_comment': '',
+            'time_limit': num(self.time_limit),
+            'time_minimum': num(0),
+            'threads_per_core': num(None),
+            'tres_bind': '',
+            'tres_freq': '',
+            'tres_per_job': '',
+            'tres_per_node': f'gres/gpu:a100:{per_node}' if self.gpus else '',
+            'tres_per_socket': '',
+            'tres_per_task': f'cpu={self.cpus // self.tasks or 1}',
+            'tres_req_str': tres_req,
+            'tres_alloc_str': tres_req if running else '',
+            'user_id': self.uid,
+            'user_name': self.user,
+            'maximum_switch_wait_time': 0,
+            'wckey': '',
+            'current_working_directory': self.workdir,
+        }
+
+    def scontrol_text(self):
+        """Like `scontrol show job <id>`."""
+        t = lambda ts: time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(ts)) if ts else 'Unknown'
+        return '\n   '.join([
+            f'JobId={self.job_id} JobName={self.name}',
+            f'UserId={self.user}({self.uid}) GroupId={self.account}({self.uid}) MCS_label=N/A',
+            f'Priority={self.priority} Nice=0 Account={self.account} QOS={self.qos}',
+            f'JobState={self.state} Reason={self.reason} Dependency=(null)',
+            f'RunTime={fmt_duration(self.elapsed)} TimeLimit={fmt_duration(self.time_limit * 60)} TimeMin=N/A',
+            f'SubmitTime={t(self.submit)} EligibleTime={t(self.submit)}',
+            f'StartTime={t(self.start)} EndTime={t(self.start + self.time_limit * 60 if self.start else 0)} Deadline=N/A',
+            f'Partition={self.partition} AllocNode:Sid=n2login1:12345',
+            f'NodeList={self.nodelist if self.start else "(null)"}',
+            f'NumNodes={self.node_count} NumCPUs={self.cpus} NumTasks={self.tasks} CPUs/Task=1 ReqB:S:C:T=0:0:*:*',
+            f'ReqTRES={tres_str(self.tres_requested())}',
+            f'AllocTRES={tres_str(self.tres_allocated())}',
+            f'Command={os.path.join(self.workdir, self.name.split("|")[0] + ".sh")}',
+            f'WorkDir={self.workdir}',
+            f'StdErr={self.stdout}',
+            f'StdIn=/dev/null',
+            f'StdOut={self.stdout}',
+        ]) + '\n'
+
+    def seff_text(self):
+        steps = self.steps()
+        cpu_seconds = sum(s['time']['total']['seconds'] for s in steps)
+        core_walltime = self.elapsed * self.cpus
+        mem_used = max([
+            e['count'] for s in steps for e in s['tres']['requested']['max']
+            if e['type'] == 'mem'] + [0])
+        lines = [
+            f'Job ID: {self.job_id}',
+            f'Cluster: noctua2',
+            f'User/Group: {self.user}/{self.account}',
+            f'State: {self.state} (exit code 0)',
+            f'Nodes: {self.node_count}',
+            f'Cores per node: {self.cpus // self.node_count}',
+        ]
+        if self.active:
+            lines.append(f'WARNING: Efficiency statistics may be misleading for {self.state} jobs.')
+        lines += [
+            f'CPU Utilized: {fmt_duration(cpu_seconds)}',
+            f'CPU Efficiency: {cpu_seconds / core_walltime * 100 if core_walltime else 0:.2f}% of {fmt_duration(core_walltime)} core-walltime',
+            f'Job Wall-clock time: {fmt_duration(self.elapsed)}',
+            f'Memory Utilized: {mem_used / 1024 ** 3:.2f} GB',
+            f'Memory Efficiency: {mem_used / (self.mem * 1024 ** 2) * 100:.2f}% of {self.mem / 1024:.2f} GB',
+        ]
+        return '\n'.join(lines) + '\n'
+
+
+def iter_jobs(config, indices=None):
+    """All jobs in order of their id (i.e. submission) or only the indices."""
+    nodes = [n[0] for n in node_names(config)]
+    for index in range(config.jobs) if indices is None else indices:
+        yield Job(config, index, nodes)
+
+
+def job_indices(config, ids):
+    """
+    The indices of job ids (also array ids like 4000010_3 and steps).
+
+    >>> job_indices(Config({}), ['4000012', '4000010_3', '4000001.batch', '1'])
+    [1, 12, 13]
+    """
+    indices = set()
+    for i in ids:
+        if '_' in i:
+            array_id, task = map(int, i.split('_'))
+            indices.add(array_id - config.first_job_id + task)
+        else:
+            indices.add(int(i.split('.')[0]) - config.first_job_id)
+    return sorted(i for i in indices if 0 <= i < config.jobs)
+
+
+###############################################################################
+# Output
+###############################################################################
+
+def dump(item, indent):
+    """The json of an item of the top level array (i.e. at depth 2)."""
+    if not indent:
+        return json.dumps(item)
+    return json.dumps(item, indent=indent).replace('\n', '\n' + ' ' * 2 * indent)
+
+
+def write_json(out, key, items, extra=None):
+    """
+    Write a pretty printed json object with the items (already dumped) as
+    array under key, one item at a time, i.e. the memory doesn't grow with
+    the items.
+    """
+    meta = {'plugin': {'type': 'openapi/slurmctld', 'name': 'Slurm OpenAPI slurmctld',
+                       'data_parser': 'data_parser/v0.0.40', 'accounting_storage': 'accounting_storage/slurmdbd'},
+            'client': {'source': '/dev/pts/0', 'user': 'cbj', 'group': 'cbj'},
+            'command': [], 'slurm': {'version': {'major': '23', 'micro': '4', 'minor': '11'},
+                                     'release': '23.11.4', 'cluster': 'noctua2'}}
+    out.write('{\n  "meta": ' + json.dumps(meta, indent=2).replace('\n', '\n  ') + ',\n')
+    for k, v in (extra or {}).items():
+        out.write(f'  {json.dumps(k)}: ' + json.dumps(v, indent=2).replace('\n', '\n  ') + ',\n')
+    out.write(f'  {json.dumps(key)}: [')
+    first = True
+    for item in items:
+        out.write('\n    ' if first else ',\n    ')
+        first = False
+        out.write(item)
+    out.write('\n  ],\n' if not first else '],\n')
+    out.write('  "warnings": [],\n  "errors": []\n}\n')
+
+
+def parse_time(value, now):
+    """
+    The formats of sacct -S/-E, that are used by the tools.
+
+    >>> parse_time('now-1hours', 7200), parse_time('now', 5)
+    (3600, 5)
+    """
+    if value.startswith('now'):
+        rest = value[3:]
+        if not rest:
+            return now
+        sign = -1 if rest[0] == '-' else 1
+        rest = rest[1:]
+        digits = len(rest) - len(rest.lstrip('0123456789'))
+        unit = rest[digits:]
+        factor = {'': 1, 'seconds': 1, 'minutes': 60, 'hours': 3600,
+                  'days': 86400, 'weeks': 7 * 86400}[unit]
+        return now + sign * int(rest[:digits]) * factor
+    for time_format in [
+            '%Y-%m-%dT%H:%M:%S', '%Y-%m-%dT%H:%M', '%Y-%m-%d',
+            '%m/%d/%y-%H:%M:%S', '%m/%d/%y-%H:%M', '%m/%d/%y']:
+        try:
+            return int(datetime.datetime.strptime(value, time_format).timestamp())
+        except ValueError:
+            pass
+    if value.isdigit():
+        return int(value)
+    raise ValueError(f'sacct: error: Invalid time specification: {value}')
+
+
+def format_time(ts):
+    if not ts:
+        return 'Unknown'
+    if os.environ.get('SLURM_TIME_FORMAT') == '%s':
+        return str(ts)
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(ts))
+
+
+def sacct_field(job, field, step=None):
+    """The value of a --format field of sacct for the job (or a step)."""
+    if step is not None:
+        name = step['step']['id'].split('.', 1)[1]
+        values = {
+            'jobidraw': step['step']['id'],
+            'jobid': f'{job.job_id_str}.{name}',
+            'state': step['state'][0],
+            'elapsedraw': step['time']['elapsed'],
+            'ntasks': step['tasks']['count'],
+            'nodelist': step['nodes']['range'],
+            'jobname': step['step']['name'],
+            'alloctres': tres_str(step['tres']['allocated']),
+            'reason': '',
+        }
+        return str(values.get(field.lower(), ''))
+    values = {
+        'jobidraw': job.job_id,
+        'jobid': job.job_id_str,
+        'user': job.user,
+        'uid': job.uid,
+        'account': job.account,
+        'state': job.sacct_state(),
+        'reason': job.reason,
+        'elapsedraw': job.elapsed,
+        'elapsed': fmt_duration(job.elapsed),
+        'timelimitraw': job.time_limit,
+        'timelimit': fmt_duration(job.time_limit * 60),
+        'submit': format_time(job.submit),
+        'start': format_time(job.start),
+        'end': format_time(job.end),
+        'ntasks': '',
+        'reqcpus': job.cpus,
+        'ncpus': job.cpus if job.start else 0,
+        'nnodes': job.node_count,
+        'alloctres': tres_str(job.tres_allocated()),
+        'reqtres': tres_str(job.tres_requested()),
+        'partition': job.partition,
+        'qos': job.qos,
+        'nodelist': job.nodelist,
+        'priority': job.priority,
+        'jobname': job.name,
+        'submitline': job.submit_line,
+        'workdir': job.workdir,
+    }
+    return str(values[field.lower()])
+
+
+def squeue_field(job, field):
+    """The value of a --Format (long) or --format (%) field of squeue."""
+    t = lambda ts: format_time(ts) if ts else 'N/A'
+    values = {
+        # JobID is unique per array task, %i is <array_job_id>_<task>.
+        'jobid': job.job_id, '%A': job.job_id, '%i': job.job_id_str,
+        'username': job.user, '%u': job.user,
+        'account': job.account, '%a': job.account,
+        'state': job.state, '%T': job.state,
+        'reason': job.reason, '%r': job.reason,
+        'starttime': t(job.start), '%S': t(job.start),
+        'endtime': t(job.start + job.time_limit * 60 if job.start else 0),
+        'submittime': t(job.submit), '%V': t(job.submit),
+        'timelimit': fmt_duration(job.time_limit * 60), '%l': fmt_duration(job.time_limit * 60),
+        'timeleft': fmt_duration(job.time_limit * 60 - job.elapsed),
+        '%L': fmt_duration(job.time_limit * 60 - job.elapsed),
+        'numtasks': job.tasks,
+        'numcpus': job.cpus, '%C': job.cpus,
+        'numnodes': job.node_count, '%D': job.node_count,
+        'tres-alloc': tres_str(job.tres_requested()),
+        'partition': job.partition, '%P': job.partition,
+        'qos': job.qos, '%q': job.qos,
+        'nodelist': job.nodelist if job.start else '', '%N': job.nodelist if job.start else '',
+        'prioritylong': job.priority, '%Q': job.priority,
+        'arrayjobid': job.array_job_id or job.job_id, '%F': job.array_job_id or job.job_id,
+        'arraytaskid': 'N/A' if job.array_task_id is None else job.array_task_id,
+        '%K': 'N/A' if job.array_task_id is None else job.array_task_id,
+        'name': job.name, '%j': job.name,
+        'workdir': job.workdir, '%Z': job.workdir,
+        'stdout': job.stdout,
+    }
+    return str(values[field if field.startswith('%') else field.lower()])
+
+
+def _format_percent(spec, job):
+    """squeue --format '%i %j %T'"""
+    out = []
+    i = 0
+    while i < len(spec):
+        if spec[i] == '%':
+            j = i + 1
+            while spec[j] in '.-0123456789':
+                j += 1
+            out.append(squeue_field(job, '%' + spec[j]))
+            i = j + 1
+        else:
+            out.append(spec[i])
+            i += 1
+    return ''.join(out)
+
+
+def _format_long(spec, job):
+    """squeue --Format 'JobID:0|,Name:0' (field[:[.]size][suffix])"""
+    out = []
+    for item in spec.split(','):
+        name, _, rest = item.partition(':')
+        size = rest.lstrip('.').rstrip('|')
+        suffix = rest[len(rest.rstrip('|')):]
+        value = squeue_field(job, name)
+        if size and size != '0':
+            value = value[:int(size)].ljust(int(size))
+        out.append(value + suffix)
+    return ''.join(out)
+
+
+###############################################################################
+# Sources
+###############################################################################
+
+class JobRecord:
+    """The attributes of a job, that the commands use to select the jobs."""
+    __slots__ = (
+        'index', 'job_id', 'job_id_str', 'user', 'submit', 'end', 'state',
+        'account', 'partition', 'name',
+    )
+
+    def __init__(self, *values):
+        for k, v in zip(self.__slots__, values):
+            setattr(self, k, v)
+
+    @property
+    def active(self):
+        return self.state in ACTIVE_STATES
+
+
+class Generated:
+    """Generate everything on each call."""
+    def __init__(self, config):
+        self.config = config
+
+    def jobs(self, indices=None):
+        return iter_jobs(self.config, indices)
+
+    def render(self, name, producer, jobs):
+        for job in jobs:
+            text = producer(job)
+            if text is not None:
+                yield text
+
+    def output(self, name, producer):
+        return producer()
+
+
+class Cached(Generated):
+    """
+    Generate the output of a kind (e.g. the sacct json) for all jobs at once
+    and store it per job in a sqlite database. A call selects the jobs with
+    the index table and copies the stored texts.
+    """
+    def __init__(self, config):
+        super().__init__(config)
+        os.makedirs(config.cache, exist_ok=True)
+        key = hashlib.sha1(json.dumps(config.key()).encode()).hexdigest()[:16]
+        # Concurrent calls (e.g. the shards of sacct.py) wait for the writer.
+        self.db = sqlite3.connect(
+            os.path.join(config.cache, f'cluster-{key}.sqlite'),
+            timeout=24 * 3600, isolation_level=None)
+
+    def _build(self, table, columns, rows):
+        """Create and fill the table, unless another call already did it."""
+        if self._exists(table):
+            return
+        self.db.execute('BEGIN IMMEDIATE')
+        try:
+            if not self._exists(table):
+                self.db.execute(f'CREATE TABLE {table} ({columns})')
+                placeholders = ', '.join('?' * (columns.count(',') + 1))
+                rows = iter(rows)
+                while chunk := list(itertools.islice(rows, 10_000)):
+                    self.db.executemany(f'INSERT INTO {table} VALUES ({placeholders})', chunk)
+            self.db.execute('COMMIT')
+        except BaseException:
+            self.db.execute('ROLLBACK')
+            raise
+
+    def jobs(self, indices=None):
+        self._build(
+            'jobs',
+            'idx INTEGER PRIMARY KEY, ' + ', '.join(JobRecord.__slots__[1:]),
+            (tuple(getattr(job, k) for k in JobRecord.__slots__)
+             for job in iter_jobs(self.config)))
+        query = f'SELECT {", ".join(f.replace("index", "idx") for f in JobRecord.__slots__)} FROM jobs'
+        if indices is None:
+            for row in self.db.execute(query + ' ORDER BY idx'):
+                yield JobRecord(*row)
+            return
+        indices = list(indices)
+        for i in range(0, len(indices), 900):
+            chunk = indices[i:i + 900]
+            yield from (JobRecord(*row) for row in self.db.execute(
+                query + f' WHERE idx IN ({",".join("?" * len(chunk))}) ORDER BY idx', chunk))
+
+    def _exists(self, table):
+        return self.db.execute(
+            'SELECT 1 FROM sqlite_master WHERE name = ?', (table,)).fetchone() is not None
+
+    def render(self, name, producer, jobs):
+        jobs = list(jobs)
+        table = 'f_' + hashlib.sha1(name.encode()).hexdigest()[:16]
+        if len(jobs) <= 100 and not self._exists(table):
+            # e.g. stail: sacct -j, cheaper than generating the output of all jobs.
+            yield from super().render(name, producer, iter_jobs(self.config, [j.index for j in jobs]))
+            return
+        self._build(
+            table, 'idx INTEGER PRIMARY KEY, text',
+            ((job.index, text) for job in iter_jobs(self.config)
+             for text in [producer(job)] if text is not None))
+        for i in range(0, len(jobs), 900):
+            chunk = [j.index for j in jobs[i:i + 900]]
+            for text, in self.db.execute(
+                    f'SELECT text FROM {table} WHERE idx IN ({",".join("?" * len(chunk))}) ORDER BY idx',
+                    chunk):
+                yield text
+
+    def output(self, name, producer):
+        self._build('outputs', 'name TEXT PRIMARY KEY, text', [])
+        row = self.db.execute('SELECT text FROM outputs WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            row = producer(),
+            self.db.execute('INSERT OR REPLACE INTO outputs VALUES (?, ?)', (name, row[0]))
+        return row[0]
+
+
+###############################################################################
+# Commands
+###############################################################################
+
+def _option(argv, *names, default=None):
+    """
+    The value of an option like -S x, -Sx, --starttime x, --starttime=x.
+
+    >>> _option(['-S', 'now', '--format=a,b'], '--format', '-o'), _option(['-Xj1'], '-j')
+    ('a,b', None)
+    """
+    for i, a in enumerate(argv):
+        for name in names:
+            if a == name and i + 1 < len(argv):
+                return argv[i + 1]
+            if a.startswith(name + '=') and name.startswith('--'):
+                return a[len(name) + 1:]
+            if not name.startswith('--') and a.startswith(name) and len(a) > len(name):
+                return a[len(name):]
+    return default
+
+
+def _time_format():
+    return os.environ.get('SLURM_TIME_FORMAT', '')
+
+
+def _select(argv, jobs, state_options, partition_options, name_options):
+    """
+    Filter the jobs like the options of sacct and squeue for the state, the
+    account, the partition and the name. The state is the current state.
+    """
+    selection = {}
+    for names, attribute in [
+            (state_options, 'state'), (['-A', '--account'], 'account'),
+            (partition_options, 'partition'), (name_options, 'name')]:
+        values = _option(argv, *names)
+        if values is not None:
+            selection[attribute] = set(values.split(','))
+    return (
+        job for job in jobs
+        if all(getattr(job, k) in v for k, v in selection.items())
+    )
+
+
+def sacct(argv, out, source):
+    config = source.config
+    user = _option(argv, '-u', '--user')
+    ids = _option(argv, '-j', '--jobs')
+    # Like sacct, only the own jobs, except for --allusers or --jobs.
+    if user is None and ids is None and '--allusers' not in argv and '-a' not in argv:
+        user = config.user
+    allocations = '-X' in argv or '--allocations' in argv
+
+    if ids is None:
+        midnight = int(datetime.datetime.combine(
+            datetime.date.fromtimestamp(config.now), datetime.time()).timestamp())
+        start = parse_time(_option(argv, '-S', '--starttime', default=str(midnight)), config.now)
+        end = parse_time(_option(argv, '-E', '--endtime', default='now'), config.now)
+        jobs = (
+            job for job in source.jobs()
+            if job.submit <= end and (job.end == 0 or job.end >= start)
+        )
+    else:
+        ids = ids.split(',')
+        # Like sacct, the id of an array selects all its tasks.
+        wanted = {i.split('.')[0] for i in ids}
+        indices = set(job_indices(config, ids))
+        for i in job_indices(config, [i for i in wanted if '_' not in i]):
+            first = i // config.array * config.array
+            indices.update(range(first, min(first + config.array, config.jobs)))
+        jobs = (
+            job for job in source.jobs(sorted(indices))
+            if job.job_id_str in wanted or str(job.job_id) in wanted
+            or job.job_id_str.split('_')[0] in wanted
+        )
+    if user is not None:
+        users = set(user.split(','))
+        jobs = (job for job in jobs if job.user in users)
+    jobs = _select(argv, jobs, ['-s', '--state'], ['-r', '--partition'], ['--name'])
+
+    if '--json' in argv:
+        write_json(out, 'jobs', source.render(
+            f'sacct --json {allocations}',
+            lambda job: dump(job.sacct_json(steps=not allocations), config.indent),
+            jobs))
+        return
+
+    raw_fields = _option(argv, '--format', '-o', default='JobID,JobName,Partition,Account,AllocCPUS,State,ExitCode').split(',')
+    fields = [f.split('%')[0] for f in raw_fields]
+    widths = [int(f.split('%')[1]) if '%' in f else None for f in raw_fields]
+    parsable = '--parsable2' in argv or '-P' in argv
+
+    def line(values):
+        if parsable:
+            return '|'.join(values) + '\n'
+        return ' '.join(
+            (v.ljust(-w) if w < 0 else v.rjust(w)) if w else v.ljust(10)[:max(10, len(v))]
+            for v, w in zip(values, widths)) + '\n'
+
+    def producer(job):
+        lines = [line([sacct_field(job, f) for f in fields])]
+        if not allocations:
+            for step in job.steps():
+                lines.append(line([sacct_field(job, f, step) for f in fields]))
+        return ''.join(lines)
+
+    if '--noheader' not in argv and '-n' not in argv:
+        out.write(line(fields))
+    for text in source.render(
+            f'sacct {raw_fields} {parsable} {allocations} {_time_format()}', producer, jobs):
+        out.write(text)
+
+
+def squeue(argv, out, source):
+    config = source.config
+    user = _option(argv, '-u', '--user')
+    jobs = (job for job in source.jobs() if job.active)
+    if user is not None:
+        users = set(user.split(','))
+        jobs = (job for job in jobs if job.user in users)
+    ids = _option(argv, '-j', '--jobs')
+    if ids is not None:
+        ids = set(ids.split(','))
+        # Like squeue, the id of an array selects all its tasks.
+        jobs = (job for job in jobs if job.job_id_str in ids or str(job.job_id) in ids
+                or job.job_id_str.split('_')[0] in ids)
+    jobs = _select(argv, jobs, ['-t', '--states'], ['-p', '--partition'], ['-n', '--name'])
+
+    if '--json' in argv:
+        write_json(out, 'jobs', source.render(
+            'squeue --json', lambda job: dump(job.squeue_json(), config.indent), jobs),
+                   extra={'last_backfill': num(config.now - 20), 'last_update': num(config.now - 5)})
+        return
+
+    long_spec = _option(argv, '--Format', '-O')
+    spec = _option(argv, '--format', '-o', default='%.18i %.9P %.8j %.8u %.2t %.10M %.6D %R')
+    header = '--noheader' not in argv and '-h' not in argv
+    if long_spec is not None:
+        if header:
+            out.write(''.join(f.split(':')[0].upper() + ' ' for f in long_spec.split(',')) + '\n')
+        producer = lambda job: _format_long(long_spec, job) + '\n'
+    else:
+        if header:
+            out.write(spec + '\n')
+        producer = lambda job: _format_percent(spec, job) + '\n'
+    for text in source.render(f'squeue {long_spec} {spec} {_time_format()}', producer, jobs):
+        out.write(text)
+
+
+def scontrol(argv, out, source):
+    config = source.config
+    args = [a for a in argv if not a.startswith('--')]
+    if args[:2] == ['show', 'node'] or args[:2] == ['show', 'nodes']:
+        def producer():
+            nodes = iter_nodes(config)
+            if len(args) > 2:
+                nodes = (n for n in nodes if n['name'] == args[2])
+            f = io.StringIO()
+            write_json(f, 'nodes', (dump(n, config.indent) for n in nodes),
+                       extra={'last_update': num(config.now - 5)})
+            return f.getvalue()
+        out.write(source.output(shlex.join(args), producer))
+    elif args[:2] == ['show', 'reservation']:
+        blocks = []
+        for r in reservations(config):
+            items = [f'{k}={v}' for k, v in r.items()]
+            blocks.append(' '.join(items[:4]) + '\n   ' + ' '.join(items[4:11])
+                          + '\n   ' + items[11] + '\n   ' + ' '.join(items[12:18])
+                          + '\n   ' + ' '.join(items[18:]))
+        out.write('\n\n'.join(blocks) + '\n\n')
+    elif args[:2] == ['show', 'job']:
+        # Like slurmctld, finished jobs are forgotten after MinJobAge (300 s).
+        jobs = [
+            job for job in source.jobs(job_indices(config, args[2:3]) if args[2:] else None)
+            if job.active or job.end >= config.now - 300
+        ]
+        if '--json' in argv:
+            write_json(out, 'jobs', source.render(
+                'squeue --json', lambda job: dump(job.squeue_json(), config.indent), jobs),
+                       extra={'last_backfill': num(config.now - 20), 'last_update': num(config.now - 5)})
+        elif not jobs:
+            sys.stderr.write('slurm_load_jobs error: Invalid job id specified\n')
+            return 1
+        else:
+            out.write('\n'.join(source.render(
+                f'scontrol show job {_time_format()}', Job.scontrol_text, jobs)))
+    else:
+        raise NotImplementedError(argv)
+
+
+def seff(argv, out, source):
+    jobs = list(iter_jobs(source.config, job_indices(source.config, argv[:1])))
+    if not jobs:
+        sys.stderr.write('Job not found.\n')
+        return 2
+    out.write(jobs[0].seff_text())
+
+
+def sinfo(argv, out, source):
+    if '--json' not in argv:
+        raise NotImplementedError(argv)
+
+    def producer():
+        f = io.StringIO()
+        write_json(f, 'nodes', (dump(n, source.config.indent) for n in iter_nodes(source.config)))
+        return f.getvalue()
+    out.write(source.output('sinfo --json', producer))
+
+
+COMMANDS = {
+    'sacct': sacct,
+    'squeue': squeue,
+    'scontrol': scontrol,
+    'seff': seff,
+    'sinfo': sinfo,
+}
+
+
+def main(command, argv):
+    config = Config()
+    source = Generated(config) if config.cache is None else Cached(config)
+    return COMMANDS[command](argv, sys.stdout, source)
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1], sys.argv[2:]))
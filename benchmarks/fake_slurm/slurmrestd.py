@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+"""
+Fake slurmrestd for the synthetic cluster (see cluster.py), to test and
+time the restd backend of the tools without a Slurm cluster.
+
+    python benchmarks/fake_slurm/slurmrestd.py --port 6820
+    CBJ_SMON_BACKEND=restd CBJ_SMON_SLURMRESTD=http://localhost:6820 mon/sacct.py
+
+Endpoints (any API version):
+    /slurm/<version>/jobs       like squeue --json, supports update_time
+    /slurm/<version>/nodes      like scontrol show node --json, supports update_time
+    /slurmdb/<version>/jobs     like sacct --json, supports start_time,
+                                end_time, users, state, account,
+                                partition and job_name
+
+With --responses DIR, the responses are recorded files instead, e.g.
+DIR/slurm/jobs.json, DIR/slurm/nodes.json and DIR/slurmdb/jobs.json, that
+were saved from a real slurmrestd:
+
+    curl -H "X-SLURM-USER-TOKEN: $SLURM_JWT" http://<host>:6820/slurm/v0.0.40/nodes > DIR/slurm/nodes.json
+
+Like slurmrestd, the connections are kept alive (HTTP/1.1).
+"""
+import argparse
+import http.server
+import io
+import json
+import os
+import re
+import socketserver
+import sys
+import urllib.parse
+
+import cluster
+
+ENDPOINT = re.compile(r'^/(slurm|slurmdb)/v[0-9.]+/(jobs|nodes)$')
+
+
+def _respond_cluster(prefix, endpoint, params):
+    config = cluster.Config()
+    source = cluster.Generated(config) if config.cache is None else cluster.Cached(config)
+    out = io.StringIO()
+    if prefix == 'slurmdb' and endpoint == 'jobs':
+        argv = ['--json']
+        for name, option in [
+                ('start_time', '-S'), ('end_time', '-E'), ('users', '-u'),
+                ('state', '-s'), ('account', '-A'), ('partition', '-r'),
+                ('job_name', '--name')]:
+            if name in params:
+                argv += [option, params[name]]
+        if 'users' not in params:
+            argv.append('--allusers')
+        cluster.sacct(argv, out, source)
+    elif prefix == 'slurm':
+        # The fake cluster doesn't change, i.e. all updates are older than
+        # last_update.
+        last_update = config.now - 5
+        if int(params.get('update_time', 0)) >= last_update:
+            return json.dumps({
+                endpoint: [],
+                'last_update': cluster.num(0),
+                'warnings': [], 'errors': [],
+            })
+        if endpoint == 'jobs':
+            cluster.squeue(['--json'], out, source)
+        else:
+            cluster.scontrol(['show', 'node', '--json'], out, source)
+    else:
+        return None
+    return out.getvalue()
+
+
+def _respond_recorded(directory, prefix, endpoint):
+    try:
+        with open(os.path.join(directory, prefix, f'{endpoint}.json')) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    responses_dir = None
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        m = ENDPOINT.match(url.path)
+        if m is None:
+            body = None
+        elif self.responses_dir is not None:
+            body = _respond_recorded(self.responses_dir, *m.groups())
+        else:
+            body = _respond_cluster(*m.groups(), params)
+
+        if body is None:
+            status = 404
+            body = json.dumps({'errors': [{'error': f'Unknown endpoint {url.path}'}]})
+        else:
+            status = 200
+        body = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # The client address of a Unix socket is an empty string.
+        return str(self.client_address[0]) if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class TCPServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    verbose = False
+
+
+class UnixServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+    verbose = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--port', type=int, default=6820)
+    parser.add_argument('--socket', help='Listen on this Unix socket instead of the port.')
+    parser.add_argument('--responses', help='Directory with recorded responses.')
+    parser.add_argument('--verbose', action='store_true', help='Log each request.')
+    args = parser.parse_args()
+
+    Handler.responses_dir = args.responses
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        server = UnixServer(args.socket, Handler)
+        where = f'unix:{args.socket}'
+    else:
+        server = TCPServer(('localhost', args.port), Handler)
+        where = f'http://localhost:{server.server_address[1]}'
+    server.verbose = args.verbose
+    print(f'Serving at {where}', file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""
+Machine readable output of the mon scripts: The raw records (e.g. the
+rows of sacct.py before colorize_table) without colors and without the
+width computation of print_table.
+
+    --format ndjson      A json object per line, written row by row.
+    --format csv         A header line and a line per row.
+    --export FILE        The columns as one file: Parquet (.parquet) or
+                         Arrow (.arrow, .feather) with pyarrow, otherwise
+                         NumPy (.npz, one array per column).
+
+Timestamps are seconds since the epoch and the memory is in MB, i.e. as
+Slurm reports them.
+"""
+import csv
+import json
+import os
+import sys
+from pathlib import Path
+
+FORMATS = ['table', 'ndjson', 'csv']
+SUFFIXES = ['.parquet', '.arrow', '.feather', '.npz']
+
+
+class Export:
+    """
+    The columns of the records: A value is record.get(column), converted
+    with convert[column], and a pair (e.g. elapsed and time limit) is split
+    into the columns split[column].
+
+    >>> export = Export(['JobID', 'Elapsed', 'CEff'],
+    ...                 split={'Elapsed': ('Elapsed', 'Timelimit')},
+    ...                 convert={'CEff': lambda v: None if v == '??' else v})
+    >>> records = [{'JobID': 1, 'Elapsed': (60, 120), 'CEff': 80},
+    ...            {'JobID': 2, 'Elapsed': None, 'CEff': '??', 'State': 'PENDING'}]
+    >>> export.header, export.values(records[1])
+    (['JobID', 'Elapsed', 'Timelimit', 'CEff'], [2, None, None, None])
+    >>> export.write(records, 'ndjson')
+    {"JobID": 1, "Elapsed": 60, "Timelimit": 120, "CEff": 80}
+    {"JobID": 2, "Elapsed": null, "Timelimit": null, "CEff": null}
+    >>> export.write(records, 'csv')
+    JobID,Elapsed,Timelimit,CEff
+    1,60,120,80
+    2,,,
+    >>> export.columns(records)
+    {'JobID': [1, 2], 'Elapsed': [60, None], 'Timelimit': [120, None], 'CEff': [80, None]}
+    """
+    def __init__(self, columns, split=None, convert=None):
+        split = split or {}
+        convert = convert or {}
+        self.header = [n for c in columns for n in split.get(c, (c,))]
+        self._plan = [(c, len(split.get(c, ())), convert.get(c)) for c in columns]
+
+    def values(self, record):
+        values = []
+        for column, n, convert in self._plan:
+            v = record.get(column)
+            if convert is not None:
+                v = convert(v)
+            if n:
+                values.extend([None] * n if v is None else v)
+            else:
+                values.append(v)
+        return values
+
+    def write(self, records, format, file=None):
+        """Write the records as ndjson or csv, one line per record."""
+        if file is None:
+            try:
+                self.write(records, format, sys.stdout)
+                sys.stdout.flush()
+            except BrokenPipeError:
+                # The reader stopped (e.g. | head), hence the remaining
+                # output, also at the exit, goes nowhere.
+                os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+            return
+        header, values = self.header, self.values
+        if format == 'ndjson':
+            dumps = json.JSONEncoder(ensure_ascii=False).encode
+            for record in records:
+                file.write(dumps(dict(zip(header, values(record)))) + '\n')
+        elif format == 'csv':
+            writer = csv.writer(file, lineterminator='\n')
+            writer.writerow(header)
+            writer.writerows(
+                [_csv_value(v) for v in values(record)] for record in records)
+        else:
+            raise ValueError(format, FORMATS)
+
+    def columns(self, records):
+        """The values of each column, i.e. {name: [value per record]}."""
+        rows = [self.values(record) for record in records]
+        return {
+            name: [row[i] for row in rows]
+            for i, name in enumerate(self.header)
+        }
+
+    def save(self, records, path):
+        """
+        Write the columns to path (.parquet, .arrow, .feather or .npz).
+        Without pyarrow, the columns are written to path with the suffix
+        .npz. Returns the written path.
+        """
+        path = Path(path)
+        columns = self.columns(records)
+        if path.suffix in ['.parquet', '.arrow', '.feather']:
+            try:
+                import pyarrow
+            except ImportError:
+                path = path.with_suffix('.npz')
+                print(f'pyarrow is not installed, writing {path}', file=sys.stderr)
+            else:
+                _save_arrow(pyarrow, columns, path)
+                return path
+        if path.suffix != '.npz':
+            raise ValueError(f'Unknown file type: {path}', SUFFIXES)
+        import numpy as np
+        np.savez(path, **{name: _array(np, values) for name, values in columns.items()})
+        return path
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value)
+    return value
+
+
+def _scalar(value):
+    """The value for a string column of a file (nested values as json)."""
+    if value is None:
+        return ''
+    if isinstance(value, (dict, list, tuple)):
+        return json.dumps(value)
+    return str(value)
+
+
+def _array(np, values):
+    """
+    A column as array: int or float (missing values are NaN), otherwise
+    str, i.e. the file can be loaded without pickle.
+
+    >>> import numpy as np
+    >>> _array(np, [1, 2]), _array(np, [1.5, None]), _array(np, ['a', None, 1])
+    (array([1, 2]), array([1.5, nan]), array(['a', '', '1'], dtype='<U1'))
+    """
+    types = {type(v) for v in values}
+    if types <= {int, bool}:
+        return np.array(values, dtype=np.int64)
+    if types <= {int, float, type(None)}:
+        return np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+    return np.array([_scalar(v) for v in values], dtype=str)
+
+
+def _save_arrow(pyarrow, columns, path):
+    arrays = {}
+    for name, values in columns.items():
+        types = {type(v) for v in values if v is not None}
+        if not types <= {int, float, bool, str} or len(types) > 1 and types != {int, float}:
+            # Mixed or nested values, e.g. the gpu column (0 or 'a100:4').
+            values = [None if v is None else _scalar(v) for v in values]
+        arrays[name] = pyarrow.array(values)
+    table = pyarrow.table(arrays)
+    if path.suffix == '.parquet':
+        import pyarrow.parquet
+        pyarrow.parquet.write_table(table, path)
+    else:
+        import pyarrow.feather
+        pyarrow.feather.write_feather(table, path)
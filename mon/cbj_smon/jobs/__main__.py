@@ -0,0 +1,389 @@
+import os
+import sys
+import json
+import argparse
+from cbj_smon.table import print_table
+from cbj_smon.timings import timings
+from cbj_smon.jobs.gather_squeue import gather_squeue
+from cbj_smon.jobs.gather_sacct import gather_sacct
+from cbj_smon.jobs.util import COLUMNS, ALL_COLUMNS, BASE_COLUMNS, colorize_table
+from cbj_smon.jobs.columnar import JobTable
+from cbj_smon.jobs.filters import JobFilter
+
+
+def comma_list(value):
+    """
+    >>> comma_list('User, JobID,,State')
+    ['User', 'JobID', 'State']
+    """
+    return [v.strip() for v in value.split(',') if v.strip()]
+
+
+# The sort keys of --sort: The column and the value of a row for the order.
+SORT_KEYS = {
+    'submit': ('Submit', lambda row: row['Submit']),
+    'start': ('Start', lambda row: row['Start'] or 0),
+    'end': ('End', lambda row: row['End'] or 0),
+    'billing': ('billing', lambda row: -1 if row['billing'] is None else row['billing'][0]),
+    'elapsed': ('Elapsed', lambda row: row['Elapsed'][0]),
+}
+
+# The groups of --group-by: The column and the value of a row for the group.
+GROUP_KEYS = {
+    'User': lambda row: row['User'],
+    'Acc': lambda row: row['Acc'],
+    'Partition': lambda row: row['Partition'],
+    'QoS': lambda row: row['QoS'],
+    'State': lambda row: row['State'].split(' ', 1)[0],  # without reason
+    'Name': lambda row: row['Name'],
+    'Tool': lambda row: row['Tool'],
+}
+
+# The sums of --group-by: The needed columns and the value of a row.
+GROUP_SUMS = {
+    'elapsed h': (('Elapsed',), lambda row: row['Elapsed'][0] / 3600),
+    'cpu h': (('Elapsed', 'cpu'), lambda row: row['Elapsed'][0] * row['cpu'] / 3600),
+    'billing': (('billing',), lambda row: 0 if row['billing'] is None else row['billing'][0]),
+}
+
+# The pairs of the rows, that --format and --export split into two columns.
+EXPORT_SPLIT = {
+    'Elapsed': ('Elapsed', 'Timelimit'),
+    'billing': ('billing', 'billing/h'),
+}
+
+
+def main(*argv):
+    parser = argparse.ArgumentParser(
+        description='Table of the jobs from squeue and sacct.')
+    parser.add_argument(
+        'start', nargs='?', default='now-12hours',
+        help='Start time for sacct, see `man sacct` (-S). Default: now-12hours')
+    parser.add_argument(
+        '--mine', action='store_true', help='Show only the own jobs.')
+    parser.add_argument(
+        '--no-cache', dest='cache', action='store_false',
+        help='Query the whole time range from sacct, '
+             'instead of only the jobs, that were active since the last call, '
+             'and recompute CEff/MEff of finished jobs.')
+    parser.add_argument(
+        '--shard', type=float, default=24,
+        help='Split the sacct query into windows of this many hours, '
+             'that are queried concurrently. 0 disables it. Default: 24')
+    parser.add_argument(
+        '--workers', type=int, default=4,
+        help='Maximum number of concurrent sacct calls. Default: 4')
+    parser.add_argument(
+        '--backend', choices=['json', 'parsable', 'restd'],
+        default=os.environ.get('CBJ_SMON_BACKEND') or 'json',
+        help='json: Use the --json output of squeue and sacct. '
+             'parsable: Request only the used columns (--parsable2, --Format) '
+             'and use json only for the steps, that are necessary for '
+             'CEff and MEff and not yet cached, i.e. with --no-cache and '
+             'CEff/MEff, sacct uses json. '
+             'restd: Ask slurmrestd (see $CBJ_SMON_SLURMRESTD) instead of '
+             'the commands. Default: $CBJ_SMON_BACKEND or json')
+    parser.add_argument(
+        '-X', '--allocations', action='store_true',
+        help='List only the allocations (sacct -X) and fetch the steps only '
+             'for finished jobs, whose CEff/MEff is not yet cached. '
+             'Running jobs show no CEff/MEff.')
+    parser.add_argument(
+        '--timings', nargs='?', const='-', metavar='FILE',
+        help='Report the time of each phase and of the slurm commands. '
+             'Without FILE as summary on stderr, otherwise append a json '
+             'line to FILE. Default: $CBJ_SMON_TIMINGS')
+    parser.add_argument(
+        '--columns', type=comma_list,
+        help='Comma separated columns to show, e.g. User,JobID,State,Nodes. '
+             'Only these are requested from slurm and computed, e.g. seff '
+             'runs only for CEff and MEff. '
+             f'Choices: {",".join(COLUMNS)}. Default: all')
+    parser.add_argument(
+        '--collapse-arrays', action='store_true',
+        help='Show one row per job array with the count of each state, the '
+             '(min-max) and median of the elapsed time, the summed billing '
+             'and the mean CEff and MEff of its tasks.')
+    parser.add_argument(
+        '--expand-array', type=int, action='append', default=[], metavar='ID',
+        help='With --collapse-arrays, show the tasks of this array.')
+    parser.add_argument(
+        '--sort', choices=list(SORT_KEYS), default='submit',
+        help='Order of the rows. Default: submit')
+    parser.add_argument(
+        '--limit', type=int,
+        help='Show only the last LIMIT rows of the order, e.g. the newest '
+             'jobs. Only these rows are formatted.')
+    parser.add_argument(
+        '--page', type=int, default=1,
+        help='With --limit, show the PAGE-th block of LIMIT rows, counted '
+             'from the end. Default: 1')
+    parser.add_argument(
+        '--group-by', choices=list(GROUP_KEYS), metavar='COLUMN',
+        help='Instead of the jobs, show for each value of COLUMN the number '
+             'of jobs and the summed elapsed time, cpu time and billing, '
+             'e.g. the billing per account. '
+             f'Choices: {",".join(GROUP_KEYS)}')
+    parser.add_argument(
+        '--changes', action='store_true',
+        help='Show only the jobs, that are new or changed (state, nodes or '
+             'elapsed time in steps of 10 %% of the limit) since the last '
+             'call with the same options, and the vanished jobs.')
+    parser.add_argument(
+        '--summary', action='store_true',
+        help='With --changes, print the number of new, changed, vanished '
+             'and unchanged jobs.')
+    parser.add_argument(
+        '--follow', action='store_true',
+        help='Instead of the table, poll the jobs until interrupted and '
+             'print a line for each state transition, e.g. PENDING -> '
+             'RUNNING. Each poll is one squeue and one sacct call.')
+    parser.add_argument(
+        '--hook', metavar='CMD',
+        help='With --follow, run the shell command CMD for each transition '
+             'with the environment variables SMON_JOB_ID, SMON_JOB_USER, '
+             'SMON_JOB_NAME, SMON_OLD_STATE and SMON_NEW_STATE, e.g. '
+             '\'notify-send "$SMON_JOB_ID $SMON_NEW_STATE"\'.')
+    parser.add_argument(
+        '--interval', type=float, default=10,
+        help='With --follow, the seconds between the polls. Without a '
+             'transition, the interval doubles up to --max-interval. '
+             'Default: 10')
+    parser.add_argument(
+        '--max-interval', type=float, default=300,
+        help='With --follow, the maximal interval. Default: 300')
+    parser.add_argument(
+        '--format', choices=['table', 'ndjson', 'csv'], default='table',
+        help='ndjson or csv: Instead of the table, write the raw values of '
+             'the rows (e.g. timestamps, memory in MB, the elapsed time and '
+             'the time limit in seconds), without colors. Default: table')
+    parser.add_argument(
+        '--export', metavar='FILE',
+        help='Instead of the table, write the columns of the rows to FILE: '
+             '.parquet, .arrow or .feather (needs pyarrow, otherwise '
+             '.npz is written) or .npz (NumPy).')
+    filters = parser.add_argument_group(
+        'filters',
+        'Comma separated lists, that are passed to sacct and squeue, i.e. '
+        'slurm sends only the matching jobs.')
+    filters.add_argument(
+        '--state', type=comma_list, default=[],
+        help='e.g. FAILED,TIMEOUT or F,TO (sacct -s, squeue -t). '
+             'Note: The current state of the job matters.')
+    filters.add_argument(
+        '--user', type=comma_list, default=[], help='(sacct -u, squeue -u)')
+    filters.add_argument(
+        '--account', type=comma_list, default=[],
+        help='Also the short name of the column Acc, i.e. without hpc-prf- '
+             '(sacct -A, squeue -A)')
+    filters.add_argument(
+        '--partition', type=comma_list, default=[], help='(sacct -r, squeue -p)')
+    filters.add_argument(
+        '--name', type=comma_list, default=[],
+        help='Job names (sacct --name, squeue -n)')
+    args = parser.parse_args(['--mine' if a == 'mine' else a for a in argv])
+    if args.timings:
+        timings.enable(args.timings)
+
+    if args.columns:
+        unknown = [c for c in args.columns if c not in ALL_COLUMNS]
+        if unknown:
+            parser.error(f'Unknown columns: {", ".join(unknown)}. '
+                         f'Choices: {", ".join(COLUMNS)}')
+        columns = BASE_COLUMNS | frozenset(args.columns)
+    else:
+        columns = None
+
+    if args.mine and args.user:
+        parser.error('--mine and --user exclude each other.')
+    if args.limit is not None and args.limit < 1 or args.page < 1:
+        parser.error('--limit and --page have to be positive.')
+    sort_column, sort_key = SORT_KEYS[args.sort]
+    if args.group_by and (args.collapse_arrays or args.changes):
+        parser.error('--group-by excludes --collapse-arrays and --changes.')
+    export = args.format != 'table' or args.export
+    if export and (args.collapse_arrays or args.changes or args.follow):
+        parser.error('--format and --export exclude --collapse-arrays, '
+                     '--changes and --follow.')
+    if args.format != 'table' and args.export:
+        parser.error('--format and --export exclude each other.')
+    if args.export:
+        from cbj_smon.export import SUFFIXES
+
+        if os.path.splitext(args.export)[1] not in SUFFIXES:
+            parser.error(f'--export: Unknown file type. Choices: {", ".join(SUFFIXES)}')
+    job_filter = JobFilter(
+        states=args.state, users=args.user, accounts=args.account,
+        partitions=args.partition, names=args.name)
+    if args.hook and not args.follow:
+        parser.error('--hook needs --follow.')
+    if args.follow:
+        from cbj_smon.jobs.follow import follow
+
+        if args.interval <= 0:
+            parser.error('--interval has to be positive.')
+        try:
+            follow(
+                args.start, mine=args.mine, backend=args.backend,
+                job_filter=job_filter, cache=args.cache, hook=args.hook,
+                minimum=args.interval, maximum=args.max_interval)
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if args.collapse_arrays:
+        columns = (ALL_COLUMNS if columns is None else columns) | {'Array'}
+    if columns is not None:
+        # The matching and the order need the fields of these columns.
+        columns |= job_filter.columns | {sort_column}
+        if args.group_by:
+            columns |= {args.group_by}
+            columns |= {c for needed, _ in GROUP_SUMS.values() for c in needed}
+        if args.changes:
+            columns |= {'State', 'Elapsed', 'Nodes'}  # see fingerprint
+
+    # slurmctld (squeue) and slurmdbd (sacct) are independent, hence query
+    # them concurrently. The parsing overlaps with the waiting.
+    # (Imported here, because it imports logging, i.e. not for --help.)
+    import concurrent.futures
+    with concurrent.futures.ThreadPoolExecutor(2) as pool:
+        squeue_future = pool.submit(
+            gather_squeue, mine=args.mine, backend=args.backend,
+            columns=columns, job_filter=job_filter)
+        sacct_future = pool.submit(
+            gather_sacct, args.start, mine=args.mine, cache=args.cache,
+            shard=args.shard * 3600, workers=args.workers,
+            backend=args.backend, allocations=args.allocations,
+            columns=columns, job_filter=job_filter)
+        table, _ = squeue_future.result()
+        table2, _ = sacct_future.result()
+
+    # squeue is more recent than sacct.
+    table = {**table2, **table}
+    if args.collapse_arrays:
+        from cbj_smon.jobs.arrays import collapse_arrays
+
+        with timings.phase('collapse_arrays'):
+            table = collapse_arrays(table, expand=args.expand_array)
+
+    if args.changes:
+        from cbj_smon.jobs.changes import DeltaView
+
+        with timings.phase('changes'):
+            total = len(table)
+            table, gone = DeltaView(json.dumps([
+                args.start, args.mine, job_filter.key(),
+                args.collapse_arrays, sorted(args.expand_array),
+            ])).update(table)
+
+    jobs = JobTable(table)
+    if args.changes:
+        changed = len(jobs.filter(jobs.isin(lambda row: row['Change'], {'changed'})))
+        summary = (
+            f'{len(jobs) - changed} new, {changed} changed, '
+            f'{len(gone)} gone, {total - len(jobs)} unchanged')
+
+    if export:
+        # (Imported here, because only the export needs csv.)
+        from cbj_smon.export import Export
+
+    if args.group_by:
+        with timings.phase('group_by'):
+            groups = jobs.group_sum(
+                GROUP_KEYS[args.group_by], [key for _, key in GROUP_SUMS.values()])
+        groups = [
+            {args.group_by: value, 'jobs': count, **dict(zip(GROUP_SUMS, sums))}
+            for value, (count, *sums) in sorted(
+                groups.items(), key=lambda item: item[1][-1], reverse=True)
+        ]
+        if export:
+            write_export(args, Export([args.group_by, 'jobs', *GROUP_SUMS]), groups)
+            return
+        with timings.phase('print_table'):
+            print_table([
+                {k: round(v) if k in GROUP_SUMS else v for k, v in row.items()}
+                for row in groups
+            ], sep='  ', just='lrrrr')
+        return
+
+    # Select the shown rows first, i.e. only they are formatted.
+    with timings.phase('select_rows'):
+        table = jobs.to_dict(jobs.argsort(sort_key, args.limit, args.page))
+
+    if export:
+        from cbj_smon.jobs.seff import plain_seff
+
+        write_export(args, Export(
+            args.columns or COLUMNS, split=EXPORT_SPLIT,
+            convert={'CEff': plain_seff, 'MEff': plain_seff},
+        ), table.values())
+        return
+
+    with timings.phase('colorize_table'):
+        table = colorize_table(table, args.columns and frozenset(args.columns))
+
+    just = {
+        'User': 'l',
+        'JobID': 'r',
+        'Name': 'l',
+        'State': 'l',
+        'Elapsed hh:mm': 'r',
+        'Submit': 'r',
+        'Start': 'r',
+        'End': 'r',
+        'n': 'r',
+        'cpu': 'r',
+        'gpu': 'r',
+        'mem': 'r',
+        'CEff': 'r',
+        'MEff': 'r',
+        'billing': 'r',
+        'N': 'r',
+        'Partition': 'r',
+        'Acc': 'l',
+        'QoS': 'l',
+        'Nodes': 'l',
+        'Priority': 'r',
+        'Tool': 'l',
+    }
+    if args.changes:
+        just['Change'] = 'l'
+    for v in table.values():
+        v['Elapsed hh:mm'] = v.pop('Elapsed', None)
+
+    if args.columns:
+        # The order of just is the order of the columns.
+        shown = ['Elapsed hh:mm' if k == 'Elapsed' else k for k in args.columns]
+        if args.changes:
+            shown.append('Change')
+        just = {k: just[k] for k in shown}
+        table = {k: {c: v[c] for c in shown if c in v} for k, v in table.items()}
+
+    with timings.phase('print_table'):
+        if table or not args.changes:
+            # Without changes, no table instead of a lone rule.
+            print_table(list(table.values()), sep='  ', just=just)
+        if args.changes and gone:
+            print_table([
+                {'User': user, 'JobID': job_id,
+                 'State': ' '.join(f'{s}:{n}' for s, n in state) if isinstance(state, list) else state,
+                 'Change': 'gone'}
+                for job_id, (user, state, _, _) in gone.items()
+            ], sep='  ', just='lrll', repeat_header=None)
+
+    if args.changes and args.summary:
+        print(summary)
+
+
+def write_export(args, export, records):
+    """Write the records for --format or --export."""
+    with timings.phase('export'):
+        if args.export:
+            export.save(records, args.export)
+        else:
+            export.write(records, args.format)
+
+
+if __name__ == '__main__':
+    with timings.session('sacct.py'):
+        main(*sys.argv[1:])
@@ -0,0 +1,130 @@
+import re
+import collections
+
+from cbj_smon.jobs.seff import format_seff
+
+
+def count_array_tasks(task_string):
+    """
+    The number of tasks in an array task string, e.g. of a pending array.
+
+    >>> count_array_tasks('0-99%10'), count_array_tasks('1,3,5-7'), count_array_tasks('0-15:4')
+    (100, 5, 4)
+    """
+    count = 0
+    for part in task_string.split('%')[0].split(','):
+        part, _, step = part.partition(':')
+        first, _, last = part.partition('-')
+        count += (int(last or first) - int(first)) // int(step or 1) + 1
+    return count
+
+
+def array_value(array_job_id, task_id, task_string):
+    """
+    The value of the Array column: The array id and the number of tasks,
+    that the job represents (slurm lists the pending tasks of an array as
+    one job), or None for jobs, that are no array task.
+
+    >>> array_value(4000010, 3, ''), array_value(4000010, None, '5-9'), array_value(0, None, '')
+    ([4000010, 1], [4000010, 5], None)
+    """
+    if not array_job_id:
+        return None
+    if task_id is None and task_string:
+        return [array_job_id, count_array_tasks(task_string)]
+    return [array_job_id, 1]
+
+
+def _common(values):
+    """The value, if all are equal, otherwise '*'."""
+    first = values[0]
+    return first if all(v == first for v in values) else '*'
+
+
+def _maximum(values):
+    numbers = [v for v in values if isinstance(v, (int, float))]
+    return max(numbers) if numbers else values[0]
+
+
+def _seff_number(value):
+    """
+    >>> from cbj_smon.jobs.util import c
+    >>> _seff_number(80), _seff_number(f'{c.green}80{c.end}'), _seff_number('??')
+    (80, 80, None)
+    """
+    if isinstance(value, int):
+        return value
+    m = re.fullmatch(r'(?:\x1b\[[0-9;]*m)?(\d+)(?:\x1b\[[0-9;]*m)?', str(value))
+    return int(m.group(1)) if m else None
+
+
+def _array_row(array_id, rows):
+    """Aggregate the rows of the tasks of one array, see collapse_arrays."""
+    import statistics
+
+    row = {}
+    for k in dict.fromkeys(k for r, _ in rows for k in r):
+        values = [r[k] for r, _ in rows if k in r]
+        if k == 'JobID':
+            row[k] = f'{array_id}_*'
+        elif k == 'State':
+            # The first word is the state, e.g. 'CANCELLED by cbj'.
+            counts = collections.Counter()
+            for r, n in rows:
+                counts[r['State'].split(' ')[0].split(',')[0]] += n
+            row[k] = dict(counts)
+        elif k == 'Elapsed':
+            elapsed = [e for e, _ in values]
+            row[k] = [
+                round(statistics.median(elapsed)), max(limit for _, limit in values),
+                min(elapsed), max(elapsed),
+            ]
+        elif k in ['Submit', 'Start']:
+            row[k] = min([v for v in values if v] or [0])
+        elif k in ['End', 'n', 'cpu', 'mem', 'N', 'Priority']:
+            row[k] = _maximum(values)
+        elif k == 'billing':
+            values = [v for v in values if v is not None]
+            row[k] = [sum(v[0] for v in values), sum(v[1] for v in values)] if values else None
+        elif k in ['CEff', 'MEff']:
+            numbers = [n for n in map(_seff_number, values) if n is not None]
+            if numbers:
+                row[k] = format_seff(*[round(statistics.mean(numbers))] * 2)[k]
+            else:
+                row[k] = '??'
+        elif k == 'Tool':
+            row[k] = ','.join(sorted(set(values)))
+        else:
+            row[k] = _common(values)
+    return row
+
+
+def collapse_arrays(table, expand=()):
+    """
+    Replace the rows of the tasks of each job array (see the Array column)
+    with one row for the array, i.e. the formatting and the output scale
+    with the number of arrays instead of the number of tasks. The row has
+    the count of each state, the median, limit, min and max of the elapsed
+    time, the summed billing and the mean CEff and MEff. The arrays in
+    expand keep their task rows.
+
+    >>> table = {
+    ...     1: {'JobID': 1, 'State': 'RUNNING', 'Elapsed': [60, 120], 'Array': [1, 1]},
+    ...     2: {'JobID': 2, 'State': 'COMPLETED', 'Elapsed': [30, 120], 'Array': [1, 1]},
+    ...     3: {'JobID': 3, 'State': 'PENDING', 'Elapsed': [0, 120], 'Array': [1, 8]},
+    ...     4: {'JobID': 4, 'State': 'RUNNING', 'Elapsed': [10, 60], 'Array': None},
+    ... }
+    >>> collapse_arrays(table)
+    {4: {'JobID': 4, 'State': 'RUNNING', 'Elapsed': [10, 60]}, 1: {'JobID': '1_*', 'State': {'RUNNING': 1, 'COMPLETED': 1, 'PENDING': 8}, 'Elapsed': [30, 120, 0, 60]}}
+    """
+    collapsed = {}
+    arrays = {}
+    for job_id, row in table.items():
+        array = row.pop('Array', None)
+        if array is None or array[0] in expand:
+            collapsed[job_id] = row
+        else:
+            arrays.setdefault(array[0], []).append((row, array[1]))
+    for array_id, rows in arrays.items():
+        collapsed[array_id] = _array_row(array_id, rows)
+    return collapsed
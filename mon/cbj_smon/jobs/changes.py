@@ -0,0 +1,101 @@
+import os
+import json
+import hashlib
+import tempfile
+
+from cbj_smon.jobs.store import default_cache_dir
+
+# The fingerprints of the last run of each view, when the runs share the
+# process (vatch.py --py). Otherwise, they are read from the state file.
+_last_fingerprints = {}
+
+
+def fingerprint(row):
+    """
+    The compact state of a row, a job is shown again, when it changes: The
+    user, the state, the elapsed time in steps of 10 % of the limit and the
+    nodes.
+
+    >>> fingerprint({'User': 'cbj', 'State': 'RUNNING', 'Elapsed': [3600, 36000], 'Nodes': 'n1'})
+    ['cbj', 'RUNNING', 1, 'n1']
+    >>> fingerprint({'User': 'cbj', 'State': {'RUNNING': 2, 'PENDING': 1}, 'Elapsed': [0, 0, 0, 0]})
+    ['cbj', [['PENDING', 1], ['RUNNING', 2]], 0, None]
+    """
+    state = row.get('State')
+    if isinstance(state, dict):
+        # The state counts of an array (see collapse_arrays).
+        state = sorted([k, v] for k, v in state.items())
+    elapsed = row.get('Elapsed')
+    if elapsed is None:
+        bucket = None
+    elif elapsed[1]:
+        bucket = int(10 * elapsed[0] / elapsed[1])
+    else:
+        bucket = int(elapsed[0] // 3600)
+    return [row.get('User'), state, bucket, row.get('Nodes')]
+
+
+class DeltaView:
+    """
+    The changes of the table since the last run of the same view (key):
+    The new and the changed rows and the vanished jobs. The fingerprints of
+    the jobs are kept in a small state file.
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as tmp:
+    ...     view = DeltaView('test', cache_dir=tmp)
+    ...     _last_fingerprints.clear()  # Like a new process.
+    ...     rows = lambda *states: {i: {'User': 'cbj', 'State': s} for i, s in enumerate(states)}
+    ...     view.update(rows('PENDING', 'RUNNING'))
+    ...     _last_fingerprints.clear()
+    ...     view.update(rows('RUNNING', 'RUNNING'))
+    ...     view.update({1: {'User': 'cbj', 'State': 'RUNNING'}})
+    ({0: {'User': 'cbj', 'State': 'PENDING', 'Change': 'new'}, 1: {'User': 'cbj', 'State': 'RUNNING', 'Change': 'new'}}, {})
+    ({0: {'User': 'cbj', 'State': 'RUNNING', 'Change': 'changed'}}, {})
+    ({}, {'0': ['cbj', 'RUNNING', None, None]})
+    """
+    def __init__(self, key, cache_dir=None):
+        self.key = key
+        name = hashlib.sha1(key.encode()).hexdigest()[:16]
+        self.path = os.path.join(
+            cache_dir or default_cache_dir(), f'sacct-changes-{name}.json')
+
+    def _load(self):
+        if self.path in _last_fingerprints:
+            return _last_fingerprints[self.path]
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, fingerprints):
+        _last_fingerprints[self.path] = fingerprints
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+                'w', dir=os.path.dirname(self.path), suffix='.tmp',
+                delete=False) as f:
+            json.dump(fingerprints, f)
+        os.replace(f.name, self.path)
+
+    def update(self, table):
+        """
+        Returns the new and the changed rows, marked in the column Change,
+        and the fingerprints of the vanished jobs. Remembers the table for
+        the next run.
+        """
+        previous = self._load()
+        current = {str(k): fingerprint(row) for k, row in table.items()}
+        changed = {}
+        for k, row in table.items():
+            old = previous.get(str(k))
+            if old is None:
+                row['Change'] = 'new'
+            elif old != current[str(k)]:
+                row['Change'] = 'changed'
+            else:
+                continue
+            changed[k] = row
+        gone = {k: v for k, v in previous.items() if k not in current}
+        self._save(current)
+        return changed, gone
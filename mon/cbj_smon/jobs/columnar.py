@@ -0,0 +1,163 @@
+import sys
+import heapq
+import itertools
+
+
+class JobTable:
+    """
+    Columnar view of a table (job_id -> row, e.g. JobRow) for the order,
+    the selection and the aggregation of the rows: A key (a function of a
+    row, e.g. the submit time) is evaluated once per row into a column,
+    numeric columns are float arrays and the other values are categorical
+    codes (an int per row and the list of the distinct values). The
+    operations work on the columns and return positions, i.e. only the
+    rows, that are finally shown, are touched again (see to_dict).
+
+    With NumPy the operations are vectorized (e.g. argpartition for the
+    top rows and bincount for the sums of the groups), without NumPy the
+    same is done in Python. The import of NumPy takes longer (ca. 0.1 s)
+    than it saves for less than NUMPY_MIN_JOBS rows, hence by default
+    NumPy is only used for many rows or when it is already imported.
+
+    >>> table = {i: {'v': v, 'g': g} for i, (v, g) in enumerate(
+    ...     [(5, 'a'), (3, 'b'), (9, 'a'), (1, 'c'), (7, 'b'), (3, 'a')])}
+    >>> key = lambda row: row['v']
+    >>> for use_numpy in [True, False]:
+    ...     jobs = JobTable(table, use_numpy=use_numpy)
+    ...     print(jobs.argsort(key), jobs.argsort(key, limit=2),
+    ...           jobs.argsort(key, limit=2, page=2), jobs.argsort(key, limit=4, page=2))
+    [3, 1, 5, 0, 4, 2] [4, 2] [5, 0] [3, 1]
+    [3, 1, 5, 0, 4, 2] [4, 2] [5, 0] [3, 1]
+    >>> jobs = JobTable(table, use_numpy=True)
+    >>> list(jobs.filter(jobs.isin(lambda row: row['g'], {'a', 'c'})).to_dict())
+    [0, 2, 3, 5]
+    >>> jobs.group_sum(lambda row: row['g'], [key, lambda row: 1.5])
+    {'a': [3, 17.0, 4.5], 'b': [2, 10.0, 3.0], 'c': [1, 1.0, 1.5]}
+    >>> JobTable(table, use_numpy=False).group_sum(lambda row: row['g'], [key])
+    {'a': [3, 17.0], 'b': [2, 10.0], 'c': [1, 1.0]}
+    """
+    NUMPY_MIN_JOBS = 50_000
+
+    def __init__(self, table, use_numpy=None):
+        self.ids = list(table)
+        self.rows = list(table.values())
+        if use_numpy is None:
+            use_numpy = len(self) >= self.NUMPY_MIN_JOBS or 'numpy' in sys.modules
+        self.np = None
+        if use_numpy:
+            try:
+                import numpy as np
+            except ImportError:
+                pass
+            else:
+                self.np = np
+        self._columns = {}
+        self._codes = {}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def column(self, key):
+        """The numeric values key(row) of all rows."""
+        if key not in self._columns:
+            values = list(map(key, self.rows))
+            if self.np is not None:
+                values = self.np.array(values, dtype=self.np.float64)
+            self._columns[key] = values
+        return self._columns[key]
+
+    def codes(self, key):
+        """The codes of the values key(row) and the distinct values."""
+        if key not in self._codes:
+            index = {}
+            codes = [index.setdefault(v, len(index)) for v in map(key, self.rows)]
+            if self.np is not None:
+                codes = self.np.array(codes, dtype=self.np.intp)
+            self._codes[key] = codes, list(index)
+        return self._codes[key]
+
+    def isin(self, key, values):
+        """The mask of the rows, whose key(row) is one of the values."""
+        codes, categories = self.codes(key)
+        wanted = [c in values for c in categories]
+        if self.np is not None:
+            return self.np.array(wanted, dtype=bool)[codes]
+        return [wanted[c] for c in codes]
+
+    def filter(self, mask):
+        """The JobTable of the rows, where the mask is true."""
+        if self.np is not None:
+            positions = self.np.flatnonzero(mask).tolist()
+        else:
+            positions = list(itertools.compress(range(len(self)), mask))
+        return JobTable(self.to_dict(positions), use_numpy=self.np is not None)
+
+    def argsort(self, key, limit=None, page=1):
+        """
+        The positions of the rows sorted by key(row). With limit, only the
+        page-th block of limit rows, counted from the largest key (e.g.
+        page 1 are the newest jobs), selected without sorting all rows.
+        Equal keys keep the order of the table.
+        """
+        values = self.column(key)
+        if self.np is None:
+            if limit is None:
+                return sorted(range(len(self)), key=values.__getitem__)
+            # The position breaks ties.
+            selected = heapq.nlargest(limit * page, zip(values, itertools.count()))
+            return [i for _, i in selected[limit * (page - 1):][::-1]]
+
+        if limit is None:
+            return self.np.argsort(values, kind='stable').tolist()
+        order = self._top(values, limit * page)
+        return order[:max(0, len(order) - limit * (page - 1))].tolist()
+
+    def _top(self, values, k):
+        """The positions of the k largest values in ascending order."""
+        np = self.np
+        n = len(values)
+        if k >= n:
+            return np.argsort(values, kind='stable')
+        threshold = np.partition(values, n - k)[n - k]
+        above = np.flatnonzero(values > threshold)
+        # Of the equal values at the threshold, the last rows are larger.
+        ties = np.flatnonzero(values == threshold)
+        selected = np.concatenate([ties[len(ties) - (k - len(above)):], above])
+        selected.sort()
+        return selected[np.argsort(values[selected], kind='stable')]
+
+    def group_sum(self, by, keys):
+        """
+        For each value of by(row): The number of rows and the sum of each
+        key(row) of keys, i.e. {value: [count, sum, ...]}. The values are
+        in the order of their first row.
+        """
+        codes, categories = self.codes(by)
+        if self.np is not None:
+            n = len(categories)
+            counts = self.np.bincount(codes, minlength=n).tolist()
+            sums = [
+                self.np.bincount(codes, weights=self.column(key), minlength=n).tolist()
+                for key in keys
+            ]
+        else:
+            counts = [0] * len(categories)
+            for c in codes:
+                counts[c] += 1
+            sums = []
+            for key in keys:
+                s = [0.0] * len(categories)
+                for c, v in zip(codes, self.column(key)):
+                    s[c] += v
+                sums.append(s)
+        return {
+            value: [counts[i], *[s[i] for s in sums]]
+            for i, value in enumerate(categories)
+        }
+
+    def to_dict(self, positions=None):
+        """The table (job_id -> row) of the rows at positions, in that order."""
+        if positions is None:
+            return dict(zip(self.ids, self.rows))
+        ids, rows = self.ids, self.rows
+        return {ids[i]: rows[i] for i in positions}
@@ -0,0 +1,154 @@
+"""
+Bundle the modules of cbj_smon.jobs into a single script:
+
+    python -m cbj_smon.jobs.create_bin [output]
+
+The modules are concatenated in the order of MODULES and the imports between
+them are commented out. The imports of the other cbj_smon modules (table,
+timings, snapshot, restd) stay, i.e. the script needs cbj_smon next to it,
+but it needs no jobs package. This module is the build step, it is not
+part of the output.
+"""
+import ast
+import os
+import sys
+from pathlib import Path
+
+# Dependency order: A module is after the modules it imports at import
+# time. __main__ is always the last.
+MODULES = [
+    'util',
+    'rows',
+    'seff',
+    'store',
+    'parsable',
+    'filters',
+    'arrays',
+    'columnar',
+    'changes',
+    'gather_sacct',
+    'gather_squeue',
+    'follow',
+]
+
+
+def _is_bundled(node):
+    return (
+        isinstance(node, ast.ImportFrom)
+        and node.module is not None
+        and node.module.startswith('cbj_smon.jobs')
+    )
+
+
+def adjust_imports(content, file=None, main=False):
+    """
+    Comment out the imports of the bundled modules. An import in a block
+    (e.g. on demand in a branch) becomes a pass.
+
+    >>> print(adjust_imports(
+    ...     'import os\\n'
+    ...     'from cbj_smon.table import print_table\\n'
+    ...     'from cbj_smon.jobs.util import c\\n'
+    ...     'if os:\\n'
+    ...     '    from cbj_smon.jobs.seff import (\\n'
+    ...     '        SeffBatch)\\n'
+    ... ))
+    import os
+    from cbj_smon.table import print_table
+    # from cbj_smon.jobs.util import c
+    if os:
+        pass  # from cbj_smon.jobs.seff import (
+        #     SeffBatch)
+    >>> adjust_imports('from cbj_smon.jobs import util')
+    Traceback (most recent call last):
+    ...
+    ValueError: ('Modules cannot be bundled:', 'from cbj_smon.jobs import util', None)
+    >>> adjust_imports('if __name__ == "__main__":\\n    main()')
+    'if False:  # if __name__ == "__main__":\\n    main()'
+    """
+    tree = ast.parse(content)
+    lines = content.splitlines()
+
+    for node in ast.walk(tree):
+        if (
+            isinstance(node, ast.Import)
+            and any(alias.name.startswith('cbj_smon.jobs') for alias in node.names)
+            or isinstance(node, ast.ImportFrom) and node.level
+            or _is_bundled(node) and node.module == 'cbj_smon.jobs'
+        ):
+            # The module objects don't exist in the bundle.
+            raise ValueError('Modules cannot be bundled:', ast.get_source_segment(content, node), file)
+
+    for node in ast.walk(tree):
+        if not _is_bundled(node):
+            continue
+        first, last = node.lineno - 1, node.end_lineno - 1
+        indent = lines[first][:node.col_offset]
+        if node.col_offset:
+            lines[first] = f'{indent}pass  # {lines[first][node.col_offset:]}'
+        else:
+            lines[first] = f'# {lines[first]}'
+        for i in range(first + 1, last + 1):
+            lines[i] = f'{indent}# {lines[i][len(indent):]}'
+
+    if not main:
+        for node in tree.body:
+            if isinstance(node, ast.If) and ast.unparse(node.test) in [
+                    "__name__ == '__main__'", '__name__ == "__main__"']:
+                lines[node.lineno - 1] = f'if False:  # {lines[node.lineno - 1]}'
+
+    return '\n'.join(lines)
+
+
+def extract_definitions(file_content):
+    tree = ast.parse(file_content)
+    definitions = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.ClassDef, ast.Assign)):
+            if isinstance(node, ast.Assign):
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        definitions.add(target.id)
+            else:
+                definitions.add(node.name)
+    return definitions
+
+
+def concatenate_files(py_files, main_file, output_file):
+    all_definitions = set()
+    parts = ['#!/usr/bin/env python\n']
+
+    for file in [*py_files, main_file]:
+        content = Path(file).read_text()
+        definitions = extract_definitions(content)
+
+        # Check for conflicts
+        conflict = all_definitions.intersection(definitions)
+        if conflict:
+            raise ValueError(f"Conflict detected in file {file}: {conflict}")
+        all_definitions.update(definitions)
+
+        parts.append(f'# From cbj_smon/jobs/{Path(file).name}')
+        parts.append(adjust_imports(content, file=file, main=file == main_file))
+        parts.append('\n')
+
+    output = '\n'.join(parts)
+    compile(output, str(output_file), 'exec')
+    Path(output_file).write_text(output)
+
+
+def main(output_file=None):
+    package_dir = Path(__file__).parent
+    if output_file is None:
+        output_file = package_dir.parent.parent / 'bin' / 'smon_jobs.py'
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+
+    py_files = [package_dir / f'{name}.py' for name in MODULES]
+    concatenate_files(py_files, package_dir / '__main__.py', output_file)
+    os.chmod(output_file, 0o755)
+    print(f'Created {output_file}')
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -0,0 +1,134 @@
+import shlex
+
+# The short state names, that sacct and squeue accept.
+STATE_CODES = {
+    'BF': 'BOOT_FAIL', 'CA': 'CANCELLED', 'CD': 'COMPLETED',
+    'CF': 'CONFIGURING', 'CG': 'COMPLETING', 'DL': 'DEADLINE', 'F': 'FAILED',
+    'NF': 'NODE_FAIL', 'OOM': 'OUT_OF_MEMORY', 'PD': 'PENDING',
+    'PR': 'PREEMPTED', 'R': 'RUNNING', 'RQ': 'REQUEUED', 'RS': 'RESIZING',
+    'RV': 'REVOKED', 'S': 'SUSPENDED', 'TO': 'TIMEOUT',
+}
+
+
+class JobFilter:
+    """
+    Select the jobs by state, user, account, partition and name. Each
+    option is a list and a job matches, when it matches all given options.
+
+    The options are passed to sacct, squeue and slurmrestd, i.e. slurm sends
+    only the matching jobs. The parsed jobs are matched again, because some
+    sources don't filter (the snapshot of smond.py, the job list of
+    slurmrestd) and `sacct -s` selects the state during the time window,
+    while the table shows the current state.
+
+    >>> f = JobFilter(states=['f', 'TIMEOUT'], accounts=['hpc-prf-nt2'])
+    >>> f.sacct_options(), f.squeue_options()
+    (' -s FAILED,TIMEOUT -A hpc-prf-nt2', ' -t FAILED,TIMEOUT -A hpc-prf-nt2')
+    >>> f.restd_params(), f.key(), sorted(f.columns)
+    ({'state': 'FAILED,TIMEOUT', 'account': 'hpc-prf-nt2'}, 'state=FAILED,TIMEOUT;account=hpc-prf-nt2', ['Acc', 'State'])
+    >>> f.match_sacct({'state': {'current': ['TIMEOUT']}, 'association': {'user': 'cbj', 'account': 'hpc-prf-nt2'}})
+    True
+    >>> f.match_squeue({'job_state': ['RUNNING'], 'user_name': 'cbj', 'account': 'hpc-prf-nt2'})
+    False
+    >>> JobFilter(users=['cbj']).match_squeue({'user_name': 'cbj'})
+    True
+
+    The table shows the accounts without the prefix hpc-prf- (column Acc),
+    hence the short name selects both accounts:
+
+    >>> f = JobFilter(accounts=['nt2', 'pc2-mitarbeiter'])
+    >>> f.sacct_options(), f.match_squeue({'account': 'hpc-prf-nt2'})
+    (' -A nt2,hpc-prf-nt2,pc2-mitarbeiter,hpc-prf-pc2-mitarbeiter', True)
+    >>> bool(JobFilter()), JobFilter(names=['a b']).sacct_options()
+    (False, " --name 'a b'")
+    """
+    def __init__(self, states=(), users=(), accounts=(), partitions=(), names=()):
+        self.states = [STATE_CODES.get(s.upper(), s.upper()) for s in states]
+        self.users = list(users)
+        self.accounts = [
+            name
+            for account in accounts
+            for name in ([account] if account.startswith('hpc-prf-')
+                         else [account, f'hpc-prf-{account}'])
+        ]
+        self.partitions = list(partitions)
+        self.names = list(names)
+
+    def _values(self):
+        return [self.states, self.users, self.accounts, self.partitions, self.names]
+
+    def __bool__(self):
+        return any(self._values())
+
+    def _options(self, names):
+        return ''.join([
+            f' {name} {shlex.quote(",".join(values))}'
+            for name, values in zip(names, self._values()) if values
+        ])
+
+    def sacct_options(self):
+        return self._options(['-s', '-u', '-A', '-r', '--name'])
+
+    def squeue_options(self):
+        return self._options(['-t', '-u', '-A', '-p', '-n'])
+
+    def restd_params(self):
+        """The query parameters of slurmdb/jobs."""
+        return {
+            name: ','.join(values)
+            for name, values in zip(
+                ['state', 'users', 'account', 'partition', 'job_name'],
+                self._values())
+            if values
+        }
+
+    def key(self):
+        """Identifies the selection, e.g. for the scope of the SacctStore."""
+        return ';'.join([
+            f'{name}={",".join(values)}'
+            for name, values in zip(
+                ['state', 'user', 'account', 'partition', 'name'],
+                self._values())
+            if values
+        ])
+
+    @property
+    def columns(self):
+        """The columns, whose fields the matching needs (see --columns)."""
+        return frozenset(
+            column
+            for column, values in zip(
+                ['State', 'User', 'Acc', 'Partition', 'Name'], self._values())
+            if values
+        )
+
+    def _match(self, states, user, account, partition, name):
+        return (
+            (not self.states or not set(self.states).isdisjoint(states))
+            and (not self.users or user in self.users)
+            and (not self.accounts or account in self.accounts)
+            and (not self.partitions
+                 or not set(self.partitions).isdisjoint(partition.split(',')))
+            and (not self.names or name in self.names)
+        )
+
+    def match_sacct(self, job):
+        """Whether a job of sacct (see SACCT_JOB_FIELDS) matches."""
+        if not self:
+            return True
+        association = job.get('association', {})
+        # Without --state, the projection (see columns) has no state.
+        return self._match(
+            job['state']['current'] if self.states else (), association.get('user'),
+            association.get('account'), job.get('partition', ''),
+            job.get('name'),
+        )
+
+    def match_squeue(self, job):
+        """Whether a job of squeue (see SQUEUE_JOB_FIELDS) matches."""
+        if not self:
+            return True
+        return self._match(
+            job['job_state'] if self.states else (), job.get('user_name'), job.get('account'),
+            job.get('partition', ''), job.get('name'),
+        )
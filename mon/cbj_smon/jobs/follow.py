@@ -0,0 +1,140 @@
+import os
+import sys
+import time
+import subprocess
+import concurrent.futures
+
+from cbj_smon.jobs.util import STATE_COLORS, BASE_COLUMNS, c
+from cbj_smon.jobs.gather_squeue import gather_squeue
+from cbj_smon.jobs.gather_sacct import gather_sacct, _sacct_time
+
+# The columns of a snapshot: Only the states are compared.
+FOLLOW_COLUMNS = BASE_COLUMNS | {'State', 'Name'}
+
+
+def base_state(state):
+    """
+    The state without the reason, i.e. a new reason is no transition.
+
+    >>> base_state('PENDING (Resources)'), base_state('CANCELLED by 1234'), base_state('RUNNING')
+    ('PENDING', 'CANCELLED', 'RUNNING')
+    """
+    return state.split(' ', maxsplit=1)[0]
+
+
+def transitions(previous, current):
+    """
+    The (job_id, old, new) of the jobs, whose state changed between the
+    snapshots (job_id -> state). old is None for a new job. Vanished jobs
+    are no transition: They ended before the sacct window of the snapshot.
+
+    >>> transitions({1: 'PENDING', 2: 'RUNNING', 4: 'COMPLETED'}, {1: 'RUNNING', 2: 'RUNNING', 3: 'PENDING'})
+    [(1, 'PENDING', 'RUNNING'), (3, None, 'PENDING')]
+    """
+    return [
+        (job_id, previous.get(job_id), state)
+        for job_id, state in current.items()
+        if previous.get(job_id) != state
+    ]
+
+
+class Backoff:
+    """
+    The poll interval: Starts at minimum, doubles after each quiet cycle up
+    to maximum and is back to minimum after a transition.
+
+    >>> b = Backoff(10, 60)
+    >>> [b.next(False) for _ in range(5)], b.next(True), b.next(False)
+    ([10, 20, 40, 60, 60], 10, 10)
+    """
+    def __init__(self, minimum, maximum):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.interval = minimum
+
+    def next(self, changed):
+        if changed:
+            self.interval = self.minimum
+            return self.interval
+        interval = self.interval
+        self.interval = min(2 * interval, self.maximum)
+        return interval
+
+
+def snapshot_states(start, mine=False, backend='json', job_filter=None, cache=False):
+    """
+    One batched query of all watched jobs: One squeue and one sacct (since
+    start) call, independent of the number of jobs.
+    Returns the rows (only FOLLOW_COLUMNS) and job_id -> base state.
+    """
+    with concurrent.futures.ThreadPoolExecutor(2) as pool:
+        squeue_future = pool.submit(
+            gather_squeue, mine=mine, backend=backend,
+            columns=FOLLOW_COLUMNS, job_filter=job_filter)
+        sacct_future = pool.submit(
+            gather_sacct, start, mine=mine, cache=cache, backend=backend,
+            columns=FOLLOW_COLUMNS, job_filter=job_filter)
+        table, _ = squeue_future.result()
+        table2, _ = sacct_future.result()
+    # squeue is more recent than sacct.
+    table = {**table2, **table}
+    return table, {k: base_state(v['State']) for k, v in table.items()}
+
+
+def format_event(row, old, color=False):
+    new = row['State']
+    if color and base_state(new) in STATE_COLORS:
+        new = f'{STATE_COLORS[base_state(new)]}{new}{c.end}'
+    return (f'{time.strftime("%Y-%m-%d %H:%M:%S")}  {row["JobID"]}  '
+            f'{row["User"]}  {row["Name"]}  {old or "-"} -> {new}')
+
+
+def run_hook(hook, row, old, new):
+    """
+    Run the shell command hook for a transition. The job is in the
+    environment variables SMON_JOB_ID, SMON_JOB_USER, SMON_JOB_NAME,
+    SMON_OLD_STATE (empty for a new job), SMON_NEW_STATE and SMON_STATE
+    (the state with the reason).
+    """
+    env = dict(os.environ)
+    env.update(
+        SMON_JOB_ID=str(row['JobID']), SMON_JOB_USER=row['User'],
+        SMON_JOB_NAME=row['Name'], SMON_OLD_STATE=old or '',
+        SMON_NEW_STATE=new, SMON_STATE=row['State'],
+    )
+    cp = subprocess.run(hook, shell=True, env=env)
+    if cp.returncode:
+        print(f'Hook for {row["JobID"]} failed with exit code {cp.returncode}: {hook}',
+              file=sys.stderr)
+
+
+def follow(
+        start, mine=False, backend='json', job_filter=None, cache=False,
+        hook=None, minimum=10, maximum=300, file=None,
+):
+    """
+    Poll the jobs and print a line for each state transition (and run the
+    hook) until interrupted. The first snapshot is queried since start,
+    the following only since the previous poll, i.e. sacct sends only the
+    jobs, that were active in between.
+    """
+    if file is None:
+        file = sys.stdout
+    previous = None
+    backoff = Backoff(minimum, maximum)
+    color = file.isatty()
+    while True:
+        poll = time.time()
+        table, states = snapshot_states(
+            start, mine=mine, backend=backend, job_filter=job_filter,
+            cache=cache)
+        events = [] if previous is None else transitions(previous, states)
+        for job_id, old, new in events:
+            print(format_event(table[job_id], old, color), file=file, flush=True)
+            if hook:
+                run_hook(hook, table[job_id], old, new)
+        previous = states
+        # A small overlap, since sacct and slurmdbd are not synchronized.
+        start = _sacct_time(poll - 60)
+        cache = False
+        time.sleep(backoff.next(bool(events)))
@@ -0,0 +1,557 @@
+import os
+import time
+from cbj_smon.timings import timings
+from cbj_smon import snapshot
+
+from cbj_smon.jobs.util import ALL_COLUMNS, merge_fields, iter_slurm_json, iter_restd_json
+from cbj_smon.jobs.filters import JobFilter
+from cbj_smon.jobs.arrays import array_value
+from cbj_smon.jobs.rows import JobRow, shared
+from cbj_smon.jobs.seff import SeffBatch
+from cbj_smon.jobs.store import SacctStore, sacct_time_to_timestamp
+
+ACTIVE_STATES = {
+    'PENDING', 'RUNNING', 'SUSPENDED', 'REQUEUED', 'RESIZING', 'COMPLETING',
+    'CONFIGURING', 'SIGNALING', 'STAGE_OUT',
+}
+
+# The fields of a sacct job, that are used by parse_sacct_job and seff.
+SACCT_JOB_FIELDS = {
+    'job_id': True,
+    'name': True,
+    'association': {'user': True, 'account': True},
+    'state': {'current': True, 'reason': True},
+    'kill_request_user': True,
+    'tres': {
+        'allocated': [{'type': True, 'count': True}],
+        'requested': [{'type': True, 'count': True}],
+    },
+    'required': {'CPUs': True, 'memory_per_node': True, 'memory_per_cpu': True},
+    'allocation_nodes': True,
+    'time': {
+        'submission': True, 'start': True, 'end': True, 'elapsed': True,
+        'limit': True,
+    },
+    'steps': [{
+        'tasks': {'count': True},
+        'time': {'total': {'seconds': True, 'microseconds': True}},
+        'tres': {
+            'requested': {'max': [{'type': True, 'count': True}]},
+            'allocated': [{'type': True, 'count': True}],
+        },
+    }],
+    'partition': True,
+    'qos': True,
+    'nodes': True,
+    'priority': True,
+}
+
+# The fields of SACCT_JOB_FIELDS, that each column needs (see --columns).
+_SACCT_TRES = {
+    'allocated': [{'type': True, 'count': True}],
+    'requested': [{'type': True, 'count': True}],
+}
+_SACCT_ELAPSED = {'time': {'elapsed': True, 'start': True, 'end': True}}
+SACCT_COLUMN_FIELDS = {
+    'User': {'association': {'user': True}},
+    'JobID': {'job_id': True},
+    'Name': {'name': True},
+    'State': {'state': {'current': True, 'reason': True}, 'kill_request_user': True},
+    'Elapsed': merge_fields(_SACCT_ELAPSED, {'time': {'limit': True}}),
+    'Submit': {'time': {'submission': True}},
+    'Start': {'time': {'start': True}},
+    'End': {'time': {'end': True}},
+    'n': {'steps': [{'tasks': {'count': True}}]},
+    'cpu': {'required': {'CPUs': True}},
+    'gpu': {'tres': _SACCT_TRES},
+    'mem': {'required': {'CPUs': True, 'memory_per_node': True, 'memory_per_cpu': True},
+            'allocation_nodes': True},
+    'CEff': {'time': {'elapsed': True}, 'required': {'CPUs': True}, 'steps': SACCT_JOB_FIELDS['steps']},
+    'MEff': {'time': {'elapsed': True}, 'required': {'CPUs': True}, 'steps': SACCT_JOB_FIELDS['steps']},
+    'billing': merge_fields(_SACCT_ELAPSED, {'tres': _SACCT_TRES}),
+    'N': {'allocation_nodes': True},
+    'Partition': {'partition': True},
+    'Acc': {'association': {'account': True}},
+    'QoS': {'qos': True},
+    'Nodes': {'nodes': True},
+    'Priority': {'priority': True},
+    'Tool': {},
+    'Array': {'array': {'job_id': True, 'task_id': True, 'task': True}},
+}
+
+
+def sacct_fields(columns):
+    """The fields of a sacct job, that the columns need."""
+    if columns is None:
+        return SACCT_JOB_FIELDS
+    return merge_fields(
+        {'state': {'current': True}},
+        *[SACCT_COLUMN_FIELDS[column] for column in sorted(columns)])
+
+
+def needs_seff(columns):
+    return columns is None or 'CEff' in columns or 'MEff' in columns
+
+
+def _sacct_time(timestamp):
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(timestamp))
+
+
+def split_time_window(start, end, shard):
+    """
+    Split [start, end] into windows of length shard (seconds).
+
+    >>> split_time_window(0, 10, 4)
+    [(0, 4), (4, 8), (8, 10)]
+    >>> split_time_window(0, 10, None)
+    [(0, 10)]
+    """
+    if not shard:
+        return [(start, end)]
+    windows = []
+    while start < end:
+        windows.append((start, min(start + shard, end)))
+        start += shard
+    return windows
+
+
+def _run_sacct(
+        start, mine, end=None, backend='json', allocations=False, columns=None,
+        job_filter=None,
+):
+    """
+    Stream the jobs from sacct into the table, i.e. only one job is in
+    memory. Returns the table, the ids of the finished jobs and the jobs,
+    whose efficiency (CEff and MEff) is still missing, because the listing
+    doesn't contain the statistics of their steps (see _add_seff).
+
+    The parsable backend transfers only the used columns. The steps are
+    then queried with json for the jobs, that have steps and whose steps
+    are not yet memoized (see _add_seff).
+
+    The restd backend streams the same json from slurmrestd over a pooled
+    connection (see cbj_smon.restd).
+
+    With allocations, sacct lists only the allocations (-X), i.e. without
+    steps, and only the finished jobs get an efficiency. Running jobs have
+    no final numbers anyway.
+
+    With columns, only the fields of these columns are requested and
+    parsed. Without n, CEff and MEff, the steps aren't requested (-X).
+
+    The job_filter (see JobFilter) is passed to sacct, i.e. sacct lists
+    only the matching jobs.
+    """
+    env = dict(os.environ)
+    fields = sacct_fields(columns)
+    if job_filter is None:
+        job_filter = JobFilter()
+
+    if mine or job_filter.users:
+        cmd = f'sacct --json -S {start}'
+    else:
+        cmd = f"sacct --json -S {start}  --allusers"
+    if end is not None:
+        cmd += f' -E {end}'
+    if allocations or 'steps' not in fields:
+        cmd += ' -X'
+    cmd += job_filter.sacct_options()
+
+    if backend == 'json':
+        jobs = iter_slurm_json(cmd, 'jobs', env=env, fields=fields)
+    elif backend == 'parsable':
+        from cbj_smon.jobs.parsable import (
+            parsable_fields, parsable_to_sacct_jobs, iter_parsable,
+            sacct_parsable_cmd, parsable_env, SACCT_PARSABLE_FIELDS,
+            SACCT_PARSABLE_COLUMNS)
+
+        parsable = parsable_fields(
+            SACCT_PARSABLE_FIELDS, ['JobIDRaw', 'User', 'State', 'Submit', 'End'],
+            SACCT_PARSABLE_COLUMNS, columns)
+        jobs = parsable_to_sacct_jobs(iter_parsable(
+            sacct_parsable_cmd(cmd.removeprefix('sacct --json '), parsable),
+            parsable, env=parsable_env()))
+    elif backend == 'restd':
+        jobs = iter_restd_json('slurmdb/jobs', 'jobs', params={
+            'start_time': start, 'end_time': end,
+            'users': os.environ['USER'] if mine else None,
+            **job_filter.restd_params(),
+        }, fields=fields)
+        # slurmdbd always sends the steps.
+        allocations = False
+    else:
+        raise ValueError(backend)
+
+    return _sacct_table(jobs, backend, allocations, columns, job_filter)
+
+
+def _sacct_table(jobs, backend='json', allocations=False, columns=None, job_filter=None):
+    """
+    The table of the sacct jobs, the ids of the finished jobs and the jobs,
+    whose efficiency is still missing (see _run_sacct): job_id -> the job
+    of the listing, if it is running, otherwise None. Without
+    CEff and MEff in columns, the efficiency isn't computed. Jobs, that
+    don't match the job_filter, are skipped.
+    """
+    now = time.time()
+    with_seff = needs_seff(columns)
+    table: 'dict[dict]' = {}
+    finished = set()
+    need_steps = {}
+    batch = SeffBatch()
+    batch_ids = []
+    for job in jobs:
+        if job_filter is not None and not job_filter.match_sacct(job):
+            continue
+        line = table[job['job_id']] = parse_sacct_job(job, now, columns)
+        is_finished = not ACTIVE_STATES.intersection(job['state']['current'])
+        if is_finished:
+            finished.add(job['job_id'])
+
+        if not with_seff:
+            continue
+        if allocations:
+            if is_finished:
+                need_steps[job['job_id']] = None
+            else:
+                line.update({'CEff': '??', 'MEff': '??'})
+        elif backend != 'parsable' or not job['steps']:
+            batch.add(job)
+            batch_ids.append(job['job_id'])
+        else:
+            need_steps[job['job_id']] = None if is_finished else job
+
+    if with_seff:
+        for job_id, seff_ in zip(batch_ids, batch.compute()):
+            table[job_id].update(seff_)
+    return table, finished, need_steps
+
+
+def _sacct_jobs_json(job_ids, mine, chunk_size=500):
+    """
+    Query the json output (i.e. with steps) for the given job ids, with one
+    sacct call for each chunk of ids.
+    """
+    env = dict(os.environ)
+    for i in range(0, len(job_ids), chunk_size):
+        cmd = f"sacct --json -j {','.join(map(str, job_ids[i:i+chunk_size]))}"
+        if not mine:
+            cmd += ' --allusers'
+        yield from iter_slurm_json(cmd, 'jobs', env=env, fields=SACCT_JOB_FIELDS)
+
+
+def _steps_key(job):
+    """
+    The steps and their states in the listing of a running job. slurmdbd
+    has the statistics of a step, when it ended, i.e. the statistics
+    change only with the key.
+
+    >>> _steps_key({'steps': [{'id': '1.batch', 'state': 'RUNNING'}, {'id': '1.0', 'state': 'COMPLETED'}]})
+    '1.batch:RUNNING,1.0:COMPLETED'
+    """
+    return ','.join(f"{step['id']}:{step['state']}" for step in job['steps'])
+
+
+def _add_seff(table, need_steps, finished, mine, store=None):
+    """
+    Add the efficiency (CEff and MEff) of the jobs to the table. The steps
+    are fetched with batched sacct calls. The efficiency of finished jobs
+    never changes, hence it is memoized in the store and only the jobs, that
+    newly finished, cause a sacct call. The steps of running jobs (the job
+    of the listing in need_steps) are memoized, until a step starts or
+    ends, i.e. their efficiency is computed with the current elapsed time
+    of the listing and the memoized steps.
+    """
+    job_ids = sorted(need_steps)
+    for job_id in job_ids:
+        table[job_id].update({'CEff': '??', 'MEff': '??'})
+
+    batch = SeffBatch()
+    batch_ids = []
+    if store is not None:
+        with timings.phase('store'):
+            memoized = store.load_seff(job_ids)
+            steps = store.load_steps([
+                job_id for job_id in job_ids
+                if need_steps[job_id] is not None and job_id not in memoized])
+        for job_id, seff_ in memoized.items():
+            table[job_id].update(seff_)
+        for job_id, (key, job_steps) in steps.items():
+            job = need_steps[job_id]
+            if key == _steps_key(job):
+                batch.add({**job, 'steps': job_steps})
+                batch_ids.append(job_id)
+        known = memoized.keys() | set(batch_ids)
+        job_ids = [job_id for job_id in job_ids if job_id not in known]
+
+    new_steps = {}
+    for job in _sacct_jobs_json(job_ids, mine):
+        if job['job_id'] in table:
+            batch.add(job)
+            batch_ids.append(job['job_id'])
+            if need_steps.get(job['job_id']) is not None:
+                new_steps[job['job_id']] = (
+                    _steps_key(need_steps[job['job_id']]), job['steps'])
+
+    new = {}
+    for job_id, seff_ in zip(batch_ids, batch.compute()):
+        table[job_id].update(seff_)
+        if job_id in finished:
+            new[job_id] = seff_
+
+    if store is not None:
+        with timings.phase('store'):
+            store.update_seff(new)
+            store.update_steps(new_steps)
+
+
+def _run_sacct_sharded(
+        windows, mine, workers, backend='json', allocations=False, columns=None,
+        job_filter=None,
+):
+    """
+    Query each window with a separate sacct call, at most workers at the
+    same time, and merge the results. A job, that spans several windows,
+    is reported by each of them, the latest window wins.
+    """
+    import concurrent.futures
+
+    with concurrent.futures.ThreadPoolExecutor(workers) as pool:
+        results = list(pool.map(
+            lambda window: _run_sacct(
+                _sacct_time(window[0]), mine, end=_sacct_time(window[1]),
+                backend=backend, allocations=allocations, columns=columns,
+                job_filter=job_filter),
+            windows,
+        ))
+
+    table: 'dict[dict]' = {}
+    finished = set()
+    need_steps = {}
+    for window_table, window_finished, window_need_steps in results:
+        table.update(window_table)
+        finished.difference_update(window_table.keys())
+        finished.update(window_finished)
+        for job_id in window_table:
+            need_steps.pop(job_id, None)
+        need_steps.update(window_need_steps)
+    return table, finished, need_steps
+
+
+def _store_scope(mine, backend='json', allocations=False, columns=None, job_filter=None):
+    """
+    The scope of the rows in the SacctStore: A row depends on the user, the
+    backend, the columns, the filter and on allocations (e.g. without the
+    steps, the column n is unknown).
+
+    >>> _store_scope(False), _store_scope(False, 'parsable', True, {'JobID', 'User'})
+    ('allusers:json', 'allusers:parsable:X:JobID,User')
+    """
+    scope = os.environ['USER'] if mine else 'allusers'
+    scope += ':' + backend
+    if allocations:
+        scope += ':X'
+    if columns is not None:
+        scope += ':' + ','.join(sorted(columns))
+    if job_filter:
+        scope += ':' + job_filter.key()
+    return scope
+
+
+def _merge_stored(stored, table):
+    """
+    The stored rows and the rows from sacct in the order of sacct (by job
+    id), i.e. the same order as without the SacctStore. The sorting keeps the
+    order of equal keys (e.g. the submit time of array tasks), hence the
+    order of the ties doesn't depend on the store. Rows from sacct replace
+    stored rows. The rows from sacct need not be sorted, e.g. the windows
+    of a sharded query are concatenated.
+
+    >>> _merge_stored({1: 'a', 4: 'b', 6: 'c'}, {5: 'f', 2: 'd', 4: 'e'})
+    {1: 'a', 2: 'd', 4: 'e', 5: 'f', 6: 'c'}
+    """
+    rows = [(job_id, row) for job_id, row in stored.items() if job_id not in table]
+    rows.extend(table.items())
+    # Mostly sorted runs, i.e. ca. linear.
+    rows.sort(key=lambda item: item[0])
+    return dict(rows)
+
+
+@timings.phase('gather_sacct')
+def gather_sacct(
+        start, mine=False, cache=False, shard=None, workers=4, backend='json',
+        allocations=False, columns=None, job_filter=None,
+):
+    """
+    Returns the table of the jobs from sacct, including the efficiency
+    (CEff and MEff), and the submit times.
+
+    With cache, finished jobs are taken from the SacctStore and sacct is
+    only asked for the jobs, that were active since the last call.
+
+    With shard (seconds), a long time range is split into windows of that
+    length, that are queried concurrently with at most workers sacct
+    calls at the same time.
+
+    backend is 'json', 'parsable' or 'restd' (see _run_sacct).
+
+    With allocations, the listing contains no steps and the steps are only
+    fetched for the jobs, that finished and whose efficiency is not yet
+    memoized in the SacctStore (see _add_seff).
+
+    With columns, only these columns are computed (see _run_sacct). With
+    job_filter, only the matching jobs are requested (see JobFilter). The
+    SacctStore keeps the rows of each backend, selection of columns and
+    jobs and of allocations separately (see _store_scope).
+    """
+
+    if start is None:
+        # now[{+|-}count[seconds(default)|minutes|hours|days|weeks]]
+        start = 'now-1days'
+
+    now = time.time()
+    start_ts = sacct_time_to_timestamp(start, now)
+
+    if backend == 'parsable' and not cache and needs_seff(columns):
+        # Without the store, CEff and MEff need the steps of nearly all
+        # finished jobs, i.e. the json of most jobs in addition to the
+        # parsable listing. The json listing alone is cheaper.
+        backend = 'json'
+
+    store = None
+    query_start = start_ts
+    if cache:
+        store = SacctStore(scope=_store_scope(
+            mine, backend, allocations, columns, job_filter))
+    if store is not None and start_ts is not None:
+        query_start = store.query_start(start_ts, now)
+        if query_start is None:
+            query_start = start_ts
+
+    if query_start is None:
+        # Unknown time format, let sacct parse it.
+        windows = []
+    else:
+        windows = split_time_window(query_start, now, shard)
+
+    jobs = None
+    if query_start is not None:
+        # The snapshot contains the steps, hence no -X and no steps query.
+        jobs = snapshot.query(
+            'sacct', start=query_start,
+            user=os.environ['USER'] if mine else None)
+
+    if jobs is not None:
+        table, finished, need_steps = _sacct_table(
+            jobs, columns=columns, job_filter=job_filter)
+    elif len(windows) > 1:
+        table, finished, need_steps = _run_sacct_sharded(
+            windows, mine, workers, backend, allocations, columns, job_filter)
+    elif query_start == start_ts:
+        table, finished, need_steps = _run_sacct(
+            start, mine, backend=backend, allocations=allocations,
+            columns=columns, job_filter=job_filter)
+    else:
+        table, finished, need_steps = _run_sacct(
+            _sacct_time(query_start), mine, backend=backend,
+            allocations=allocations, columns=columns, job_filter=job_filter)
+
+    if needs_seff(columns):
+        _add_seff(table, need_steps, finished, mine, store)
+
+    if store is not None and start_ts is not None:
+        with timings.phase('store'):
+            store.update(table, finished, covered_start=start_ts, now=now)
+            table = _merge_stored(store.load(start_ts), table)
+
+    return table, {k: v['Submit'] for k, v in table.items()}
+
+
+def parse_sacct_job(job, now, columns=None):
+    """
+    The row of a sacct job. With columns, only these columns are computed
+    and the job needs only their fields (see sacct_fields).
+
+    >>> job = {'job_id': 1, 'association': {'user': 'cbj'}, 'name': 'a', 'time': {'start': 10, 'end': 0}}
+    >>> parse_sacct_job(job, now=20, columns={'JobID', 'Name', 'Start'})
+    JobRow({'JobID': 1, 'Name': 'a', 'Start': 10})
+    """
+    if columns is None:
+        columns = ALL_COLUMNS
+    row = JobRow()
+
+    if 'gpu' in columns or 'billing' in columns:
+        allocated = {r['type']: r['count'] for r in job['tres']['allocated']}
+        requested = {r['type']: r['count'] for r in job['tres']['requested']}
+        tres = allocated if allocated else requested
+
+    if 'Elapsed' in columns or 'billing' in columns:
+        elapsed = job['time']['elapsed']
+        if elapsed == 0 and job['time']['start'] < now:
+            elapsed = job['time']['end'] - job['time']['start']
+
+    if 'User' in columns:
+        row.User = shared(job['association']['user'])
+    if 'JobID' in columns:
+        row.JobID = job['job_id']
+    if 'Name' in columns:
+        row.Name = job['name']
+
+    if 'State' in columns:
+        state = ','.join(job['state']['current'])
+
+        if job['kill_request_user']:
+            if state == 'CANCELLED':
+                state += f' by {job["kill_request_user"]}'
+            else:
+                state += f' (Killed by {job["kill_request_user"]})'
+
+        if job['state']['reason'] != 'None':
+            state += f' ({job["state"]["reason"]})'
+        row.State = shared(state)
+
+    if 'Elapsed' in columns:
+        row.Elapsed = (elapsed, job['time']['limit'] * 60)
+    if 'Submit' in columns:
+        row.Submit = job['time']['submission']
+    if 'Start' in columns:
+        row.Start = job['time']['start']
+    if 'End' in columns:
+        row.End = job['time']['end']
+    if 'n' in columns:
+        row.n = max([s['tasks']['count'] for s in job['steps']], default='-')
+    if 'cpu' in columns:
+        row.cpu = job['required']['CPUs']
+    if 'gpu' in columns:
+        row.gpu = shared(tres.get('gres', 0))
+
+    if 'mem' in columns:
+        if job['required']['memory_per_node'] is not None:
+            row.mem = job['required']['memory_per_node'] * job['allocation_nodes']
+        elif job['required']['memory_per_cpu'] is not None:
+            row.mem = job['required']['memory_per_cpu'] * job['required']['CPUs']
+        else:
+            raise ValueError(f'No memory information found for job {job["job_id"]} by sacct')
+
+    if 'N' in columns:
+        row.N = job['allocation_nodes']
+    if 'Partition' in columns:
+        row.Partition = shared(job['partition'])
+    if 'billing' in columns:
+        billing = tres.get('billing', '?')
+        row.billing = (billing * elapsed / 3600, billing)
+    if 'Acc' in columns:
+        row.Acc = shared(job['association']['account'].removeprefix('hpc-prf-'))
+    if 'QoS' in columns:
+        row.QoS = shared(job['qos'])
+    if 'Nodes' in columns:
+        row.Nodes = job['nodes']
+    if 'Priority' in columns:
+        row.Priority = job['priority']
+    if 'Tool' in columns:
+        row.Tool = 'sacct'
+    if 'Array' in columns:
+        array = job.get('array') or {}
+        row.Array = array_value(
+            array.get('job_id'), array.get('task_id'), array.get('task'))
+    return row
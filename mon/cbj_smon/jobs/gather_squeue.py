@@ -0,0 +1,256 @@
+import os
+import time
+from cbj_smon.timings import timings
+from cbj_smon import snapshot
+from cbj_smon.jobs.util import ALL_COLUMNS, compile_fields, merge_fields, iter_slurm_json
+from cbj_smon.jobs.filters import JobFilter
+from cbj_smon.jobs.arrays import array_value
+from cbj_smon.jobs.rows import JobRow, shared
+
+
+def _get_gpu(job):
+    """
+    >>> job = {
+    ...     'gres_detail': ["gpu:a40:1(IDX:1)"],
+    ...     "tres_per_node": "gres/gpu:a40:1",
+    ...     'tres_req_str': "cpu=2,mem=20G,node=1,billing=4,gres/gpu=1,gres/gpu:a40=1"
+    ... }
+    >>> _get_gpu(job)
+    'a40:1'
+    >>> _get_gpu({'gres_detail': ['gpu:a100:2(IDX:0-1)', 'gpu:a100:4(IDX:0,2-3)']})
+    'a100:2,a100:4'
+    >>> job['gres_detail'] = []
+    >>> _get_gpu({'gres_detail': None, 'tres_req_str': "cpu=2,mem=20G,node=1,billing=4,gres/gpu=1,gres/gpu:a40=1",})
+    '1'
+    """
+    if job['gres_detail']:
+        # Running job
+        # Without the indices of the gpus, e.g. (IDX:0-1).
+        gpus = ','.join([
+            d.removeprefix('gpu:').split('(IDX:')[0]
+            for d in job['gres_detail']
+        ])
+    elif 'gres/gpu=' in job['tres_req_str']:
+        # Pending gpu job
+        gpus = job['tres_req_str'].split(r'gres/gpu=')[-1].split(',')[0]
+    else:
+        # Pending cpu job
+        gpus = '0'
+    return gpus
+
+
+# The fields of a squeue job, that are used by parse_squeue_job.
+SQUEUE_JOB_FIELDS = {
+    'job_id': True,
+    'name': True,
+    'user_name': True,
+    'account': True,
+    'job_state': True,
+    'state_reason': True,
+    'state_description': True,
+    'start_time': True,
+    'end_time': True,
+    'submit_time': True,
+    'time_limit': True,
+    'job_resources': {'allocated_nodes': [{'memory_allocated': True}]},
+    'memory_per_node': True,
+    'memory_per_cpu': True,
+    'cpus': True,
+    'node_count': True,
+    'billable_tres': True,
+    'tasks': True,
+    'gres_detail': True,
+    'tres_req_str': True,
+    'partition': True,
+    'qos': True,
+    'nodes': True,
+    'priority': True,
+}
+
+# The fields of SQUEUE_JOB_FIELDS, that each column needs (see --columns).
+_SQUEUE_MEM = {
+    'job_resources': {'allocated_nodes': [{'memory_allocated': True}]},
+    'memory_per_node': True, 'memory_per_cpu': True, 'node_count': True,
+    'cpus': True,
+}
+SQUEUE_COLUMN_FIELDS = {
+    'User': {'user_name': True},
+    'JobID': {'job_id': True},
+    'Name': {'name': True},
+    'State': {'job_state': True, 'state_reason': True, 'state_description': True},
+    'Elapsed': {'start_time': True, 'time_limit': True},
+    'Submit': {'submit_time': True},
+    'Start': {'start_time': True},
+    'End': {'end_time': True},
+    'n': {'tasks': True},
+    'cpu': {'cpus': True},
+    'gpu': {'gres_detail': True, 'tres_req_str': True},
+    'mem': _SQUEUE_MEM,
+    'CEff': {},
+    'MEff': {},
+    'billing': {'billable_tres': True, 'start_time': True},
+    'N': {'node_count': True},
+    'Partition': {'partition': True},
+    'Acc': {'account': True},
+    'QoS': {'qos': True},
+    'Nodes': {'nodes': True},
+    'Priority': {'priority': True},
+    'Tool': {},
+    'Array': {'array_job_id': True, 'array_task_id': True, 'array_task_string': True},
+}
+
+
+def squeue_fields(columns):
+    """The fields of a squeue job, that the columns need."""
+    if columns is None:
+        return SQUEUE_JOB_FIELDS
+    return merge_fields(*[SQUEUE_COLUMN_FIELDS[column] for column in sorted(columns)])
+
+
+@timings.phase('gather_squeue')
+def gather_squeue(mine=False, backend='json', columns=None, job_filter=None):
+    """
+    Returns the table of the jobs from squeue and the submit times. With
+    columns, only the fields of these columns are requested and parsed.
+    With job_filter, only the matching jobs (see JobFilter).
+    """
+    env = dict(os.environ)
+    fields = squeue_fields(columns)
+    if job_filter is None:
+        job_filter = JobFilter()
+
+    if mine:
+        cmd = f'squeue --json --user $USER'
+    else:
+        cmd = f"squeue --json"
+    cmd += job_filter.squeue_options()
+
+    jobs = snapshot.query('squeue', user=os.environ['USER'] if mine else None)
+    if jobs is None:
+        if backend == 'json':
+            jobs = iter_slurm_json(cmd, 'jobs', env=env, fields=fields)
+        elif backend == 'parsable':
+            from cbj_smon.jobs.parsable import (
+                parsable_fields, parsable_to_squeue_job, iter_parsable,
+                squeue_parsable_cmd, parsable_env, SQUEUE_PARSABLE_FIELDS,
+                SQUEUE_PARSABLE_COLUMNS)
+
+            parsable = parsable_fields(
+                SQUEUE_PARSABLE_FIELDS,
+                ['JobID', 'UserName', 'State', 'SubmitTime', 'EndTime'],
+                SQUEUE_PARSABLE_COLUMNS, columns)
+            jobs = map(parsable_to_squeue_job, iter_parsable(
+                squeue_parsable_cmd(cmd.removeprefix('squeue --json'), parsable),
+                parsable, env=parsable_env()))
+        elif backend == 'restd':
+            from cbj_smon import restd
+
+            # The job list supports update_time, hence no streaming.
+            jobs = map(compile_fields(fields), [
+                job for job in restd.client().load('slurm/jobs', 'jobs')
+                if not mine or job['user_name'] == os.environ['USER']
+            ])
+        else:
+            raise ValueError(backend)
+
+    now = time.time()
+    table: 'dict[dict]' = {}
+    for job in jobs:
+        if job_filter.match_squeue(job):
+            table[job['job_id']] = parse_squeue_job(job, now, columns)
+    return table, {k: v['Submit'] for k, v in table.items()}
+
+
+def parse_squeue_job(job, now, columns=None):
+    """
+    The row of a squeue job. With columns, only these columns are computed
+    and the job needs only their fields (see squeue_fields).
+
+    >>> parse_squeue_job({'job_id': 1, 'array_job_id': 0}, now=20, columns={'JobID', 'Array'})
+    JobRow({'JobID': 1, 'Array': None})
+    >>> parse_squeue_job({'job_id': 1}, now=20, columns={'JobID', 'Array'})
+    JobRow({'JobID': 1, 'Array': None})
+    """
+    if columns is None:
+        columns = ALL_COLUMNS
+    row = JobRow()
+
+    if 'Elapsed' in columns or 'billing' in columns:
+        # calculated elapsed from difference between now and start (time_limit is the total time limit, not the remaining time limit)
+        if job['start_time'] == 0:
+            elapsed = 0
+        else:
+            elapsed = max(0, now - job['start_time'])
+
+    if 'mem' in columns:
+        # sum from job resources
+        # Pending jobs have no allocated nodes yet.
+        if job['job_resources'] and job['job_resources'].get('allocated_nodes'):
+            mem = sum(node['memory_allocated'] for node in job['job_resources']['allocated_nodes'])
+        elif job['memory_per_node'] is not None:
+            mem = job['memory_per_node'] * job['node_count']
+        elif job['memory_per_cpu'] is not None:
+            mem = job['memory_per_cpu'] * job['cpus']
+        else:
+            raise ValueError(f'No memory information found for job {job["job_id"]}')
+
+    if 'User' in columns:
+        row.User = shared(job['user_name'])
+    if 'JobID' in columns:
+        row.JobID = job['job_id']
+    if 'Name' in columns:
+        row.Name = job['name']
+
+    if 'State' in columns:
+        state = ','.join(job['job_state'])
+        if job['state_reason'] != 'None':
+            state += f' ({job["state_reason"]})'
+        if job['state_description']:
+            state += f' ({job["state_description"]})'
+        # Add info from dependency field?
+        # e.g. "dependency": "afternotok:5516697(unfulfilled)",
+        row.State = shared(state)
+
+    if 'Elapsed' in columns:
+        row.Elapsed = (elapsed, job['time_limit'] * 60)
+    if 'Submit' in columns:
+        row.Submit = job['submit_time']
+    if 'Start' in columns:
+        row.Start = job['start_time']
+    if 'End' in columns:
+        row.End = job['end_time']
+    if 'n' in columns:
+        row.n = job['tasks']
+    if 'cpu' in columns:
+        row.cpu = job['cpus']
+    if 'gpu' in columns:
+        row.gpu = shared(_get_gpu(job))
+    if 'mem' in columns:
+        row.mem = mem
+
+    if 'billing' in columns:
+        billing = job['billable_tres']
+        if billing is not None:
+            billing = (billing * elapsed / 3600, billing)
+        row.billing = billing
+
+    if 'N' in columns:
+        row.N = job['node_count']
+    if 'Partition' in columns:
+        row.Partition = shared(job['partition'])
+    if 'Acc' in columns:
+        row.Acc = shared(job['account'].removeprefix('hpc-prf-'))
+    if 'QoS' in columns:
+        row.QoS = shared(job['qos'])
+    if 'Nodes' in columns:
+        row.Nodes = job['nodes']
+    if 'Priority' in columns:
+        row.Priority = job['priority']
+    if 'Tool' in columns:
+        row.Tool = 'squeue'
+    if 'Array' in columns:
+        # Older sources (e.g. a snapshot) might lack the fields, i.e. no array.
+        row.Array = array_value(
+            job.get('array_job_id'), job.get('array_task_id'),
+            job.get('array_task_string'))
+    return row
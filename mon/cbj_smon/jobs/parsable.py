@@ -0,0 +1,346 @@
+import os
+import pwd
+import subprocess
+from cbj_smon.timings import timings
+from cbj_smon.jobs.util import ALL_COLUMNS
+
+# The --parsable2 (sacct) and --Format (squeue) backend. The lines are
+# converted to the same (projected) job dicts as the json output, so that
+# parse_sacct_job and parse_squeue_job are shared.
+# The free text field (name) is always the last field, hence a '|' in the
+# name doesn't break the split.
+
+SACCT_PARSABLE_FIELDS = [
+    'JobIDRaw', 'JobID', 'User', 'UID', 'Account', 'State', 'Reason', 'ElapsedRaw',
+    'TimelimitRaw', 'Submit', 'Start', 'End', 'NTasks', 'ReqCPUS', 'NNodes',
+    'AllocTRES', 'ReqTRES', 'Partition', 'QOS', 'NodeList', 'Priority',
+    'JobName',
+]
+
+SQUEUE_PARSABLE_FIELDS = [
+    'JobID', 'UserName', 'Account', 'State', 'Reason', 'StartTime',
+    'EndTime', 'SubmitTime', 'TimeLimit', 'NumTasks', 'NumCPUs', 'NumNodes',
+    'tres-alloc', 'Partition', 'QOS', 'NodeList', 'PriorityLong',
+    'ArrayJobID', 'ArrayTaskID', 'Name',
+]
+
+# The fields, that each column needs (see --columns). The ids, the user, the
+# state and the times to sort and to cache are always requested. CEff and
+# MEff need the steps, they are queried with json (see _add_seff).
+SACCT_PARSABLE_COLUMNS = {
+    'Name': ['JobName'],
+    # The user, that cancelled the job, is a uid (see _kill_request_user).
+    'State': ['Reason', 'UID'],
+    'Elapsed': ['ElapsedRaw', 'TimelimitRaw', 'Start'],
+    'Start': ['Start'],
+    'n': ['NTasks'],
+    'cpu': ['ReqCPUS'],
+    'gpu': ['AllocTRES', 'ReqTRES'],
+    'mem': ['AllocTRES', 'ReqTRES', 'NNodes'],
+    'CEff': ['ElapsedRaw', 'ReqCPUS'],
+    'MEff': ['ElapsedRaw', 'ReqCPUS'],
+    'billing': ['AllocTRES', 'ReqTRES', 'ElapsedRaw', 'Start'],
+    'N': ['NNodes'],
+    'Partition': ['Partition'],
+    'Acc': ['Account'],
+    'QoS': ['QOS'],
+    'Nodes': ['NodeList'],
+    'Priority': ['Priority'],
+    'Array': ['JobID'],
+}
+SQUEUE_PARSABLE_COLUMNS = {
+    'Name': ['Name'],
+    'State': ['Reason'],
+    'Elapsed': ['StartTime', 'TimeLimit'],
+    'Start': ['StartTime'],
+    'n': ['NumTasks'],
+    'cpu': ['NumCPUs'],
+    'gpu': ['tres-alloc'],
+    'mem': ['tres-alloc'],
+    'billing': ['tres-alloc', 'StartTime'],
+    'N': ['NumNodes'],
+    'Partition': ['Partition'],
+    'Acc': ['Account'],
+    'QoS': ['QOS'],
+    'Nodes': ['NodeList'],
+    'Priority': ['PriorityLong'],
+    'Array': ['ArrayJobID', 'ArrayTaskID'],
+}
+
+
+def parsable_fields(all_fields, required, column_fields, columns):
+    """
+    The fields for the columns, in the order of all_fields, i.e. the free
+    text field stays the last.
+
+    >>> parsable_fields(SACCT_PARSABLE_FIELDS, ['JobIDRaw'], SACCT_PARSABLE_COLUMNS, {'Name', 'N'})
+    ['JobIDRaw', 'NNodes', 'JobName']
+    """
+    if columns is None:
+        columns = ALL_COLUMNS
+    used = set(required)
+    for column in columns:
+        used.update(column_fields.get(column, []))
+    return [f for f in all_fields if f in used]
+
+
+def _parsable_int(value):
+    """
+    >>> _parsable_int('1720527843'), _parsable_int('Unknown'), _parsable_int('N/A')
+    (1720527843, 0, 0)
+    """
+    try:
+        return int(value)
+    except ValueError:
+        return 0
+
+
+def _parsable_number(value):
+    """Like _parsable_int, but None for missing values (json: set=False)."""
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def parse_tres_str(tres):
+    """
+    Convert a TRES string to the list of the json output. Memory is in MB.
+
+    >>> parse_tres_str('billing=128,cpu=128,gres/gpu=4,gres/gpu:a100=4,mem=1.50G,node=1')
+    [{'type': 'billing', 'count': 128}, {'type': 'cpu', 'count': 128}, {'type': 'gres', 'count': 4}, {'type': 'gres', 'count': 4}, {'type': 'mem', 'count': 1536}, {'type': 'node', 'count': 1}]
+    >>> parse_tres_str('')
+    []
+    """
+    factors = {'K': 1 / 1024, 'M': 1, 'G': 1024, 'T': 1024 ** 2, 'P': 1024 ** 3}
+    entries = []
+    for entry in filter(None, tres.split(',')):
+        k, v = entry.split('=', maxsplit=1)
+        if v[-1] in factors:
+            v = round(float(v[:-1]) * factors[v[-1]])
+        else:
+            v = int(v)
+        entries.append({'type': k.split('/')[0], 'count': v})
+    return entries
+
+
+def slurm_duration_to_minutes(value):
+    """
+    >>> slurm_duration_to_minutes('12:00:00'), slurm_duration_to_minutes('1-00:30:00')
+    (720, 1470)
+    >>> slurm_duration_to_minutes('30:00'), slurm_duration_to_minutes('UNLIMITED')
+    (30, None)
+    """
+    days, _, value = value.rpartition('-')
+    try:
+        parts = [int(p) for p in value.split(':')]
+        days = int(days) if days else 0
+    except ValueError:
+        return None
+    seconds = 0
+    for part, factor in zip(parts[::-1], {1: [60], 2: [1, 60], 3: [1, 60, 3600]}[len(parts)]):
+        seconds += part * factor
+    return (days * 86400 + seconds) // 60
+
+
+def _mem_from_tres(tres):
+    mem = [e['count'] for e in tres if e['type'] == 'mem']
+    return mem[-1] if mem else 0
+
+
+def _kill_request_user(uid, r):
+    """
+    The name of the user, that cancelled the job (the json has the name).
+    Usually, it is the owner of the job, otherwise it is looked up.
+
+    >>> _kill_request_user('1019', {'User': 'walter', 'UID': '1019'})
+    'walter'
+    >>> _kill_request_user('0', {'User': 'walter', 'UID': '1019'})
+    'root'
+    """
+    if uid == r.get('UID'):
+        return r['User']
+    try:
+        return pwd.getpwuid(int(uid)).pw_name
+    except (KeyError, ValueError):
+        return uid
+
+
+def iter_parsable(cmd, fields, env=None):
+    """
+    Run a slurm command with '|' separated output (no header) and yield a
+    dict for each line, while the command is still writing its output.
+    """
+    with timings.popen(
+            cmd, shell=True, stdout=subprocess.PIPE,
+            universal_newlines=True, env=env) as p:
+        try:
+            for line in p.stdout:
+                yield dict(zip(fields, line.rstrip('\n').split('|', len(fields) - 1)))
+        except BaseException:
+            p.kill()
+            raise
+    if p.returncode != 0:
+        raise subprocess.CalledProcessError(p.returncode, cmd)
+
+
+def sacct_parsable_cmd(options, fields=SACCT_PARSABLE_FIELDS):
+    return f"sacct --noheader --parsable2 --format {','.join(fields)} {options}"
+
+
+def squeue_parsable_cmd(options, fields=SQUEUE_PARSABLE_FIELDS):
+    # A size of 0 disables the padding and truncation, '|' is the suffix.
+    return f"squeue --noheader --Format '{','.join(f + ':0|' for f in fields[:-1])},{fields[-1]}:0' {options}"
+
+
+def parsable_env():
+    env = dict(os.environ)
+    env['SLURM_TIME_FORMAT'] = '%s'  # Timestamps like the json output
+    return env
+
+
+def _parsable_array(job_id):
+    """
+    The array of a JobID of sacct, e.g. 4000010_3 or 4000010_[5-9%2].
+
+    >>> _parsable_array('4000010_3')
+    {'job_id': 4000010, 'task_id': 3, 'task': ''}
+    >>> _parsable_array('4000010_[5-9%2]'), _parsable_array('4000012')
+    ({'job_id': 4000010, 'task_id': None, 'task': '5-9%2'}, {'job_id': 0, 'task_id': None, 'task': ''})
+    """
+    array_job_id, _, task = job_id.partition('_')
+    if not task:
+        return {'job_id': 0, 'task_id': None, 'task': ''}
+    if task.startswith('['):
+        return {'job_id': int(array_job_id), 'task_id': None, 'task': task.strip('[]')}
+    return {'job_id': int(array_job_id), 'task_id': int(task), 'task': ''}
+
+
+def parsable_to_sacct_jobs(records):
+    """
+    Group the lines of `sacct --parsable2` (job lines followed by their
+    step lines) to jobs, with the fields of SACCT_JOB_FIELDS. The steps
+    contain only the id, the state and the number of tasks.
+
+    >>> line = '4646900|4646900|cbj|1000|hpc-prf-nt2|CANCELLED by 0|None|740|720|1720527843|1720527900|1720528640||200|2|billing=88,cpu=200,mem=819200M,node=2|billing=88,cpu=200,mem=819200M,node=1|normal|cont|n2cn[0168-0169]|12345|abc|def'
+    >>> step = '4646900.batch|4646900.batch||||COMPLETED|None|740|||||1||1|cpu=16,mem=1000M|||||n2cn0168||batch'
+    >>> records = [dict(zip(SACCT_PARSABLE_FIELDS, l.split('|', len(SACCT_PARSABLE_FIELDS) - 1))) for l in [line, step]]
+    >>> job, = parsable_to_sacct_jobs(records)
+    >>> job['name'], job['state'], job['kill_request_user'], job['steps']
+    ('abc|def', {'current': ['CANCELLED'], 'reason': 'None'}, 'root', [{'id': '4646900.batch', 'state': 'COMPLETED', 'tasks': {'count': 1}}])
+    >>> from cbj_smon.jobs.gather_sacct import parse_sacct_job
+    >>> row = parse_sacct_job(job, now=1720528640)
+    >>> row['State'], row['Elapsed'], row['mem'], row['n'], row['billing']
+    ('CANCELLED by root', (740, 43200), 819200, 1, (18.08888888888889, 88))
+    """
+    job = None
+    for r in records:
+        if '.' in r['JobIDRaw']:
+            if job is not None and r['JobIDRaw'].split('.')[0] == str(job['job_id']):
+                job['steps'].append({
+                    'id': r['JobIDRaw'], 'state': r['State'],
+                    'tasks': {'count': _parsable_int(r.get('NTasks', ''))},
+                })
+            continue
+
+        if job is not None:
+            yield job
+
+        state, _, killed_by = r['State'].partition(' by ')
+        allocated = parse_tres_str(r.get('AllocTRES', ''))
+        requested = parse_tres_str(r.get('ReqTRES', ''))
+        nodes = _parsable_int(r.get('NNodes', ''))
+        mem = _mem_from_tres(allocated if allocated else requested)
+        job = {
+            'job_id': int(r['JobIDRaw']),
+            'array': _parsable_array(r.get('JobID', '')),
+            'name': r.get('JobName', ''),
+            'association': {'user': r['User'], 'account': r.get('Account', '')},
+            'state': {'current': state.split(','), 'reason': r.get('Reason', '')},
+            'kill_request_user': _kill_request_user(killed_by, r) if killed_by else '',
+            'tres': {'allocated': allocated, 'requested': requested},
+            'required': {
+                'CPUs': _parsable_int(r.get('ReqCPUS', '')),
+                # sacct's total memory, parse_sacct_job multiplies it again
+                # with the number of nodes.
+                'memory_per_node': (mem // nodes if mem % nodes == 0 else mem / nodes) if nodes else mem,
+                'memory_per_cpu': None,
+            },
+            'allocation_nodes': nodes if nodes else 1,
+            'time': {
+                'submission': _parsable_int(r['Submit']),
+                'start': _parsable_int(r.get('Start', '')),
+                'end': _parsable_int(r['End']),
+                'elapsed': _parsable_int(r.get('ElapsedRaw', '')),
+                'limit': _parsable_number(r.get('TimelimitRaw', '')),
+            },
+            'steps': [],
+            'partition': r.get('Partition', ''),
+            'qos': r.get('QOS', ''),
+            'nodes': r.get('NodeList', ''),
+            'priority': _parsable_number(r.get('Priority', '')),
+        }
+    if job is not None:
+        yield job
+
+
+def parsable_to_squeue_job(r):
+    """
+    Convert a line of `squeue --Format` to a job, with the fields of
+    SQUEUE_JOB_FIELDS.
+
+    Limitations compared to the json output: the state description is
+    missing and the gpu column of multi node jobs shows the total number of
+    gpus instead of the gpus per node.
+
+    >>> line = '4646900|cbj|hpc-prf-nt2|RUNNING|None|1720527900|1720571100|1720527843|12:00:00|2|4|1|cpu=4,mem=20G,node=1,billing=4,gres/gpu=1,gres/gpu:a40=1|gpu|cont|n2gpu1201|12345|4646900|N/A|abc'
+    >>> job = parsable_to_squeue_job(dict(zip(SQUEUE_PARSABLE_FIELDS, line.split('|'))))
+    >>> job['job_resources'], job['gres_detail'], job['billable_tres']
+    ({'allocated_nodes': [{'memory_allocated': 20480}]}, ['gpu:a40:1'], 4.0)
+    >>> job['array_job_id'], job['array_task_id'], job['array_task_string']
+    (0, None, '')
+    >>> from cbj_smon.jobs.gather_squeue import _get_gpu
+    >>> _get_gpu(job)
+    'a40:1'
+    """
+    tres = r.get('tres-alloc', '')
+    running = r['State'] == 'RUNNING'
+    # N/A for jobs, that are no array task, a range for pending tasks.
+    task = r.get('ArrayTaskID', 'N/A')
+    is_array = task not in ('', 'N/A')
+    allocated = parse_tres_str(tres)
+    billing = [e['count'] for e in allocated if e['type'] == 'billing']
+    return {
+        'job_id': int(r['JobID']),
+        'name': r.get('Name', ''),
+        'user_name': r['UserName'],
+        'account': r.get('Account', ''),
+        'job_state': r['State'].split(','),
+        'state_reason': r.get('Reason', ''),
+        'state_description': '',
+        'start_time': _parsable_int(r.get('StartTime', '')),
+        'end_time': _parsable_int(r['EndTime']),
+        'submit_time': _parsable_int(r['SubmitTime']),
+        'time_limit': slurm_duration_to_minutes(r.get('TimeLimit', '')),
+        'job_resources': {'allocated_nodes': [{'memory_allocated': _mem_from_tres(allocated)}]},
+        'memory_per_node': None,
+        'memory_per_cpu': None,
+        'cpus': _parsable_int(r.get('NumCPUs', '')),
+        'node_count': _parsable_int(r.get('NumNodes', '')),
+        # A float, like in the json.
+        'billable_tres': float(billing[-1]) if billing else None,
+        'tasks': _parsable_int(r.get('NumTasks', '')),
+        'gres_detail': [
+            'gpu:' + k.split(':', maxsplit=1)[1] + ':' + v
+            for k, v in (e.split('=', maxsplit=1) for e in tres.split(',') if e)
+            if k.startswith('gres/gpu:')
+        ] if running else [],
+        'tres_req_str': tres,
+        'partition': r.get('Partition', ''),
+        'qos': r.get('QOS', ''),
+        'nodes': r.get('NodeList', ''),
+        'priority': _parsable_number(r.get('PriorityLong', '')),
+        'array_job_id': _parsable_int(r.get('ArrayJobID', '')) if is_array else 0,
+        'array_task_id': int(task) if task.isdigit() else None,
+        'array_task_string': task if is_array and not task.isdigit() else '',
+    }
@@ -0,0 +1,132 @@
+import sys
+
+from cbj_smon.jobs.util import COLUMNS
+
+
+def shared(value):
+    """
+    The interned value, if it is a str, i.e. one object for all rows.
+
+    >>> shared('a' + 'b') is shared('ab'), shared(None)
+    (True, None)
+    """
+    return sys.intern(value) if type(value) is str else value
+
+
+class JobRow:
+    """
+    The row of a job with the raw values of the columns (see COLUMNS), e.g.
+    timestamps, the memory in MB and the (elapsed, limit) and (billing
+    hours, billing) pairs. colorize_table formats them into new dicts, i.e.
+    the rows are never overwritten with text.
+
+    A table has a row for each job of the sacct window (e.g. 100k jobs),
+    hence slots instead of a dict per row, and the strings of the columns
+    with few distinct values (INTERNED) are shared between the rows. A
+    missing column is an unset slot. For the code, that handles the rows as
+    dicts (SacctStore, collapse_arrays, DeltaView, ...), it has the
+    methods of a dict.
+
+    >>> row = JobRow(JobID=1, State='RUNNING')
+    >>> row['JobID'], 'State' in row, 'End' in row, row.get('End')
+    (1, True, False, None)
+    >>> row['CEff'] = 80
+    >>> row
+    JobRow({'JobID': 1, 'State': 'RUNNING', 'CEff': 80})
+    >>> row == {'JobID': 1, 'State': 'RUNNING', 'CEff': 80}, JobRow(dict(row)) == row
+    (True, True)
+    >>> row.pop('CEff'), row.pop('CEff', None), len(row)
+    (80, None, 2)
+    >>> row['Unknown'] = 1
+    Traceback (most recent call last):
+    ...
+    KeyError: 'Unknown'
+    >>> JobRow(User='c' + 'bj')['User'] is JobRow(User='cb' + 'j')['User']
+    True
+    """
+    # Array: See collapse_arrays, Change: See DeltaView.
+    __slots__ = COLUMNS + ('Array', 'Change')
+
+    # The columns, whose values repeat, e.g. 20 users for 100k jobs. Not the
+    # names and the node lists, whose values are mostly distinct.
+    INTERNED = frozenset({
+        'User', 'State', 'gpu', 'Partition', 'Acc', 'QoS', 'Tool',
+    })
+
+    def __init__(self, values=(), **kwargs):
+        self.update(values, **kwargs)
+
+    def __getitem__(self, key):
+        if key in _FIELDS:
+            try:
+                return getattr(self, key)
+            except AttributeError:
+                pass
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in _FIELDS:
+            raise KeyError(key)
+        if key in self.INTERNED:
+            value = shared(value)
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        delattr(self, key)
+
+    def __contains__(self, key):
+        return key in _FIELDS and hasattr(self, key)
+
+    def get(self, key, default=None):
+        if key in _FIELDS:
+            return getattr(self, key, default)
+        return default
+
+    def pop(self, key, *default):
+        try:
+            value = self[key]
+        except KeyError:
+            if default:
+                return default[0]
+            raise
+        delattr(self, key)
+        return value
+
+    def update(self, values=(), **kwargs):
+        if hasattr(values, 'keys'):
+            values = [(k, values[k]) for k in values.keys()]
+        for k, v in [*values, *kwargs.items()]:
+            self[k] = v
+
+    def keys(self):
+        return [k for k in self.__slots__ if hasattr(self, k)]
+
+    def values(self):
+        return [v for _, v in self.items()]
+
+    def items(self):
+        missing = _MISSING
+        return [
+            (k, v) for k in self.__slots__
+            if (v := getattr(self, k, missing)) is not missing
+        ]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def __eq__(self, other):
+        if isinstance(other, (JobRow, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __repr__(self):
+        return f'{type(self).__name__}({dict(self.items())!r})'
+
+
+_FIELDS = frozenset(JobRow.__slots__)
+_MISSING = object()
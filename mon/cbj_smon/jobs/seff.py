@@ -0,0 +1,270 @@
+import os
+import sys
+import subprocess
+from cbj_smon.timings import timings
+from cbj_smon.table import strip_ANSI_escape_sequences
+
+from cbj_smon.jobs.util import c
+
+
+def seff_slow(job):
+    env = dict(os.environ)
+
+    seff = {}
+
+    stdout = timings.run(
+        f"seff {job['job_id']}",
+        check=True, shell=True, stdout=subprocess.PIPE,
+        universal_newlines=True, env=env).stdout
+
+    for line in stdout.splitlines():
+        if line.startswith('CPU Efficiency:'):
+            seff['CEff'] = round(float(line.split()[2].replace('%', '')))
+        if line.startswith('Memory Efficiency:'):
+            # ToDo: Replace seff with output of sacct:
+            # ['steps'][i]['tres']['requested']['max'][2]['count']
+
+            seff['MEff'] = round(float(line.split()[2].replace('%', '')))
+
+    return seff
+
+
+def seff(job):
+    # This code is a inspired by seff and checking json output,
+    # to identify the values. The json output is strange:
+    # several names don't match the meaning of the value,
+    # e.g. requested mem mean used memory of the process.
+    cpu_time_used = 0
+    for step in job['steps']:
+        cpu_time_used += step['time']['total']['seconds'] * 1_000_000
+        cpu_time_used += step['time']['total']['microseconds']
+
+    elapsed_times_cpus = job['time']['elapsed'] * job['required']['CPUs']
+
+    if elapsed_times_cpus > 0:
+        ceff = round((cpu_time_used / 1_000_000) / elapsed_times_cpus * 100)
+    else:
+        ceff = None
+
+    mem_tres_requested = 0  # max/peak memory used.
+    mem_tres_allocated = 0  # max memory that can be used, before OOM-Killer starts
+    for step in job['steps']:
+        for entry in step['tres']['requested']['max']:
+            if entry['type'] == 'mem':
+                mem_tres_requested = max(mem_tres_requested, entry['count']) * \
+                                     step['tasks']['count']
+        for entry in step['tres']['allocated']:
+            if entry['type'] == 'mem':
+                mem_tres_allocated = max(mem_tres_allocated, entry['count'])
+
+    if mem_tres_allocated > 0:
+        meff = round(
+            mem_tres_requested / (mem_tres_allocated * 1024 ** 2) * 100)
+    else:
+        meff = None
+
+    return format_seff(ceff, meff)
+
+
+def format_seff(ceff, meff):
+    """
+    Colorize the efficiency in percent, None is unknown.
+
+    >>> format_seff(80, 10) == {'CEff': f'{c.green}80{c.end}', 'MEff': f'{c.yellow}10{c.end}'}
+    True
+    >>> format_seff(None, 50)
+    {'CEff': '??', 'MEff': 50}
+    """
+    seff = {}
+    if ceff is None:
+        seff['CEff'] = '??'
+    elif ceff > 70:
+        seff['CEff'] = f"{c.green}{ceff}{c.end}"
+    else:
+        seff['CEff'] = ceff
+
+    if meff is None:
+        seff['MEff'] = '??'
+    elif meff > 95:
+        seff['MEff'] = f"{c.red}{meff}{c.end}"
+    elif meff < 20:
+        seff['MEff'] = f"{c.yellow}{meff}{c.end}"
+    else:
+        seff['MEff'] = meff
+    return seff
+
+
+def plain_seff(value):
+    """
+    The efficiency of format_seff as number, None is unknown.
+
+    >>> plain_seff(format_seff(80, 10)['CEff']), plain_seff('??'), plain_seff(50)
+    (80, None, 50)
+    """
+    if isinstance(value, str):
+        value = strip_ANSI_escape_sequences(value)
+        return int(value) if value.isdigit() else None
+    return value
+
+
+class SeffBatch:
+    """
+    Batched version of seff: Collect the step values of many jobs in flat
+    lists (the jobs themselves are not kept) and compute the efficiency of
+    all jobs at once with NumPy (segmented reductions over the steps).
+    Without NumPy, the same reductions are done in Python.
+
+    The import of NumPy takes longer (ca. 0.1 s) than it saves for less
+    than NUMPY_MIN_JOBS jobs (ca. 2.5 us per job), hence by default NumPy
+    is only used for many jobs or when it is already imported.
+
+    >>> def step(seconds, tasks, used, alloc):
+    ...     return {'time': {'total': {'seconds': seconds, 'microseconds': 0}},
+    ...             'tasks': {'count': tasks},
+    ...             'tres': {'requested': {'max': [{'type': 'mem', 'count': used}]},
+    ...                      'allocated': [{'type': 'mem', 'count': alloc}]}}
+    >>> def job(elapsed, cpus, *steps):
+    ...     return {'time': {'elapsed': elapsed}, 'required': {'CPUs': cpus},
+    ...             'steps': list(steps)}
+    >>> jobs = [
+    ...     job(100, 4, step(300, 1, 2**30, 2048), step(50, 2, 2**29, 2048)),
+    ...     job(0, 4),
+    ...     job(100, 1, step(10, 1, 0, 0)),
+    ...     job(100, 2, step(190, 3, 2**20, 1), step(1, 1, 2**19, 1)),
+    ... ]
+    >>> batch = SeffBatch()
+    >>> for j in jobs:
+    ...     _ = batch.add(j)
+    >>> batch.compute(use_numpy=True) == [seff(j) for j in jobs]
+    True
+    >>> batch.compute(use_numpy=False) == [seff(j) for j in jobs]
+    True
+    """
+    def __init__(self):
+        self.elapsed_times_cpus = []  # per job
+        self.step_offsets = [0]  # per job, steps of job i: offsets[i]:offsets[i+1]
+        self.cpu_time_used = []  # per step, microseconds
+        # Mem entries: job index, rank within the job (order matters for
+        # the requested memory, see seff), count and number of tasks.
+        self.mem_job = []
+        self.mem_rank = []
+        self.mem_count = []
+        self.mem_tasks = []
+        self.alloc_job = []
+        self.alloc_count = []
+
+    def __len__(self):
+        return len(self.elapsed_times_cpus)
+
+    def add(self, job):
+        """Add the job and return its index in the result of compute."""
+        index = len(self)
+        self.elapsed_times_cpus.append(
+            job['time']['elapsed'] * job['required']['CPUs'])
+        rank = 0
+        for step in job['steps']:
+            self.cpu_time_used.append(
+                step['time']['total']['seconds'] * 1_000_000
+                + step['time']['total']['microseconds'])
+            for entry in step['tres']['requested']['max']:
+                if entry['type'] == 'mem':
+                    self.mem_job.append(index)
+                    self.mem_rank.append(rank)
+                    self.mem_count.append(entry['count'])
+                    self.mem_tasks.append(step['tasks']['count'])
+                    rank += 1
+            for entry in step['tres']['allocated']:
+                if entry['type'] == 'mem':
+                    self.alloc_job.append(index)
+                    self.alloc_count.append(entry['count'])
+        self.step_offsets.append(len(self.cpu_time_used))
+        return index
+
+    NUMPY_MIN_JOBS = 50_000
+
+    @timings.phase('seff')
+    def compute(self, use_numpy=None):
+        """The seff dicts (CEff and MEff) of all added jobs."""
+        if use_numpy is None:
+            use_numpy = len(self) >= self.NUMPY_MIN_JOBS or 'numpy' in sys.modules
+        if use_numpy:
+            try:
+                import numpy as np
+            except ImportError:
+                use_numpy = False
+        if use_numpy:
+            ceff, meff = self._compute_numpy(np)
+        else:
+            ceff, meff = self._compute_python()
+        return [format_seff(ce, me) for ce, me in zip(ceff, meff)]
+
+    def _compute_numpy(self, np):
+        n = len(self)
+        offsets = np.array(self.step_offsets, dtype=np.int64)
+        cumsum = np.concatenate([
+            [0], np.cumsum(np.array(self.cpu_time_used, dtype=np.int64))])
+        cpu_time_used = cumsum[offsets[1:]] - cumsum[offsets[:-1]]
+
+        elapsed_times_cpus = np.array(self.elapsed_times_cpus, dtype=np.int64)
+        valid = elapsed_times_cpus > 0
+        ceff = np.zeros(n, dtype=np.int64)
+        ceff[valid] = np.rint(
+            cpu_time_used[valid] / 1_000_000 / elapsed_times_cpus[valid] * 100)
+        ceff_list = [
+            int(v) if ok else None for v, ok in zip(ceff.tolist(), valid.tolist())]
+
+        # seff multiplies the running maximum with the tasks of each step,
+        # hence this is a recurrence along the steps of a job. Vectorize
+        # over the jobs and loop over the rank (number of steps).
+        mem_job = np.array(self.mem_job, dtype=np.int64)
+        mem_rank = np.array(self.mem_rank, dtype=np.int64)
+        mem_count = np.array(self.mem_count, dtype=np.int64)
+        mem_tasks = np.array(self.mem_tasks, dtype=np.int64)
+        order = np.lexsort((mem_job, mem_rank))
+        bounds = np.searchsorted(
+            mem_rank[order], np.arange(mem_rank.max() + 2 if len(mem_rank) else 1))
+        mem_requested = np.zeros(n, dtype=np.int64)
+        int64_max = np.iinfo(np.int64).max
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            idx = order[start:stop]
+            jobs = mem_job[idx]
+            peak = np.maximum(mem_requested[jobs], mem_count[idx])
+            if np.any(peak > int64_max // np.maximum(mem_tasks[idx], 1)):
+                # Python ints don't overflow.
+                return ceff_list, self._compute_python()[1]
+            mem_requested[jobs] = peak * mem_tasks[idx]
+
+        mem_allocated = np.zeros(n, dtype=np.int64)
+        np.maximum.at(
+            mem_allocated,
+            np.array(self.alloc_job, dtype=np.int64),
+            np.array(self.alloc_count, dtype=np.int64))
+        valid_mem = mem_allocated > 0
+        meff = np.zeros(n, dtype=np.int64)
+        meff[valid_mem] = np.rint(
+            mem_requested[valid_mem] / (mem_allocated[valid_mem] * 1024 ** 2) * 100)
+
+        return ceff_list, [
+            int(v) if ok else None for v, ok in zip(meff.tolist(), valid_mem.tolist())]
+
+    def _compute_python(self):
+        n = len(self)
+        ceff = []
+        for i in range(n):
+            used = sum(self.cpu_time_used[
+                self.step_offsets[i]:self.step_offsets[i + 1]])
+            total = self.elapsed_times_cpus[i]
+            ceff.append(round(used / 1_000_000 / total * 100) if total > 0 else None)
+
+        # The entries of a job are consecutive and in order of their rank.
+        mem_requested = [0] * n
+        for i, count, tasks in zip(self.mem_job, self.mem_count, self.mem_tasks):
+            mem_requested[i] = max(mem_requested[i], count) * tasks
+        mem_allocated = [0] * n
+        for i, count in zip(self.alloc_job, self.alloc_count):
+            mem_allocated[i] = max(mem_allocated[i], count)
+        meff = [
+            round(r / (a * 1024 ** 2) * 100) if a > 0 else None
+            for r, a in zip(mem_requested, mem_allocated)
+        ]
+        return ceff, meff
@@ -0,0 +1,253 @@
+import os
+import re
+import json
+import datetime
+
+from cbj_smon.jobs.rows import JobRow
+
+
+def sacct_time_to_timestamp(value, now):
+    """
+    Convert the common sacct time formats (see `man sacct`, -S) to a
+    timestamp. Returns None for formats that are not supported.
+
+    >>> now = datetime.datetime(2024, 7, 9, 14, 30).timestamp()
+    >>> sacct_time_to_timestamp('now-12hours', now) == now - 12 * 3600
+    True
+    >>> sacct_time_to_timestamp('now-90', now) == now - 90
+    True
+    >>> datetime.datetime.fromtimestamp(sacct_time_to_timestamp('07/08/24-16:07', now))
+    datetime.datetime(2024, 7, 8, 16, 7)
+    >>> datetime.datetime.fromtimestamp(sacct_time_to_timestamp('2024-07-08T16:07', now))
+    datetime.datetime(2024, 7, 8, 16, 7)
+    >>> datetime.datetime.fromtimestamp(sacct_time_to_timestamp('08:15', now))
+    datetime.datetime(2024, 7, 9, 8, 15)
+    >>> print(sacct_time_to_timestamp('midnight', now))
+    None
+    """
+    m = re.fullmatch(r'now(?:([+-])(\d+)(seconds|minutes|hours|days|weeks)?)?', value)
+    if m:
+        sign, count, unit = m.groups()
+        if sign is None:
+            return now
+        seconds = int(count) * {
+            None: 1, 'seconds': 1, 'minutes': 60, 'hours': 3600,
+            'days': 86400, 'weeks': 7 * 86400,
+        }[unit]
+        return now + seconds if sign == '+' else now - seconds
+
+    for time_format in [
+        '%m/%d/%y-%H:%M',  # date +%D-%R
+        '%m/%d/%y-%H:%M:%S',
+        '%m/%d/%y',
+        '%Y-%m-%dT%H:%M:%S',
+        '%Y-%m-%dT%H:%M',
+        '%Y-%m-%d',
+    ]:
+        try:
+            return datetime.datetime.strptime(value, time_format).timestamp()
+        except ValueError:
+            pass
+
+    for time_format in ['%H:%M:%S', '%H:%M']:
+        try:
+            t = datetime.datetime.strptime(value, time_format).time()
+        except ValueError:
+            pass
+        else:
+            today = datetime.datetime.fromtimestamp(now).date()
+            return datetime.datetime.combine(today, t).timestamp()
+    return None
+
+
+def default_cache_dir():
+    return os.path.join(
+        os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+        'cbj_smon',
+    )
+
+
+class SacctStore:
+    """
+    On-disk store (SQLite) of the parsed sacct rows of finished jobs.
+
+    Finished jobs never change, hence they are written once and afterwards
+    sacct has only to be asked for the jobs that were active since the last
+    sync. Active jobs are never stored, they are always fetched from sacct.
+    Jobs, that ended more than max_age ago, are deleted, independent of the
+    window of the query, i.e. calls with different windows (e.g. vatch with
+    now-12hours and a manual now-7days) don't delete the rows of each other.
+
+    >>> import tempfile
+    >>> with tempfile.TemporaryDirectory() as tmp:
+    ...     store = SacctStore(os.path.join(tmp, 'sacct.sqlite'), scope='cbj')
+    ...     print(store.query_start(1000, now=5000))
+    ...     store.update({1: {'JobID': 1, 'End': 1500, 'Elapsed': [1, 2]}},
+    ...                  finished={1}, covered_start=1000, now=5000)
+    ...     store.query_start(1000, now=6000)
+    ...     store.load(1000)
+    ...     store.load(2000)
+    ...     store.update({}, finished=set(), covered_start=4000, now=7000)
+    ...     store.query_start(1000, now=8000)
+    ...     store.update({}, finished=set(), covered_start=4000, now=1500 + store.max_age + 1)
+    ...     store.query_start(1000, now=1500 + store.max_age + 2), store.load(0)
+    None
+    4400.0
+    {1: JobRow({'JobID': 1, 'Elapsed': [1, 2], 'End': 1500})}
+    {}
+    6400.0
+    (None, {})
+    """
+    # Jobs that finished shortly before the last sync might not yet be
+    # final in slurmdbd, hence overlap the queries by this margin.
+    margin = 10 * 60
+    # The age (seconds since the end) of the jobs, that are deleted.
+    max_age = 60 * 86400
+
+    def __init__(self, path=None, scope='allusers'):
+        import sqlite3
+
+        if path is None:
+            path = os.path.join(default_cache_dir(), 'sacct.sqlite')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.scope = scope
+        self.con = sqlite3.connect(path, timeout=30)
+        with self.con:
+            self.con.execute(
+                'CREATE TABLE IF NOT EXISTS jobs ('
+                ' scope TEXT, job_id INTEGER, end_time INTEGER, row TEXT,'
+                ' PRIMARY KEY (scope, job_id))')
+            self.con.execute(
+                'CREATE TABLE IF NOT EXISTS meta ('
+                ' scope TEXT PRIMARY KEY, covered_start REAL, last_sync REAL)')
+            self.con.execute(
+                'CREATE TABLE IF NOT EXISTS seff ('
+                ' job_id INTEGER PRIMARY KEY, row TEXT)')
+            self.con.execute(
+                'CREATE TABLE IF NOT EXISTS steps ('
+                ' job_id INTEGER PRIMARY KEY, key TEXT, steps TEXT)')
+
+    def query_start(self, start, now):
+        """
+        Returns the timestamp, from which sacct has to be queried to
+        complete the store for the window [start, now], or None, if the
+        store doesn't cover start (i.e. a full query is necessary).
+        """
+        meta = self.con.execute(
+            'SELECT covered_start, last_sync FROM meta WHERE scope = ?',
+            (self.scope,)).fetchone()
+        if meta is None:
+            return None
+        covered_start, last_sync = meta
+        if start < covered_start or last_sync > now:
+            return None
+        return max(start, last_sync - self.margin)
+
+    def update(self, table, finished, covered_start, now):
+        """
+        Store the rows of the finished jobs and remember, that the store is
+        complete for [covered_start, now]. The jobs, that ended more than
+        max_age ago, are deleted, i.e. the store doesn't grow with each
+        call, and their memoized efficiency, when no scope has them.
+        """
+        oldest = now - self.max_age
+        with self.con:
+            self.con.executemany(
+                'INSERT OR REPLACE INTO jobs VALUES (?, ?, ?, ?)',
+                [
+                    (self.scope, job_id, table[job_id]['End'],
+                     json.dumps(dict(table[job_id].items())))
+                    for job_id in finished
+                ])
+            pruned = self.con.execute(
+                'DELETE FROM jobs WHERE scope = ? AND end_time < ?',
+                (self.scope, oldest)).rowcount
+            if pruned:
+                self.con.execute(
+                    'DELETE FROM seff WHERE job_id NOT IN (SELECT job_id FROM jobs)')
+            self.con.executemany(
+                'DELETE FROM steps WHERE job_id = ?', [(job_id,) for job_id in finished])
+            meta = self.con.execute(
+                'SELECT covered_start FROM meta WHERE scope = ?',
+                (self.scope,)).fetchone()
+            if meta is not None:
+                covered_start = min(covered_start, meta[0])
+            covered_start = max(covered_start, oldest)
+            self.con.execute(
+                'INSERT OR REPLACE INTO meta VALUES (?, ?, ?)',
+                (self.scope, covered_start, now))
+
+    def load(self, start):
+        """Rows of all stored jobs, that ended after start, by job id."""
+        return {
+            job_id: JobRow(json.loads(row))
+            for job_id, row in self.con.execute(
+                'SELECT job_id, row FROM jobs WHERE scope = ? AND end_time >= ?'
+                ' ORDER BY job_id',
+                (self.scope, start))
+        }
+
+    def load_seff(self, job_ids):
+        """
+        The memoized efficiency (CEff and MEff) of the given finished jobs.
+        Jobs are identified by their id, hence this is shared by all scopes.
+
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as tmp:
+        ...     store = SacctStore(os.path.join(tmp, 'sacct.sqlite'))
+        ...     store.update_seff({1: {'CEff': 50, 'MEff': '??'}})
+        ...     store.load_seff([1, 2])
+        {1: {'CEff': 50, 'MEff': '??'}}
+        """
+        return {
+            job_id: json.loads(row)
+            for job_id, row in self._select('seff', 'row', job_ids)
+        }
+
+    def update_seff(self, seffs):
+        """Memoize the efficiency of finished jobs, it never changes."""
+        with self.con:
+            self.con.executemany(
+                'INSERT OR REPLACE INTO seff VALUES (?, ?)',
+                [(job_id, json.dumps(seff)) for job_id, seff in seffs.items()])
+            # The steps of the running jobs are no longer needed.
+            self.con.executemany(
+                'DELETE FROM steps WHERE job_id = ?', [(job_id,) for job_id in seffs])
+
+    def _select(self, table, columns, job_ids):
+        job_ids = list(job_ids)
+        # Stay below SQLITE_MAX_VARIABLE_NUMBER of old SQLite versions.
+        for i in range(0, len(job_ids), 900):
+            chunk = job_ids[i:i + 900]
+            yield from self.con.execute(
+                f'SELECT job_id, {columns} FROM {table} WHERE job_id IN '
+                f'({",".join("?" * len(chunk))})', chunk)
+
+    def load_steps(self, job_ids):
+        """
+        The memoized steps of running jobs: job_id -> (key, steps), where
+        the key identifies the state of the steps (see _steps_key).
+
+        >>> import tempfile
+        >>> with tempfile.TemporaryDirectory() as tmp:
+        ...     store = SacctStore(os.path.join(tmp, 'sacct.sqlite'))
+        ...     store.update_steps({1: ('1.batch:RUNNING', [{'tasks': {'count': 1}}])})
+        ...     store.load_steps([1, 2])
+        ...     store.update_seff({1: {'CEff': 50, 'MEff': 20}})
+        ...     store.load_steps([1, 2])
+        {1: ('1.batch:RUNNING', [{'tasks': {'count': 1}}])}
+        {}
+        """
+        return {
+            job_id: (key, json.loads(steps))
+            for job_id, key, steps in self._select('steps', 'key, steps', job_ids)
+        }
+
+    def update_steps(self, steps):
+        """Memoize the steps of running jobs, see load_steps."""
+        with self.con:
+            self.con.executemany(
+                'INSERT OR REPLACE INTO steps VALUES (?, ?, ?)',
+                [(job_id, key, json.dumps(job_steps))
+                 for job_id, (key, job_steps) in steps.items()])
@@ -0,0 +1,538 @@
+import time
+import os
+import re
+import json
+import functools
+import subprocess
+from cbj_smon.timings import timings
+
+
+class c:
+    purple = '\033[35m'
+    Purple = '\033[95m'
+    green = '\033[32m'
+    red = '\033[31m'
+    yellow = '\033[33m'
+    cyan = '\033[36m'
+    blue = '\033[34m'
+    end = '\033[0m'
+    invert = '\033[7m'
+
+
+
+def slurm_nums_to_python(obj):
+    """
+    >>> slurm_nums_to_python({"set": True, "infinite": False, "number": 1720527843})
+    1720527843
+    >>> print(slurm_nums_to_python({"set": False, "infinite": False, "number": 0}))
+    None
+    """
+    if isinstance(obj, dict):
+        if obj.keys() == {'set', 'infinite', 'number'}:
+            if obj['set']:
+                assert not obj['infinite'], obj
+                return obj['number']
+            else:
+                return None
+        else:
+            return {k: slurm_nums_to_python(v) for k, v in obj.items()}
+    elif isinstance(obj, list):
+        return [slurm_nums_to_python(v) for v in obj]
+    else:
+        return obj
+
+
+def compile_fields(fields):
+    """
+    Compile a nested description of the used fields to a function, that
+    keeps only those fields and converts the slurm numbers (see
+    slurm_nums_to_python) of the kept fields. Hence, the unused parts of a
+    job (e.g. the TRES statistics of the steps) are never walked.
+
+    In fields, True keeps the value and a list with one entry is applied to
+    each entry of a list. Missing keys stay missing.
+
+    >>> project = compile_fields({'a': True, 'b': {'c': True}, 'e': [{'f': True}], 'h': True})
+    >>> project({'a': {"set": True, "infinite": False, "number": 1},
+    ...          'b': {'c': 2, 'd': 3}, 'e': [{'f': 4, 'g': 5}]})
+    {'a': 1, 'b': {'c': 2}, 'e': [{'f': 4}]}
+    """
+    if isinstance(fields, list):
+        entry, = fields
+        entry = compile_fields(entry)
+
+        def project(obj):
+            if obj is None:
+                return None
+            return [entry(v) for v in obj]
+        return project
+
+    leaves = [k for k, v in fields.items() if v is True]
+    nested = [(k, compile_fields(v)) for k, v in fields.items() if v is not True]
+
+    def project(obj):
+        if obj is None:
+            return None
+        new = {}
+        for k in leaves:
+            if k in obj:
+                v = obj[k]
+                new[k] = slurm_nums_to_python(v) if isinstance(v, (dict, list)) else v
+        for k, fn in nested:
+            if k in obj:
+                new[k] = fn(obj[k])
+        return new
+    return project
+
+
+def merge_fields(*fields):
+    """
+    The union of nested descriptions of the used fields (see compile_fields).
+
+    >>> merge_fields({'a': True, 'b': {'c': True}}, {'b': {'d': True}}, {'e': [{'f': True}]}, {'e': [{'g': True}]})
+    {'a': True, 'b': {'c': True, 'd': True}, 'e': [{'f': True, 'g': True}]}
+    >>> merge_fields({'a': {'b': True}}, {'a': True})
+    {'a': True}
+    """
+    merged = {}
+    for f in fields:
+        for k, v in f.items():
+            old = merged.get(k)
+            if old is None:
+                merged[k] = v
+            elif old is True or v is True:
+                merged[k] = True
+            elif isinstance(v, list):
+                merged[k] = [merge_fields(old[0], v[0])]
+            else:
+                merged[k] = merge_fields(old, v)
+    return merged
+
+
+def iter_json_array(stream, key, chunk_size=2 ** 16):
+    """
+    Yield the entries of the array `key` of a top-level json object, while
+    the object is read from the stream, i.e. only one entry has to be in
+    memory and the parsing overlaps with the writer of the stream.
+
+    >>> import io
+    >>> s = '{"meta": {"a": [1, 2]}, "jobs": [{"job_id": 1}, {"job_id": 22}], "errors": []}'
+    >>> list(iter_json_array(io.StringIO(s), 'jobs', chunk_size=3))
+    [{'job_id': 1}, {'job_id': 22}]
+    >>> list(iter_json_array(io.StringIO('{"jobs": [], "errors": []}'), 'jobs'))
+    []
+    """
+    decoder = json.JSONDecoder()
+    whitespace = re.compile(r'[ \t\n\r]*').match
+    buffer = ''
+    pos = 0
+    eof = False
+
+    def fill():
+        nonlocal buffer, pos, eof
+        # Read at least as much as is buffered, so that a large value
+        # doesn't get decoded from scratch for each chunk.
+        chunk = stream.read(max(chunk_size, len(buffer) - pos))
+        if not chunk:
+            eof = True
+        buffer = buffer[pos:] + chunk
+        pos = 0
+
+    def peek():
+        nonlocal pos
+        while True:
+            pos = whitespace(buffer, pos).end()
+            if pos < len(buffer):
+                return buffer[pos]
+            if eof:
+                raise ValueError('Unexpected end of json')
+            fill()
+
+    def expect(chars):
+        nonlocal pos
+        char = peek()
+        if char not in chars:
+            raise ValueError(f'Expected one of {chars!r}, got {buffer[pos:pos+20]!r}')
+        pos += 1
+        return char
+
+    def decode():
+        nonlocal pos
+        while True:
+            pos = whitespace(buffer, pos).end()
+            try:
+                obj, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # A number at the end of the buffer might be truncated.
+                if end < len(buffer) or eof:
+                    pos = end
+                    return obj
+            fill()
+
+    expect('{')
+    if peek() == '}':
+        return
+    while True:
+        name = decode()
+        expect(':')
+        if name == key:
+            expect('[')
+            if peek() == ']':
+                pos += 1
+            else:
+                while True:
+                    yield decode()
+                    if expect(',]') == ']':
+                        break
+        else:
+            decode()
+        if expect(',}') == '}':
+            return
+
+
+def iter_slurm_json(cmd, key='jobs', env=None, fields=None):
+    """
+    Run a slurm command with --json and yield the entries of `key`, while
+    the command is still writing its output. With fields, the entries are
+    reduced to the used fields (see compile_fields).
+    """
+    project = slurm_nums_to_python if fields is None else compile_fields(fields)
+    with timings.popen(
+            cmd, shell=True, stdout=subprocess.PIPE,
+            universal_newlines=True, env=env) as p:
+        try:
+            for entry in iter_json_array(p.stdout, key):
+                yield project(entry)
+        except ValueError:
+            # Incomplete output is usually caused by a failing command.
+            if p.wait() != 0:
+                raise subprocess.CalledProcessError(p.returncode, cmd) from None
+            raise
+        except BaseException:
+            p.kill()
+            raise
+    if p.returncode != 0:
+        raise subprocess.CalledProcessError(p.returncode, cmd)
+
+
+def iter_restd_json(path, key='jobs', params=None, fields=None):
+    """
+    Like iter_slurm_json, but the entries are streamed from slurmrestd
+    (see cbj_smon.restd), e.g. iter_restd_json('slurmdb/jobs').
+    """
+    project = slurm_nums_to_python if fields is None else compile_fields(fields)
+    from cbj_smon import restd
+
+    with restd.client().get(path, params) as stream:
+        for entry in iter_json_array(stream, key):
+            yield project(entry)
+
+
+def human_readable_time(seconds, is_timestamp=None):
+    """
+    >>> human_readable_time(60)
+    '0:1:0'
+    >>> human_readable_time(3600)
+    '1:0:0'
+    >>> human_readable_time(86400)
+    '24:0:0'
+    >>> human_readable_time(86400 + 3600 + 60)
+    '25:1:0'
+
+    >>> human_readable_time(time.time())
+    '16:07'
+    >>> human_readable_time(time.time() - 60)
+    '16:06'
+    >>> human_readable_time(time.time() - 60*60*24)
+    'Mon 16:07'
+    >>> human_readable_time(time.time() - 60*60*24*7)
+    '07-02 16:07'
+    >>> human_readable_time(time.time() + 60)
+    '\\x1b[31m16:14\\x1b[0m'
+    """
+    if is_timestamp is None:
+        is_timestamp = seconds > 1_000_000_000
+    elif is_timestamp is True:
+        pass
+    elif is_timestamp is False:
+        pass
+    else:
+        raise ValueError(f'is_timestamp={is_timestamp!r}')
+
+    if is_timestamp:  # assume seconds is a timestamp
+        if seconds == 0:
+            return '?'
+
+        # 6 days in seconds = 6 * 24 * 60 * 60 = 518400
+        # 7 days in seconds = 7 * 24 * 60 * 60 = 604800
+        # 365 days in seconds = 365 * 24 * 60 * 60 = 31536000
+        now = time.time()
+
+        if (  # today
+                abs(seconds - now) < 86400  # cheap test
+                and time.strftime("%Y-%m-%d", time.localtime(seconds)) == time.strftime("%Y-%m-%d", time.localtime(now))  # actual test
+        ):
+            time_format = '%H:%M'
+        elif abs(seconds - now) < 518400:  # less than 6 days
+            time_format = '%a %H:%M'
+        elif abs(seconds - now) < 31536000:  # less than 1 year
+            time_format = '%m-%d %H:%M'
+        else:
+            time_format = '%Y-%m-%d %H:%M'
+
+        if seconds < now:
+            return f'{time.strftime(time_format, time.localtime(seconds))}'
+        else:
+            if seconds == 4294967294:  # dummy start value in slurm from sacct
+                return '-'
+            return f'\033[31m{time.strftime(time_format, time.localtime(seconds))}\033[0m'
+    else:
+        if seconds >= 4294967294:
+            return '?'
+
+        seconds = round(seconds)
+        hours = seconds // 3600
+        # days = hours // 24
+        # hours = hours % 24
+        seconds = seconds % 3600
+        minutes = seconds // 60
+        seconds = seconds % 60
+        # if hours:
+        # return f'{seconds / 36000:.1f}h'
+        # if days:
+        #     return f'{days}-{hours:02d}:{minutes:02d}'
+        # else:
+        return f'{hours:02d}:{minutes:02d}'
+        # return f'{hours:02d}:{minutes:02d}:{seconds:02d}'
+        # else:
+        #     return f'{minutes:02d}:{seconds:02d}'
+
+
+@functools.lru_cache(maxsize=2 ** 14)
+def _strftime_minute(minute, time_format, future):
+    """The formatted timestamp of a minute (seconds // 60), see TimeFormatter."""
+    text = time.strftime(time_format, time.localtime(minute * 60))
+    return f'\033[31m{text}\033[0m' if future else text
+
+
+class TimeFormatter:
+    """
+    human_readable_time for the many values of a table: The day boundaries
+    are computed once per render, the formatted timestamps are cached per
+    minute and the durations are taken from a table.
+
+    >>> f = TimeFormatter()
+    >>> now = time.time()
+    >>> values = [0, now - 1, now - 60, now - 86400, now - 7 * 86400, now - 400 * 86400, now + 60, 4294967294]
+    >>> [f.timestamp(v) for v in values] == [human_readable_time(v, is_timestamp=True) for v in values]
+    True
+    >>> values = [0, 59.6, 3600, 86400 + 3600 + 60, 400 * 3600, 4294967294]
+    >>> [f.duration(v) for v in values] == [human_readable_time(v, is_timestamp=False) for v in values]
+    True
+    """
+    # The formatted durations of the first week, i.e. of the usual time limits.
+    _durations = None
+
+    def __init__(self, now=None):
+        self.now = time.time() if now is None else now
+        today = time.localtime(self.now)
+        self.today_start = time.mktime((today.tm_year, today.tm_mon, today.tm_mday, 0, 0, 0, 0, 0, -1))
+        self.today_end = time.mktime((today.tm_year, today.tm_mon, today.tm_mday + 1, 0, 0, 0, 0, 0, -1))
+        if TimeFormatter._durations is None:
+            TimeFormatter._durations = [
+                f'{m // 60:02d}:{m % 60:02d}' for m in range(7 * 24 * 60)]
+
+    def timestamp(self, seconds):
+        if seconds == 0:
+            return '?'
+        delta = abs(seconds - self.now)
+        if delta < 86400 and self.today_start <= seconds < self.today_end:
+            time_format = '%H:%M'
+        elif delta < 518400:  # less than 6 days
+            time_format = '%a %H:%M'
+        elif delta < 31536000:  # less than 1 year
+            time_format = '%m-%d %H:%M'
+        else:
+            time_format = '%Y-%m-%d %H:%M'
+        future = seconds >= self.now
+        if future and seconds == 4294967294:  # dummy start value in slurm from sacct
+            return '-'
+        return _strftime_minute(int(seconds // 60), time_format, future)
+
+    def duration(self, seconds):
+        if seconds >= 4294967294:
+            return '?'
+        minutes = round(seconds) // 60
+        if 0 <= minutes < len(self._durations):
+            return self._durations[minutes]
+        return human_readable_time(seconds, is_timestamp=False)
+
+
+def format_memory(mem_in_MB):
+    """
+    >>> format_memory(1024)
+    '1024M'
+    >>> format_memory(1024*1024)
+    '1049G'
+    >>> format_memory(1024*1024*1024)
+    '1074T'
+    >>> format_memory(1024*1024*1024*1024)
+    '1100P'
+    """
+    try:
+        factor = 1024
+        margin = 8
+        for suffix in ['M', 'G', 'T', 'P', 'E']:
+            if mem_in_MB < factor * margin:
+                return f'{mem_in_MB:.0f}{suffix}'
+            mem_in_MB /= factor
+    except Exception:
+        raise ValueError(f'Error in format_memory({mem_in_MB!r})')
+
+
+def highlight_progress_text(progress, text):
+    """
+    >>> highlight_progress_text(0.5, 'Some text')
+    '\\x1b[7mSome\\x1b[0m text'
+    >>> highlight_progress_text(0.5, 'Some')
+    '\\x1b[7mSo\\x1b[0mme'
+    """
+    progress = int(round(progress * len(text)))
+    return c.invert + text[:progress] + c.end + text[progress:]
+
+
+# The columns of the table, in the order of the output (see --columns).
+COLUMNS = (
+    'User', 'JobID', 'Name', 'State', 'Elapsed', 'Submit', 'Start', 'End',
+    'n', 'cpu', 'gpu', 'mem', 'CEff', 'MEff', 'billing', 'N', 'Partition',
+    'Acc', 'QoS', 'Nodes', 'Priority', 'Tool',
+)
+ALL_COLUMNS = frozenset(COLUMNS)
+# Additionally, the rows can have the hidden column Array (see
+# collapse_arrays), that is only computed for --collapse-arrays.
+STATE_COLORS = {
+    'PENDING': c.cyan,
+    'RUNNING': c.green,
+    'COMPLETED': c.yellow,
+    'FAILED': c.red,
+    'TIMEOUT': c.red,
+}
+# The state counts of arrays: Order and short names (see STATE_CODES).
+STATE_ORDER = {
+    state: i for i, state in enumerate([
+        'RUNNING', 'PENDING', 'COMPLETING', 'COMPLETED', 'FAILED', 'TIMEOUT',
+        'OUT_OF_MEMORY', 'CANCELLED', 'NODE_FAIL',
+    ])
+}
+SHORT_STATES = {
+    'RUNNING': 'R', 'PENDING': 'PD', 'COMPLETING': 'CG', 'COMPLETED': 'CD',
+    'FAILED': 'F', 'TIMEOUT': 'TO', 'OUT_OF_MEMORY': 'OOM', 'CANCELLED': 'CA',
+    'NODE_FAIL': 'NF',
+}
+
+# Computed for each selection of columns: The id, the user (colorize_table),
+# the submit time (order of the rows) and the end (SacctStore).
+BASE_COLUMNS = frozenset({'User', 'JobID', 'Submit', 'End', 'Tool'})
+
+
+def colorize_table(table, columns=None):
+    """
+    The formatted rows of the table (new dicts of text), with columns only
+    these columns. The rows of the table keep their raw values.
+
+    >>> _ = os.environ.setdefault('USER', 'cbj')
+    >>> row = {'User': 'nobody', 'JobID': 1, 'Tool': 'squeue', 'mem': 2048, 'Elapsed': (60, 120)}
+    >>> colorize_table({1: row}, frozenset(row))
+    {1: {'User': 'nobody', 'JobID': '1', 'Tool': 'squeue', 'mem': '2048M', 'Elapsed': '\\x1b[7m00:01 \\x1b[0m/ 00:02'}}
+    >>> row['mem'], row['Elapsed']
+    (2048, (60, 120))
+    """
+    if columns is None:
+        columns = ALL_COLUMNS
+    formatter = TimeFormatter()
+
+    formatted = {}
+    for job_id, row in table.items():
+        line = formatted[job_id] = dict(row.items())
+        for k in ['JobID']:
+            line[k] = str(line[k])
+
+        # user self should be purple
+        if line['User'] == os.environ['USER']:
+            # color user, jobid and name
+            line['User'] = c.purple + line['User'] + c.end
+            line['JobID'] = c.purple + line['JobID'] + c.end
+            if 'Name' in columns:
+                line['Name'] = c.purple + line['Name'] + c.end
+
+        if 'State' in columns and isinstance(line['State'], dict):
+            # The state counts of an array (see collapse_arrays).
+            line['State'] = ' '.join([
+                (f'{STATE_COLORS[state]}{SHORT_STATES.get(state, state)}{c.end}'
+                 if state in STATE_COLORS else SHORT_STATES.get(state, state))
+                + f':{count}'
+                for state, count in sorted(
+                    line['State'].items(),
+                    key=lambda item: STATE_ORDER.get(item[0], len(STATE_ORDER)))
+            ])
+        elif 'State' in columns:
+            # colorize the state
+            for state, color in STATE_COLORS.items():
+                line['State'] = line['State'].replace(state, color + state + c.end)
+
+            if line['Tool'] == 'sacct':
+                line['State'] = line['State'].replace('RUNNING', 'RUNNING (outdated sacct?)').replace('PENDING', 'PENDING (outdated sacct?)')
+
+        if 'mem' in columns:
+            line['mem'] = format_memory(line['mem'])
+        # line['Elapsed'] = human_readable_time(line['Elapsed'], is_timestamp=False)
+        for k in ['Submit', 'Start', 'End']:
+            if k in columns:
+                line[k] = formatter.timestamp(line[k])
+
+        if 'billing' not in columns:
+            continue
+        if line['billing'] is not None:
+            bil_eca, bil_tres = line['billing']
+            bil_tres = round(bil_tres)
+            bil_eca = round(bil_eca)
+            color = ''
+            if bil_eca > 30 * 24:  # over a month
+                color = c.red
+            elif bil_eca > 7 * 24:  # over a week
+                color = c.yellow
+            line['billing'] = f'{color}{bil_eca},{bil_tres: 3d}{c.end}'
+        else:
+            line['billing'] = '?,  ?'
+
+    if 'Elapsed' not in columns:
+        return formatted
+
+    Elapsed_width_0 = 0
+    Elapsed_width_1 = 0
+    for line in formatted.values():
+        # Arrays (see collapse_arrays) have additionally the min and max.
+        line['Elapsed'] = [
+            formatter.duration(line['Elapsed'][0]),
+            formatter.duration(line['Elapsed'][1]),
+            line['Elapsed'][0] / line['Elapsed'][1],
+            *[formatter.duration(e) for e in line['Elapsed'][2:]],
+        ]
+        Elapsed_width_0 = max(Elapsed_width_0, len(line['Elapsed'][0]))
+        Elapsed_width_1 = max(Elapsed_width_1, len(line['Elapsed'][1]))
+
+    for line in formatted.values():
+        Elapsed = [
+            line['Elapsed'][0].rjust(Elapsed_width_0),
+            line['Elapsed'][1].rjust(Elapsed_width_1),
+        ]
+        Elapsed = ' / '.join(Elapsed)
+        Elapsed_range = line['Elapsed'][3:]
+        line['Elapsed'] = highlight_progress_text(line['Elapsed'][2], Elapsed)
+        if Elapsed_range:
+            line['Elapsed'] = f'({"-".join(Elapsed_range)}) {line["Elapsed"]}'
+
+    return formatted
@@ -0,0 +1,207 @@
+"""
+Client of slurmrestd, an alternative to the slurm commands.
+
+Each call of a slurm command forks a shell and the command, that
+authenticates and serializes its json. slurmrestd serves the same json over
+HTTP, hence one process can reuse a few keep-alive connections for all its
+queries (e.g. squeue and the sacct shards of sacct.py).
+
+Enable it with CBJ_SMON_BACKEND=restd (sacct.py: --backend restd) and
+configure it with:
+    CBJ_SMON_SLURMRESTD          URL, e.g. http://localhost:6820 or
+                                 unix:/run/slurmrestd/slurmrestd.sock
+    CBJ_SMON_SLURMRESTD_VERSION  Version of the API (default v0.0.40)
+    SLURM_JWT                    Token (see `scontrol token`), if slurmrestd
+                                 uses JWT authentication.
+
+The job list of slurmctld and the node list support update_time. The last
+response is kept in the cache dir and reused, when nothing changed since its
+last_update.
+"""
+import contextlib
+import hashlib
+import http.client
+import io
+import json
+import os
+import socket
+import tempfile
+import threading
+import urllib.parse
+
+from cbj_smon.timings import timings
+
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path, timeout):
+        super().__init__('localhost', timeout=timeout)
+        self.unix_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.unix_path)
+
+
+def _last_update(data):
+    """
+    >>> _last_update({'last_update': {'set': True, 'infinite': False, 'number': 12}})
+    12
+    >>> _last_update({'last_update': {'set': False, 'infinite': False, 'number': 0}})
+    0
+    >>> _last_update({})
+    0
+    """
+    value = data.get('last_update') or 0
+    if isinstance(value, dict):
+        value = value['number'] if value['set'] else 0
+    return value
+
+
+class Slurmrestd:
+    """
+    >>> Slurmrestd('http://localhost:6820')._url('slurmdb/jobs', {'users': 'cbj', 'end_time': None})
+    '/slurmdb/v0.0.40/jobs?users=cbj'
+    """
+    def __init__(
+            self, url, version='v0.0.40', token=None, user=None,
+            cache_dir=None, timeout=300,
+    ):
+        self.url = url
+        self.version = version
+        self.user = user
+        self.timeout = timeout
+        self.cache_dir = cache_dir
+        self.headers = {'Accept': 'application/json'}
+        if token:
+            self.headers['X-SLURM-USER-TOKEN'] = token
+            if user:
+                self.headers['X-SLURM-USER-NAME'] = user
+
+        split = urllib.parse.urlsplit(url)
+        self._scheme = split.scheme
+        self._netloc = split.netloc
+        self._path = split.path
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        if self._scheme == 'unix':
+            return _UnixHTTPConnection(self._path, self.timeout)
+        elif self._scheme == 'https':
+            return http.client.HTTPSConnection(self._netloc, timeout=self.timeout)
+        elif self._scheme == 'http':
+            return http.client.HTTPConnection(self._netloc, timeout=self.timeout)
+        else:
+            raise ValueError(f'Unsupported slurmrestd URL: {self.url}')
+
+    def _url(self, path, params):
+        prefix, endpoint = path.split('/', maxsplit=1)
+        url = f'/{prefix}/{self.version}/{endpoint}'
+        params = {k: v for k, v in (params or {}).items() if v is not None}
+        if params:
+            url += '?' + urllib.parse.urlencode(params)
+        return url
+
+    @contextlib.contextmanager
+    def get(self, path, params=None):
+        """
+        Request e.g. get('slurm/jobs') and yield the body as text stream.
+        The connection goes back to the pool, when the body was consumed.
+        """
+        url = self._url(path, params)
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        while True:
+            reused = connection is not None
+            if not reused:
+                connection = self._connect()
+            try:
+                connection.request('GET', url, headers=self.headers)
+                response = connection.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionError):
+                connection.close()
+                if reused:
+                    # The server closed the idle keep-alive connection.
+                    connection = None
+                    continue
+                raise
+            break
+
+        try:
+            if response.status != 200:
+                raise RuntimeError(
+                    f'slurmrestd {url}: {response.status} {response.reason}\n'
+                    f'{response.read().decode(errors="replace")}')
+            with timings.request('slurmrestd', io.TextIOWrapper(response, encoding='utf-8')) as stream:
+                yield stream
+            response.read()
+        except BaseException:
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            with self._lock:
+                self._idle.append(connection)
+
+    def _cache_file(self, path):
+        key = hashlib.sha1(f'{self.url} {self.version} {self.user} {path}'.encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f'slurmrestd-{key}.json')
+
+    def load(self, path, key):
+        """
+        The entries of key, e.g. load('slurm/nodes', 'nodes'), for the
+        endpoints with update_time: With a cached response, slurmrestd
+        answers with an empty list, when nothing changed since its
+        last_update, and the cached entries are returned.
+        """
+        cached = None
+        if self.cache_dir is not None:
+            file = self._cache_file(path)
+            try:
+                with open(file) as f:
+                    cached = json.load(f)
+            except (OSError, ValueError):
+                pass
+
+        params = {}
+        if cached is not None and _last_update(cached):
+            params['update_time'] = _last_update(cached)
+        with self.get(path, params) as stream:
+            body = stream.read()
+        data = json.loads(body)
+
+        if params and not data[key] and _last_update(data) <= params['update_time']:
+            return cached[key]
+
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                    'w', dir=self.cache_dir, suffix='.tmp', delete=False) as f:
+                f.write(body)
+            os.replace(f.name, file)
+        return data[key]
+
+
+_client = None
+
+
+def client():
+    """The Slurmrestd for the environment, shared by all threads."""
+    global _client
+    if _client is None:
+        url = os.environ.get('CBJ_SMON_SLURMRESTD')
+        if not url:
+            raise RuntimeError('The restd backend needs CBJ_SMON_SLURMRESTD, e.g. http://localhost:6820')
+        _client = Slurmrestd(
+            url,
+            version=os.environ.get('CBJ_SMON_SLURMRESTD_VERSION') or 'v0.0.40',
+            token=os.environ.get('SLURM_JWT'),
+            user=os.environ.get('USER'),
+            cache_dir=os.path.join(
+                os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+                'cbj_smon',
+            ),
+        )
+    return _client
@@ -0,0 +1,101 @@
+"""
+Client of smond.py, the snapshot daemon.
+
+smond.py polls squeue, sacct, the nodes and the reservations on a schedule
+and serves the parsed snapshot over a Unix socket. The scripts ask the
+daemon first and fall back to the slurm commands, when it isn't running or
+can't answer (e.g. a sacct time range before its retention).
+
+The socket is $CBJ_SMON_SOCKET, default
+$XDG_RUNTIME_DIR/cbj_smon/smond.sock. CBJ_SMON_SNAPSHOT=0 disables the
+daemon for a client.
+
+Protocol: The client sends one json line {"query": ..., "params": {...}},
+the daemon answers with one json line {"ok": ..., "data": ..., "error": ...}
+and closes the connection.
+"""
+import json
+import os
+
+from cbj_smon.timings import timings
+
+
+def socket_path():
+    """
+    >>> os.environ['CBJ_SMON_SOCKET'] = '/tmp/test.sock'
+    >>> socket_path()
+    '/tmp/test.sock'
+    >>> del os.environ['CBJ_SMON_SOCKET']
+    """
+    if os.environ.get('CBJ_SMON_SOCKET'):
+        return os.environ['CBJ_SMON_SOCKET']
+    runtime_dir = (
+        os.environ.get('XDG_RUNTIME_DIR')
+        or os.environ.get('XDG_CACHE_HOME')
+        or os.path.expanduser('~/.cache')
+    )
+    return os.path.join(runtime_dir, 'cbj_smon', 'smond.sock')
+
+
+def request(query, params=None, path=None, timeout=10):
+    """Send one request to the daemon and return the response dict."""
+    import socket  # Only with a running daemon.
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(timeout)
+        s.connect(socket_path() if path is None else path)
+        s.sendall(json.dumps({'query': query, 'params': params or {}}).encode() + b'\n')
+        chunks = []
+        while chunk := s.recv(2 ** 20):
+            chunks.append(chunk)
+    return json.loads(b''.join(chunks))
+
+
+def query(name, max_age=120, **params):
+    """
+    The data of the daemon or None, if the daemon isn't running, the data is
+    older than max_age seconds or the daemon can't answer the query.
+
+    >>> os.environ['CBJ_SMON_SOCKET'] = '/nonexistent/smond.sock'
+    >>> print(query('nodes'))
+    None
+    >>> del os.environ['CBJ_SMON_SOCKET']
+    """
+    if os.environ.get('CBJ_SMON_SNAPSHOT') == '0':
+        return None
+    path = socket_path()
+    if not os.path.exists(path):
+        return None
+    with timings.phase('smond'):
+        try:
+            response = request(name, {'max_age': max_age, **params}, path=path)
+        except (OSError, ValueError):
+            return None
+    if not response['ok']:
+        return None
+    return response['data']
+
+
+def squeue_job_id(job):
+    """
+    The id of a projected squeue job, like %i of squeue.
+
+    >>> squeue_job_id({'job_id': 12, 'array_job_id': 10, 'array_task_id': 2})
+    '10_2'
+    >>> squeue_job_id({'job_id': 12, 'array_job_id': 0, 'array_task_id': None})
+    '12'
+    """
+    if job.get('array_job_id') and job.get('array_task_id') is not None:
+        return f"{job['array_job_id']}_{job['array_task_id']}"
+    return str(job['job_id'])
+
+
+def sacct_job_id(job):
+    """
+    >>> sacct_job_id({'job_id': 12, 'array': {'job_id': 10, 'task_id': 2}})
+    '10_2'
+    """
+    array = job.get('array') or {}
+    if array.get('job_id') and array.get('task_id') is not None:
+        return f"{array['job_id']}_{array['task_id']}"
+    return str(job['job_id'])
@@ -0,0 +1,215 @@
+import re
+import sys
+
+
+class StripANSIEscapeSequences:
+    """
+    https://stackoverflow.com/a/2188410/5766934
+
+    >>> StripANSIEscapeSequences()('\x1b[1m0.0\x1b[0m')
+    '0.0'
+
+    """
+    def __init__(self):
+        self.r = re.compile(r"""
+            \x1b     # literal ESC
+            \[       # literal [
+            [;\d]*   # zero or more digits or semicolons
+            [A-Za-z] # a letter
+            """, re.VERBOSE).sub
+
+    def __call__(self, s):
+        return self.r("", s)
+
+
+strip_ANSI_escape_sequences = StripANSIEscapeSequences()
+
+
+class Cell:
+    """
+    A table cell with its visible widths, computed once. The regex runs only
+    for values that contain an escape sequence.
+
+    width: Visible width of the widest line, used for the column width.
+    length: Visible length of the whole value, used for the padding.
+
+    >>> Cell('\x1b[0;32m80\x1b[0m').width
+    2
+    >>> cell = Cell('ab\\nc')
+    >>> cell.width, cell.length
+    (2, 4)
+    """
+    __slots__ = ('text', 'width', 'length')
+
+    def __init__(self, text):
+        self.text = text
+        visible = strip_ANSI_escape_sequences(text) if '\x1b' in text else text
+        self.length = len(visible)
+        if '\n' in visible:
+            self.width = max(map(len, visible.split('\n')))
+        else:
+            self.width = self.length
+
+
+def _header_width(key):
+    if isinstance(key, str):
+        return Cell(key).width
+    elif isinstance(key, tuple):
+        return max([_header_width(k) for k in key])
+    else:
+        raise TypeError(key)
+
+
+def _header_height(key):
+    if isinstance(key, str):
+        return key.count('\n') + 1
+    elif isinstance(key, tuple):
+        return max([_header_height(k) for k in key])
+    else:
+        raise TypeError(key)
+
+
+def _header_line(key, n):
+    if isinstance(key, str):
+        key = key.split('\n')
+    if len(key) <= n:
+        return ''
+    return key[n]
+
+
+def print_table(
+        data: 'list[dict, str]',
+        header=(),
+        just: 'str | dict' = 'lr',
+        sep='  ',
+        missing='-',
+        repeat_header=40,
+        file=None,
+):
+    """
+
+    Args:
+        data: list of dict or str
+            dict: Keys indicate the column, values the values in the table
+            str:
+                char (i.e. length 1): row separator
+                str (i.e. length != 1): printed as is, might break table layout
+        header:
+            Optional keys for the header. Will be filled with the keys from the dicts.
+            Usecase: Enforce an ordering.
+            A key with a newline or a tuple is a multi line header.
+        just:
+            Left or right just of the columns.
+            Last one will be repeated.
+            A dict maps the keys (i.e. the header) to the just.
+        sep:
+            Separator for the columns.
+        missing:
+            Placeholder for missing values.
+        repeat_header:
+            Repeat the header every repeat_header rows. None: Print the
+            header once at the top.
+        file:
+            Stream for the output, default sys.stdout. The table is written
+            with a single write.
+
+    Returns:
+
+    >>> print_table([{'a': 1, 'b': 2}, {'a': 10, 'c': 20}])
+    =========
+    a   b   c
+    =========
+    1   2   -
+    10  -  20
+    =========
+    >>> print_table([{'a': 1, 'b': 2}, 'd', 'ef', {'a': 10, 'c': 20}])
+    =========
+    a   b   c
+    =========
+    1   2   -
+    ddddddddd
+    ef
+    10  -  20
+    =========
+    >>> print_table([{'a': 1, 'b\\nf': 2}, {'a': 10, ('c', 'd'): 20}])
+    =========
+    a   b   c
+        f   d
+    =========
+    1   2   -
+    10  -  20
+    =========
+    >>> print_table([{'a': '\x1b[0;32m1\x1b[0m', 'b': 2}], just={'b': 'l', 'a': 'r'}, sep=' | ')
+    =====
+    b | a
+    =====
+    2 | \x1b[0;32m1\x1b[0m
+    =====
+    >>> print_table([], header=['a'], repeat_header=None)
+    =
+    a
+    =
+    =
+    """
+
+    if isinstance(just, dict):
+        assert header == (), header
+        header = just.keys()
+        just = ''.join(just.values())
+
+    # Take header as suggestion for ordering, fill with remaining keys.
+    keys = list(dict.fromkeys(list(header) + [
+        k for d in data if isinstance(d, dict) for k in d.keys()]))
+
+    # Values repeat a lot (states, users, ...), hence share the cells.
+    cells = {}
+
+    def to_cell(value):
+        text = str(value)
+        try:
+            return cells[text]
+        except KeyError:
+            cell = cells[text] = Cell(text)
+            return cell
+
+    data = [{k: to_cell(v) for k, v in d.items()} if isinstance(d, dict) else d
+            for d in data]
+
+    widths = [
+        max([d[k].width for d in data if isinstance(d, dict) and k in d]
+            + [_header_width(k)])
+        for k in keys
+    ]
+    lefts = [just[min(pos, len(just) - 1)] == 'l' for pos in range(len(keys))]
+    header_lines = max([_header_height(k) for k in keys], default=1)
+    missing = Cell(missing)
+
+    def format_cells(cells):
+        line = []
+        for cell, width, left in zip(cells, widths, lefts):
+            pad = ' ' * (width - cell.length)
+            line.append(cell.text + pad if left else pad + cell.text)
+        return sep.join(line)
+
+    rule = '=' * (sum(widths) + len(sep) * (len(widths) - 1))
+    header_block = [rule] + [
+        format_cells([Cell(_header_line(k, h)) for k in keys])
+        for h in range(header_lines)
+    ] + [rule]
+
+    lines = []
+    if repeat_header is None:
+        lines.extend(header_block)
+    for i, d in enumerate(data):
+        if repeat_header is not None and i % repeat_header == 0:
+            lines.extend(header_block)
+        if isinstance(d, str):
+            if len(d) == 1:
+                lines.append(d * len(rule))
+            else:
+                lines.append(d)
+        else:
+            lines.append(format_cells([d.get(k, missing) for k in keys]))
+    lines.append(rule)
+
+    (sys.stdout if file is None else file).write('\n'.join(lines) + '\n')
@@ -0,0 +1,259 @@
+"""
+Instrumentation of the mon scripts: Wall and CPU time per phase and for each
+Slurm command the number of calls, the bytes read and the time spent waiting
+for the output.
+
+Enable it with `--timings [FILE]` (sacct.py) or for all scripts
+with the environment variable CBJ_SMON_TIMINGS:
+    CBJ_SMON_TIMINGS=1           Print a summary to stderr.
+    CBJ_SMON_TIMINGS=<file>      Append a json line per run to the file.
+
+In `vatch.py --py` the scripts run in the same process, hence each refresh
+is one run and the summary is part of the displayed output.
+"""
+import contextlib
+import json
+import os
+import shlex
+import subprocess
+import sys
+import threading
+import time
+
+
+class _Stat:
+    __slots__ = ('calls', 'wall', 'cpu', 'wait', 'bytes')
+
+    def __init__(self):
+        self.calls = 0
+        self.wall = 0.
+        self.cpu = 0.
+        self.wait = 0.
+        self.bytes = 0
+
+
+def _nbytes(data):
+    """
+    The size of the output in bytes, also for text (e.g. universal_newlines),
+    whose characters can have several bytes.
+
+    >>> _nbytes(b'abc'), _nbytes('abc'), _nbytes('äbc'), _nbytes(None)
+    (3, 3, 4, 0)
+    """
+    if data is None:
+        return 0
+    if isinstance(data, str):
+        return len(data.encode())
+    return len(data)
+
+
+class _CountingReader:
+    """Counts the read bytes and the time blocked in read of a pipe."""
+
+    def __init__(self, stream, stat, lock):
+        self._stream = stream
+        self._stat = stat
+        self._lock = lock
+
+    def _add(self, start, data):
+        with self._lock:
+            self._stat.wait += time.perf_counter() - start
+            self._stat.bytes += _nbytes(data)
+        return data
+
+    def read(self, size=-1):
+        return self._add(time.perf_counter(), self._stream.read(size))
+
+    def readline(self, size=-1):
+        return self._add(time.perf_counter(), self._stream.readline(size))
+
+    def __iter__(self):
+        while True:
+            line = self.readline()
+            if not line:
+                return
+            yield line
+
+    def close(self):
+        self._stream.close()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def _command_name(cmd):
+    """
+    >>> _command_name('sacct --json -S now'), _command_name(['scontrol', 'show', 'job'])
+    ('sacct', 'scontrol')
+    >>> _command_name("SLURM_TIME_FORMAT=%s /usr/bin/squeue -h")
+    'squeue'
+    """
+    if isinstance(cmd, str):
+        cmd = shlex.split(cmd)
+    for part in cmd:
+        if '=' not in part:
+            return os.path.basename(part)
+    return '?'
+
+
+class Timings:
+    """
+    >>> t = Timings(target=None)
+    >>> t.enable('-')
+    >>> with t.phase('a'):
+    ...     _ = t.check_output(['echo', 'hello'], universal_newlines=True)
+    >>> t.phases['a'].calls, t.commands['echo'].calls, t.commands['echo'].bytes
+    (1, 1, 6)
+    """
+    def __init__(self, target=os.environ.get('CBJ_SMON_TIMINGS')):
+        self.default_target = None if target in (None, '', '0') else target
+        self._lock = threading.Lock()
+        self._depth = 0
+        self.reset()
+
+    def reset(self):
+        self.target = self.default_target
+        self.phases = {}
+        self.commands = {}
+
+    @property
+    def enabled(self):
+        return self.target is not None
+
+    def enable(self, target='-'):
+        """target: '-' or '1' for a summary on stderr, otherwise a file for json lines."""
+        self.target = target
+
+    def _stat(self, table, name):
+        with self._lock:
+            try:
+                return table[name]
+            except KeyError:
+                stat = table[name] = _Stat()
+                return stat
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Wall time and CPU time (of the thread, that runs the phase)."""
+        if not self.enabled:
+            yield
+            return
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            stat = self._stat(self.phases, name)
+            with self._lock:
+                stat.calls += 1
+                stat.wall += time.perf_counter() - wall
+                stat.cpu += time.thread_time() - cpu
+
+    @contextlib.contextmanager
+    def _command(self, cmd):
+        stat = self._stat(self.commands, _command_name(cmd))
+        start = time.perf_counter()
+        try:
+            yield stat
+        finally:
+            with self._lock:
+                stat.calls += 1
+                stat.wall += time.perf_counter() - start
+
+    def run(self, cmd, **kwargs):
+        """subprocess.run, that records the command."""
+        if not self.enabled:
+            return subprocess.run(cmd, **kwargs)
+        with self._command(cmd) as stat:
+            start = time.perf_counter()
+            cp = subprocess.run(cmd, **kwargs)
+            with self._lock:
+                # Without streaming, the whole call is waiting.
+                stat.wait += time.perf_counter() - start
+                stat.bytes += _nbytes(cp.stdout)
+            return cp
+
+    def check_output(self, cmd, **kwargs):
+        """subprocess.check_output, that records the command."""
+        return self.run(cmd, check=True, stdout=subprocess.PIPE, **kwargs).stdout
+
+    @contextlib.contextmanager
+    def popen(self, cmd, **kwargs):
+        """subprocess.Popen, that records the command and the reads of stdout."""
+        if not self.enabled:
+            with subprocess.Popen(cmd, **kwargs) as p:
+                yield p
+            return
+        with self._command(cmd) as stat:
+            with subprocess.Popen(cmd, **kwargs) as p:
+                if p.stdout is not None:
+                    p.stdout = _CountingReader(p.stdout, stat, self._lock)
+                yield p
+
+    @contextlib.contextmanager
+    def request(self, name, stream):
+        """A request to a service (e.g. slurmrestd), recorded like a command."""
+        if not self.enabled:
+            yield stream
+            return
+        with self._command([name]) as stat:
+            yield _CountingReader(stream, stat, self._lock)
+
+    @contextlib.contextmanager
+    def session(self, name):
+        """
+        One run of a script. At the end, report (if enabled) and reset. Nested
+        sessions (e.g. a script called from another) belong to the outer one.
+        """
+        if self._depth:
+            yield
+            return
+        self._depth += 1
+        wall, cpu, children = time.perf_counter(), time.process_time(), os.times()
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self.enabled:
+                end = os.times()
+                self.report(
+                    name,
+                    wall=time.perf_counter() - wall,
+                    cpu=time.process_time() - cpu,
+                    children_cpu=(end.children_user + end.children_system
+                                  - children.children_user - children.children_system),
+                )
+            self.reset()
+
+    def report(self, name, wall, cpu, children_cpu):
+        if self.target in ('-', '1'):
+            from cbj_smon.table import print_table
+
+            file = sys.stderr
+            file.write(
+                f'timings {name}: wall {wall:.3f} s, cpu {cpu:.3f} s, '
+                f'slurm commands cpu {children_cpu:.3f} s\n')
+            if self.phases:
+                print_table([
+                    {'phase': k, 'n': v.calls, 'wall/s': f'{v.wall:.3f}', 'cpu/s': f'{v.cpu:.3f}'}
+                    for k, v in self.phases.items()
+                ], just='lrrr', repeat_header=None, file=file)
+            if self.commands:
+                print_table([
+                    {'command': k, 'n': v.calls, 'wall/s': f'{v.wall:.3f}',
+                     'wait/s': f'{v.wait:.3f}', 'MB': f'{v.bytes / 1e6:.2f}'}
+                    for k, v in self.commands.items()
+                ], just='lrrrr', repeat_header=None, file=file)
+        else:
+            record = {
+                'script': name, 'argv': sys.argv[1:], 'time': time.time(),
+                'wall': wall, 'cpu': cpu, 'children_cpu': children_cpu,
+                'phases': {k: {'calls': v.calls, 'wall': v.wall, 'cpu': v.cpu}
+                           for k, v in self.phases.items()},
+                'commands': {k: {'calls': v.calls, 'wall': v.wall, 'wait': v.wait, 'bytes': v.bytes}
+                             for k, v in self.commands.items()},
+            }
+            with open(self.target, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+
+
+timings = Timings()
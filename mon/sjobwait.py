@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Wait until jobs (or whole job arrays) reached a final state. Instead of a
+`squeue -j <id>` loop per job, each poll is one squeue call for all jobs:
+
+    sjobwait.py 4646900 4646910_3 4646920
+    sbatch --parsable job.sh | sjobwait.py -
+
+The poll interval doubles from --interval up to --max-interval, but a poll
+is not later than the nearest end of the time limit of a running job. The
+final states of the jobs, that left squeue, are requested with one sacct
+call.
+
+Exit code: 0, when all jobs COMPLETED, 1, when a job ended in another state
+(e.g. FAILED, TIMEOUT, CANCELLED) or is unknown, and 124, when --timeout
+expired.
+"""
+import argparse
+import collections
+import re
+import subprocess
+import sys
+import time
+
+from cbj_smon.timings import timings
+from cbj_smon import snapshot
+
+# The final states. squeue shows them for MinJobAge (default 300 s),
+# after that only sacct knows the job.
+FINAL_STATES = {
+    'COMPLETED', 'FAILED', 'CANCELLED', 'TIMEOUT', 'OUT_OF_MEMORY',
+    'NODE_FAIL', 'BOOT_FAIL', 'DEADLINE', 'PREEMPTED',
+}
+
+
+def parse_time_left(value):
+    """
+    Seconds of %L of squeue ([days-][hours:]minutes:seconds) or None.
+
+    >>> parse_time_left('1-02:03:04'), parse_time_left('03:04'), parse_time_left('UNLIMITED')
+    (93784, 184, None)
+    """
+    m = re.fullmatch(r'(?:(\d+)-)?(?:(\d+):)?(\d+):(\d+)', value)
+    if m is None:
+        return None
+    days, hours, minutes, seconds = [int(g or 0) for g in m.groups()]
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+
+def in_task_string(task, task_string):
+    """
+    Whether the array task is in the tasks of squeue (%K), e.g. the
+    pending tasks of an array.
+
+    >>> in_task_string(4, '1-5%2'), in_task_string(6, '[1-5,7]'), in_task_string(7, '1-5,7')
+    (True, False, True)
+    """
+    for part in task_string.strip('[]').split('%')[0].split(','):
+        first, _, last = part.partition('-')
+        if first.isdigit() and int(first) <= task <= int(last or first):
+            return True
+    return False
+
+
+def matches(requested, job_id, array_job_id, task):
+    """
+    Whether a job of squeue belongs to a requested id, i.e. is the job,
+    a task of the requested array or the requested task.
+
+    >>> matches('12', 12, 12, None), matches('10', 12, 10, '2'), matches('10_2', 12, 10, '2')
+    (True, True, True)
+    >>> matches('10_3', 12, 10, '2'), matches('10_3', 10, 10, '3-5'), matches('11', 12, 10, '2')
+    (False, True, False)
+    """
+    array_id, _, requested_task = requested.partition('_')
+    if not requested_task:
+        return str(job_id) == requested or str(array_job_id) == requested
+    if str(array_job_id) != array_id or task is None:
+        return False
+    return in_task_string(int(requested_task), str(task))
+
+
+def squeue_jobs(ids):
+    """
+    One query of the jobs in squeue.
+    Returns (job_id, array_job_id, task or None, state, time left in s or None).
+    """
+    jobs = snapshot.query('squeue')
+    if jobs is not None:
+        now = time.time()
+        result = []
+        for job in jobs:
+            # The pending tasks of an array have no task id, but the task
+            # string (e.g. 7-10%2), like %K.
+            task = job.get('array_task_id')
+            if task is None:
+                task = job.get('array_task_string') or None
+            if any(matches(i, job['job_id'], job.get('array_job_id'), task) for i in ids):
+                result.append((
+                    job['job_id'], job.get('array_job_id') or job['job_id'],
+                    task, job['job_state'][0],
+                    job['time_limit'] * 60 - (now - job['start_time'])
+                    if job['job_state'][0] == 'RUNNING' and job['time_limit'] else None))
+        return result
+
+    # %A: job id, %F: array job id, %K: array task id (or ids of pending
+    # tasks), %T: state, %L: time left
+    cp = timings.run(
+        ['squeue', '--noheader', '--jobs', ','.join(sorted(ids)), '--format', '%A|%F|%K|%T|%L'],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if cp.returncode and 'Invalid job id' not in cp.stderr:
+        # "Invalid job id", when none of the jobs is in squeue.
+        raise RuntimeError(f'squeue failed: {cp.stderr}')
+    jobs = []
+    for line in cp.stdout.splitlines():
+        job_id, array_job_id, task, state, left = line.split('|')
+        jobs.append((
+            int(job_id), int(array_job_id), None if task == 'N/A' else task,
+            state, parse_time_left(left) if state == 'RUNNING' else None))
+    return jobs
+
+
+def sacct_states(ids):
+    """
+    One sacct query for the jobs, that left squeue.
+    Returns requested id -> {job id: state}.
+    """
+    stdout = timings.run(
+        ['sacct', '--noheader', '--parsable2', '--allocations',
+         '--jobs', ','.join(sorted(ids)), '--format', 'JobID,State'],
+        stdout=subprocess.PIPE, universal_newlines=True, check=True).stdout
+    states = {i: {} for i in ids}
+    for line in stdout.splitlines():
+        job_id, state = line.split('|')
+        # e.g. CANCELLED by 1000
+        state = state.split(' ', maxsplit=1)[0]
+        for i in ids:
+            if job_id == i or '_' not in i and job_id.startswith(f'{i}_'):
+                states[i][job_id] = state
+    return states
+
+
+def summarize(states):
+    """
+    >>> summarize({'1_1': 'COMPLETED', '1_2': 'FAILED', '1_3': 'COMPLETED'})
+    'COMPLETED:2 FAILED:1'
+    >>> summarize({'7': 'COMPLETED'})
+    'COMPLETED'
+    """
+    counts = collections.Counter(states.values())
+    if len(states) == 1:
+        return next(iter(counts))
+    return ' '.join(f'{s}:{n}' for s, n in sorted(counts.items()))
+
+
+def wait(ids, minimum=5, maximum=300, timeout=None, quiet=False):
+    """
+    Wait for the jobs and return the final states: requested id -> {job id: state}.
+    Raises TimeoutError after timeout seconds.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    waiting = set(ids)
+    final = {}
+    interval = minimum
+    while True:
+        with timings.phase('squeue'):
+            jobs = squeue_jobs(waiting)
+        done = {}
+        # The jobs without an active job in squeue. squeue may know only
+        # some tasks of an array, hence sacct reports the final states.
+        gone = {}
+        nearest = None
+        for i in waiting:
+            mine = [job for job in jobs if matches(i, *job[:3])]
+            if all(state in FINAL_STATES for _, _, _, state, _ in mine):
+                gone[i] = {
+                    f'{a}_{t}' if t is not None else str(j): state
+                    for j, a, t, state, _ in mine
+                }
+            for *_, left in mine:
+                if left is not None and (nearest is None or left < nearest):
+                    nearest = left
+        if gone:
+            with timings.phase('sacct'):
+                states = sacct_states(gone)
+            for i, in_squeue in gone.items():
+                if not states[i]:
+                    # e.g. slurmdbd is behind.
+                    done[i] = in_squeue or {i: 'UNKNOWN'}
+                elif all(s in FINAL_STATES for s in states[i].values()):
+                    done[i] = states[i]
+                # Otherwise slurmdbd doesn't know the end yet.
+
+        for i in sorted(done):
+            final[i] = done[i]
+            waiting.discard(i)
+            if not quiet:
+                print(f'{i} {summarize(done[i])}', flush=True)
+        if not waiting:
+            return final
+
+        interval = minimum if done else min(2 * interval, maximum)
+        if nearest is not None:
+            # Check shortly after the time limit of the next job.
+            interval = min(interval, max(nearest + minimum, minimum))
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(sorted(waiting))
+            interval = min(interval, remaining)
+        time.sleep(interval)
+
+
+def read_ids(values):
+    """
+    The job ids of the arguments, - reads them from stdin (e.g. the output
+    of sbatch --parsable, i.e. jobid[;cluster]).
+
+    >>> read_ids(['12,13', '10_2'])
+    ['12', '13', '10_2']
+    """
+    ids = []
+    for value in values:
+        if value == '-':
+            value = sys.stdin.read()
+        for i in re.split(r'[\s,]+', value):
+            if i:
+                ids.append(i.split(';')[0])
+    return ids
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        'ids', nargs='+',
+        help='Job ids, array ids (all tasks) or array tasks (e.g. 12_3), '
+             'separated by spaces or commas. - reads them from stdin.')
+    parser.add_argument(
+        '--interval', type=float, default=5,
+        help='Seconds between the first polls. Default: 5')
+    parser.add_argument(
+        '--max-interval', type=float, default=300,
+        help='Maximal seconds between the polls. Default: 300')
+    parser.add_argument(
+        '--timeout', type=float,
+        help='Give up after that many seconds (exit code 124).')
+    parser.add_argument(
+        '-q', '--quiet', action='store_true',
+        help='Print nothing, only the exit code reports the states.')
+    args = parser.parse_args(argv)
+
+    ids = read_ids(args.ids)
+    invalid = [i for i in ids if not re.fullmatch(r'\d+(_\d+)?', i)]
+    if invalid:
+        parser.error(f'Invalid job ids: {", ".join(invalid)}')
+    if not ids:
+        parser.error('No job ids.')
+    if args.interval <= 0:
+        parser.error('--interval has to be positive.')
+
+    try:
+        final = wait(ids, args.interval, args.max_interval, args.timeout, args.quiet)
+    except TimeoutError as e:
+        if not args.quiet:
+            print(f'Timeout, still waiting for {" ".join(e.args[0])}', file=sys.stderr)
+        return 124
+    failed = [i for i, states in final.items()
+              if any(s != 'COMPLETED' for s in states.values())]
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    with timings.session('sjobwait.py'):
+        code = main(sys.argv[1:])
+    sys.exit(code)
@@ -9,6 +9,9 @@ import collections
 import math
 import pprint
 
+from cbj_smon.timings import timings
+from cbj_smon import snapshot
+
 
 class c:  # noqa
     Color_Off = '\033[0m'  # Text Reset
@@ -88,35 +91,39 @@ def parse(
 
 
 if __name__ == '__main__':
+    with timings.session('smaintenence.py'):
 
 
-    env = os.environ.copy()
-    env.pop('SLURM_TIME_FORMAT', '%s')
+        env = os.environ.copy()
+        env.pop('SLURM_TIME_FORMAT', '%s')
 
-    stdout = subprocess.run(
-        f"scontrol show reservation",
-        check=True, shell=True, stdout=subprocess.PIPE,
-        universal_newlines=True, env=env).stdout
+        stdout = snapshot.query('reservations')
+        if stdout is None:
+            stdout = timings.run(
+                f"scontrol show reservation",
+                check=True, shell=True, stdout=subprocess.PIPE,
+                universal_newlines=True, env=env).stdout
 
-    data = parse(stdout)
+        with timings.phase('parse'):
+            data = parse(stdout)
 
-    p = []
-    for l, d in data:
-        # StartTime = int(d['StartTime'])
-        # EndTime = int(d['EndTime'])
-        # hours = (EndTime - StartTime) / 3600
-        # if hours >
+        p = []
+        for l, d in data:
+            # StartTime = int(d['StartTime'])
+            # EndTime = int(d['EndTime'])
+            # hours = (EndTime - StartTime) / 3600
+            # if hours >
 
-        # s = pprint.pformat(d)
-        if int(d['NodeCnt']) >= 10:
-            l = l.replace('NodeCnt', f'{c.Red}NodeCnt{c.Color_Off}')
-        else:
-            l = l.replace('NodeCnt', f'{c.Green}NodeCnt{c.Color_Off}')
+            # s = pprint.pformat(d)
+            if int(d['NodeCnt']) >= 10:
+                l = l.replace('NodeCnt', f'{c.Red}NodeCnt{c.Color_Off}')
+            else:
+                l = l.replace('NodeCnt', f'{c.Green}NodeCnt{c.Color_Off}')
 
-        l = l.replace('n2gpu', f'{c.Black}{c.BG_Red}n2gpu{c.Color_Off}')
-        p.append(l)
+            l = l.replace('n2gpu', f'{c.Black}{c.BG_Red}n2gpu{c.Color_Off}')
+            p.append(l)
 
-    print('\n\n'.join(p))
+        print('\n\n'.join(p))
 
 
 # scontrol show reservation --oneline | grep NodeCnt
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Snapshot daemon for the scripts in mon: Poll squeue, sacct, the nodes and
+the reservations on a schedule, keep the parsed snapshot in memory and serve
+it over a Unix socket (see cbj_smon/snapshot.py). With a daemon, a refresh
+of sacct.py, soverview.py, soverview_gpus.py, smaintenence.py or stail.py
+spawns no slurm command, independent of the number of terminals.
+
+Start it per user on the login node, e.g. in a tmux session:
+    smond.py
+    smond.py --status
+
+The daemon runs with the permissions of the user and slurm shows only, what
+the user is allowed to see. Hence, the socket is private (0700 directory and
+the uid of the peer is checked), a daemon shared between users would leak the
+view of its owner.
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+from cbj_smon import snapshot
+from cbj_smon.jobs.util import iter_slurm_json, merge_fields
+from cbj_smon.jobs.gather_sacct import SACCT_JOB_FIELDS, SACCT_COLUMN_FIELDS, _sacct_time
+from cbj_smon.jobs.gather_squeue import SQUEUE_JOB_FIELDS, SQUEUE_COLUMN_FIELDS
+from cbj_smon.timings import timings
+
+
+# The fields of all columns of sacct.py (e.g. Array for --collapse-arrays)
+# and additionally the files and ids, that stail.py needs.
+SQUEUE_FIELDS = merge_fields(SQUEUE_JOB_FIELDS, *SQUEUE_COLUMN_FIELDS.values(), {
+    'array_job_id': True,
+    'array_task_id': True,
+    'standard_output': True,
+    'standard_error': True,
+    'current_working_directory': True,
+})
+SACCT_FIELDS = merge_fields(SACCT_JOB_FIELDS, *SACCT_COLUMN_FIELDS.values(), {
+    'array': {'job_id': True, 'task_id': True},
+    'working_directory': True,
+})
+
+
+class Snapshot:
+    """
+    The latest data of each source. A poll replaces the data of a source,
+    i.e. a query never sees a partial update.
+
+    sacct is polled incrementally: The first poll asks for the retention
+    (e.g. 48 hours), later polls only for the jobs, that were active since
+    the last poll.
+    """
+    def __init__(self, retention, overlap=300):
+        self.retention = retention
+        self.overlap = overlap
+        self.data = {}  # name -> (time, data)
+        self.stats = {}  # name -> dict(polls, duration, error)
+        self.sacct_covered = None
+        self.sacct_polled = None
+
+    def poll(self, name):
+        stats = self.stats.setdefault(name, {'polls': 0, 'duration': None, 'error': None})
+        start = time.time()
+        try:
+            data = getattr(self, f'_poll_{name}')()
+        except Exception as e:
+            stats['error'] = repr(e)
+            print(f'{time.strftime("%c")}: poll {name} failed: {e!r}', file=sys.stderr)
+            return
+        stats.update(polls=stats['polls'] + 1, duration=time.time() - start, error=None)
+        self.data[name] = (start, data)
+
+    def _poll_squeue(self):
+        return list(iter_slurm_json('squeue --json', 'jobs', fields=SQUEUE_FIELDS))
+
+    def _poll_nodes(self):
+        stdout = timings.run(
+            'scontrol show node --json', check=True, shell=True,
+            stdout=subprocess.PIPE, universal_newlines=True).stdout
+        return json.loads(stdout)['nodes']
+
+    def _poll_reservations(self):
+        # Like smaintenence.py
+        env = os.environ.copy()
+        env.pop('SLURM_TIME_FORMAT', None)
+        return timings.run(
+            'scontrol show reservation', check=True, shell=True,
+            stdout=subprocess.PIPE, universal_newlines=True, env=env).stdout
+
+    def _poll_sacct(self):
+        now = time.time()
+        if self.sacct_polled is None:
+            start = now - self.retention
+        else:
+            start = self.sacct_polled - self.overlap
+        _, jobs = self.data.get('sacct', (None, {}))
+        jobs = dict(jobs)
+        for job in iter_slurm_json(
+                f'sacct --json --allusers -S {_sacct_time(start)}',
+                'jobs', fields=SACCT_FIELDS):
+            jobs[job['job_id']] = job
+        jobs = {
+            k: job for k, job in jobs.items()
+            if not job['time']['end'] or job['time']['end'] >= now - self.retention
+        }
+        self.sacct_polled = now
+        self.sacct_covered = now - self.retention
+        return jobs
+
+    def _get(self, name, max_age):
+        if name not in self.data:
+            raise LookupError(f'{name} not yet polled')
+        polled, data = self.data[name]
+        if time.time() - polled > max_age:
+            raise LookupError(f'{name} is older than {max_age} s')
+        return data
+
+    def query_squeue(self, max_age, user=None, job_ids=None):
+        jobs = self._get('squeue', max_age)
+        if user is not None:
+            jobs = [job for job in jobs if job['user_name'] == user]
+        if job_ids is not None:
+            job_ids = set(map(str, job_ids))
+            jobs = [job for job in jobs
+                    if str(job['job_id']) in job_ids or snapshot.squeue_job_id(job) in job_ids]
+        return jobs
+
+    def query_sacct(self, max_age, start=None, end=None, user=None, job_ids=None):
+        """Like sacct -S start -E end, or sacct -j job_ids."""
+        jobs = self._get('sacct', max_age)
+        if job_ids is not None:
+            job_ids = set(map(str, job_ids))
+            found = [job for job in jobs.values()
+                     if str(job['job_id']) in job_ids or snapshot.sacct_job_id(job) in job_ids]
+            if len(found) < len(job_ids):
+                # Maybe older than the retention, ask sacct.
+                raise LookupError(f'Not all jobs in the snapshot: {sorted(job_ids)}')
+            jobs = found
+        else:
+            if start is None or start < self.sacct_covered:
+                raise LookupError(f'sacct snapshot starts at {self.sacct_covered}, requested {start}')
+            jobs = [
+                job for job in jobs.values()
+                if (not job['time']['end'] or job['time']['end'] >= start)
+                and (end is None or job['time']['submission'] <= end)
+            ]
+        if user is not None:
+            jobs = [job for job in jobs if job['association']['user'] == user]
+        return sorted(jobs, key=lambda job: job['job_id'])
+
+    def query_nodes(self, max_age):
+        return self._get('nodes', max_age)
+
+    def query_reservations(self, max_age):
+        return self._get('reservations', max_age)
+
+    def query_status(self, max_age=None):
+        now = time.time()
+        return {
+            name: {**stats, 'age': now - self.data[name][0] if name in self.data else None}
+            for name, stats in self.stats.items()
+        }
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        if hasattr(socket, 'SO_PEERCRED'):
+            _, uid, _ = struct.unpack('3i', self.request.getsockopt(
+                socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i')))
+            if uid != os.getuid():
+                return
+        try:
+            request = json.loads(self.rfile.readline())
+            fn = getattr(self.server.snapshot, f'query_{request["query"]}')
+            response = {'ok': True, 'data': fn(**request['params'])}
+        except (LookupError, AttributeError, TypeError, ValueError) as e:
+            response = {'ok': False, 'error': repr(e)}
+        self.wfile.write(json.dumps(response).encode() + b'\n')
+
+
+class Server(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+
+def poll_forever(snapshot_, name, interval):
+    while True:
+        start = time.time()
+        snapshot_.poll(name)
+        time.sleep(max(0., interval - (time.time() - start)))
+
+
+def main(*argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument(
+        '--socket', default=snapshot.socket_path(),
+        help='Default: $CBJ_SMON_SOCKET or $XDG_RUNTIME_DIR/cbj_smon/smond.sock')
+    parser.add_argument(
+        '--interval', type=float, default=30,
+        help='Seconds between the polls of squeue, the nodes and the reservations. Default: 30')
+    parser.add_argument(
+        '--sacct-interval', type=float, default=60,
+        help='Seconds between the polls of sacct. Default: 60')
+    parser.add_argument(
+        '--retention', type=float, default=48,
+        help='Hours of finished jobs, that are kept. Older sacct queries '
+             'fall back to sacct. Default: 48')
+    parser.add_argument(
+        '--status', action='store_true',
+        help='Print the status of the running daemon and exit.')
+    args = parser.parse_args(argv)
+
+    if args.status:
+        try:
+            response = snapshot.request('status', path=args.socket)
+        except OSError as e:
+            sys.exit(f'No daemon at {args.socket}: {e!r}')
+        if not response['ok']:
+            sys.exit(response['error'])
+        print(json.dumps(response['data'], indent=2))
+        return
+
+    if os.path.exists(args.socket):
+        try:
+            snapshot.request('status', path=args.socket)
+        except OSError:
+            os.unlink(args.socket)  # Stale socket of a dead daemon.
+        else:
+            sys.exit(f'A daemon is already running at {args.socket}')
+    os.makedirs(os.path.dirname(args.socket), mode=0o700, exist_ok=True)
+
+    snapshot_ = Snapshot(retention=args.retention * 3600)
+    for name, interval in [
+            ('squeue', args.interval),
+            ('nodes', args.interval),
+            ('reservations', args.interval),
+            ('sacct', args.sacct_interval),
+    ]:
+        threading.Thread(
+            target=poll_forever, args=(snapshot_, name, interval),
+            daemon=True, name=name,
+        ).start()
+
+    old_umask = os.umask(0o077)
+    try:
+        server = Server(args.socket, Handler)
+    finally:
+        os.umask(old_umask)
+    server.snapshot = snapshot_
+    print(f'Serving the slurm snapshot at {args.socket}', file=sys.stderr)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit())  # Remove the socket.
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
+
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
@@ -7,6 +7,11 @@ import json
 import re
 import collections
 import math
+import argparse
+
+from cbj_smon.table import print_table
+from cbj_smon.timings import timings
+from cbj_smon import snapshot
 
 
 class c:  # noqa
@@ -39,116 +44,6 @@ class c:  # noqa
         print(c.Blue + args + c.Color_Off)
 
 
-class StripANSIEscapeSequences:
-    """
-    https://stackoverflow.com/a/2188410/5766934
-
-    >>> StripANSIEscapeSequences()('\x1b[1m0.0\x1b[0m')
-    '0.0'
-
-    """
-    def __init__(self):
-        self.r = re.compile(r"""
-            \x1b     # literal ESC
-            \[       # literal [
-            [;\d]*   # zero or more digits or semicolons
-            [A-Za-z] # a letter
-            """, re.VERBOSE).sub
-
-    def __call__(self, s):
-        return self.r("", s)
-
-
-def print_table(
-        data: 'list[dict, str]',
-        header=(),
-        just='lr',
-        sep='  ',
-        missing='-',
-):
-    """
-
-    Args:
-        data: list of dict or str
-            dict: Keys indicate the column, values the values in the table
-            str:
-                char (i.e. length 1): row separator
-                str (i.e. length != 1): printed as is, might break table layout
-        header:
-            Optional keys for the header. Will be filled with the keys from the dicts.
-            Usecase: Enforce an ordering.
-        just:
-            Left or right just of the columns.
-            Last one will be repeated.
-        sep:
-            Separator for the columns.
-        missing:
-            Placeholder for missing values.
-
-    Returns:
-
-    >>> print_table([{'a': 1, 'b': 2}, {'a': 10, 'c': 20}])
-    =========
-    a   b   c
-    =========
-    1   2   -
-    10  -  20
-    =========
-    >>> print_table([{'a': 1, 'b': 2}, 'd', 'ef', {'a': 10, 'c': 20}])
-    =========
-    a   b   c
-    =========
-    1   2   -
-    ddddddddd
-    ef
-    10  -  20
-    =========
-    """
-    # Take header as suggestion for ordering, fill with remaining keys.
-    keys = list(dict.fromkeys(list(header) + [
-        k for d in data if isinstance(d, dict) for k in d.keys()]))
-
-    data = [{k: str(v) for k, v in d.items()} if isinstance(d, dict) else d
-            for d in data]
-
-    strip_ANSI_escape_sequences = StripANSIEscapeSequences()
-
-    widths = {
-        k: max([len(strip_ANSI_escape_sequences(d.get(k, '')))
-                for d in data if isinstance(d, dict)] + [len(k)])
-        for k in keys
-    }
-
-    def just_fn(position, value, width):
-        invisible_width = len(value) - len(strip_ANSI_escape_sequences(value))
-
-        if just[min(position, len(just)-1)] == 'l':
-            return value.ljust(width + invisible_width, ' ')
-        else:
-            return value.rjust(width + invisible_width, ' ')
-
-    def format_line(widths, d: '[dict, str]' = None):
-        if d is None:
-            d = dict(zip(widths.keys(), widths.keys()))
-        if isinstance(d, str):
-            if len(d) == 1:
-                return d * (
-                        sum(widths.values()) + len(sep)
-                        * (len(widths.values()) - 1)
-                )
-            else:
-                return d
-        return sep.join([just_fn(pos, d.get(k, missing), w)
-                         for pos, (k, w) in enumerate(widths.items())])
-
-    print(format_line(widths, '='))
-    print(format_line(widths))
-    print(format_line(widths, '='))
-    for i, d in enumerate(data):
-        print(format_line(widths, d))
-    print(format_line(widths, '='))
-
-
 def parse_res(res, raw=False):
     """
     >>> tres_used = "cpu=16,mem=367188M,gres\/gpu=4,gres\/gpu:a100=4"
@@ -598,13 +493,42 @@ def transpose_dict_of_dict(dct):
     return dict(d)
 
 
-def main_v2():
-    stdout = subprocess.run(
-        # f"sinfo --json",  # pre 23.11 (maybe 22?)
-        f"scontrol show node --json",
-        check=True, shell=True, stdout=subprocess.PIPE,
-        universal_newlines=True).stdout
-    sinfo = json.loads(stdout)
+def main_v2(*argv):
+    parser = argparse.ArgumentParser(
+        description='Allocation of the nodes, grouped by partitions and state.')
+    parser.add_argument(
+        '--format', choices=['table', 'ndjson', 'csv'], default='table',
+        help='ndjson or csv: Instead of the table, write the raw values of '
+             'the groups (e.g. "cpu used" and "cpu total", memory in MB), '
+             'without colors. Default: table')
+    parser.add_argument(
+        '--export', metavar='FILE',
+        help='Instead of the table, write the columns of the groups to FILE: '
+             '.parquet, .arrow or .feather (needs pyarrow, otherwise '
+             '.npz is written) or .npz (NumPy).')
+    args = parser.parse_args(argv)
+    if args.format != 'table' and args.export:
+        parser.error('--format and --export exclude each other.')
+    if args.export:
+        from cbj_smon.export import SUFFIXES
+
+        if os.path.splitext(args.export)[1] not in SUFFIXES:
+            parser.error(f'--export: Unknown file type. Choices: {", ".join(SUFFIXES)}')
+
+    nodes = snapshot.query('nodes')
+    if nodes is not None:
+        sinfo = {'nodes': nodes}
+    elif os.environ.get('CBJ_SMON_BACKEND') == 'restd':
+        from cbj_smon import restd
+        sinfo = {'nodes': restd.client().load('slurm/nodes', 'nodes')}
+    else:
+        stdout = timings.run(
+            # f"sinfo --json",  # pre 23.11 (maybe 22?)
+            f"scontrol show node --json",
+            check=True, shell=True, stdout=subprocess.PIPE,
+            universal_newlines=True).stdout
+        with timings.phase('json.loads'):
+            sinfo = json.loads(stdout)
 
     data = collections.defaultdict(list)
 
@@ -674,7 +598,7 @@ def main_v2():
 
             tres = d['mem']['tres']
             if len(set(tres)) == 1:
-                new['mem/N'] = f'{round(tres[0] / 1000)} GB'
+                new['mem/N'] = tres[0]
                 meta_keys |= {'mem/N'}
 
             for k, v in d.items():
@@ -698,6 +622,21 @@ def main_v2():
 
         columns = list(dict.fromkeys([k for d in print_data for k in d]).keys())
 
+        if args.format != 'table' or args.export:
+            # The raw values, i.e. without the widths and colors below.
+            from cbj_smon.export import Export
+
+            export = Export(columns, split={
+                k: (f'{k} used', f'{k} total')
+                for k in columns if k not in meta_keys
+            })
+            with timings.phase('export'):
+                if args.export:
+                    export.save(print_data, args.export)
+                else:
+                    export.write(print_data, args.format)
+            return
+
         def to_string(number, c, width=None):
             try:
                 if c in ['mem']:
@@ -731,7 +670,9 @@ def main_v2():
             new = {}
             full = False
             for c, v in d.items():
-                if c in meta_keys:
+                if c == 'mem/N':
+                    new[c] = f'{round(v / 1000)} GB'
+                elif c in meta_keys:
                     new[c] = v
                 else:
                     tres_used, tres = v
@@ -759,16 +700,18 @@ def main_v2():
 
         # final_print_data = sorted(final_print_data, key=lambda x: [x['state_flags'], x['Partition']])
 
-        print_table(final_print_data, just='rllrrrrr')
+        with timings.phase('print_table'):
+            print_table(final_print_data, just='rllrrrrr', repeat_header=None)
 
 
 
 def main():
-    stdout = subprocess.run(
+    stdout = timings.run(
         f"sinfo --json",
         check=True, shell=True, stdout=subprocess.PIPE,
         universal_newlines=True).stdout
-    data = json.loads(stdout)
+    with timings.phase('json.loads'):
+        data = json.loads(stdout)
 
     p_tres = collections.defaultdict(lambda: collections.defaultdict(lambda: 0))
     p_tres_used = collections.defaultdict(lambda: collections.defaultdict(lambda: 0))
@@ -910,10 +853,11 @@ def main():
         # subprocess.run(['column', '-e', '-t', '-s', sep], input=msg, universal_newlines=True)
         # print('')
 
-        print_table(tbl, just='rllrrrrr')
+        print_table(tbl, just='rllrrrrr', repeat_header=None)
         # print_table(tbl_3, just='lrrrrr')
 
 
 if __name__ == '__main__':
-    main_v2(*sys.argv[1:])
-    # main(*sys.argv[1:])
+    with timings.session('soverview.py'):
+        main_v2(*sys.argv[1:])
+        # main(*sys.argv[1:])
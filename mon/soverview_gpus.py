@@ -1,9 +1,14 @@
 #!/usr/bin/python3
 
 import json
+import os
 import subprocess
 import sys
-import re
+
+from cbj_smon.table import print_table
+from cbj_smon.timings import timings
+from cbj_smon import snapshot
+
 
 class c:  # noqa
     Color_Off = '\033[0m'  # Text Reset
@@ -33,116 +38,6 @@ class c:  # noqa
         print(c.Blue + args + c.Color_Off)
 
 
-class StripANSIEscapeSequences:
-    """
-    https://stackoverflow.com/a/2188410/5766934
-
-    >>> StripANSIEscapeSequences()('\x1b[1m0.0\x1b[0m')
-    '0.0'
-
-    """
-    def __init__(self):
-        self.r = re.compile(r"""
-            \x1b     # literal ESC
-            \[       # literal [
-            [;\d]*   # zero or more digits or semicolons
-            [A-Za-z] # a letter
-            """, re.VERBOSE).sub
-
-    def __call__(self, s):
-        return self.r("", s)
-
-
-def print_table(
-        data: 'list[dict, str]',
-        header=(),
-        just='lr',
-        sep='  ',
-        missing='-',
-):
-    """
-
-    Args:
-        data: list of dict or str
-            dict: Keys indicate the column, values the values in the table
-            str:
-                char (i.e. length 1): row separator
-                str (i.e. length != 1): printed as is, might break table layout
-        header:
-            Optional keys for the header. Will be filled with the keys from the dicts.
-            Usecase: Enforce an ordering.
-        just:
-            Left or right just of the columns.
-            Last one will be repeated.
-        sep:
-            Separator for the columns.
-        missing:
-            Placeholder for missing values.
-
-    Returns:
-
-    >>> print_table([{'a': 1, 'b': 2}, {'a': 10, 'c': 20}])
-    =========
-    a   b   c
-    =========
-    1   2   -
-    10  -  20
-    =========
-    >>> print_table([{'a': 1, 'b': 2}, 'd', 'ef', {'a': 10, 'c': 20}])
-    =========
-    a   b   c
-    =========
-    1   2   -
-    ddddddddd
-    ef
-    10  -  20
-    =========
-    """
-    # Take header as suggestion for ordering, fill with remaining keys.
-    keys = list(dict.fromkeys(list(header) + [
-        k for d in data if isinstance(d, dict) for k in d.keys()]))
-
-    data = [{k: str(v) for k, v in d.items()} if isinstance(d, dict) else d
-            for d in data]
-
-    strip_ANSI_escape_sequences = StripANSIEscapeSequences()
-
-    widths = {
-        k: max([len(strip_ANSI_escape_sequences(d.get(k, '')))
-                for d in data if isinstance(d, dict)] + [len(k)])
-        for k in keys
-    }
-
-    def just_fn(position, value, width):
-        invisible_width = len(value) - len(strip_ANSI_escape_sequences(value))
-
-        if just[min(position, len(just)-1)] == 'l':
-            return value.ljust(width + invisible_width, ' ')
-        else:
-            return value.rjust(width + invisible_width, ' ')
-
-    def format_line(widths, d: '[dict, str]' = None):
-        if d is None:
-            d = dict(zip(widths.keys(), widths.keys()))
-        if isinstance(d, str):
-            if len(d) == 1:
-                return d * (
-                        sum(widths.values()) + len(sep)
-                        * (len(widths.values()) - 1)
-                )
-            else:
-                return d
-        return sep.join([just_fn(pos, d.get(k, missing), w)
-                         for pos, (k, w) in enumerate(widths.items())])
-
-    print(format_line(widths, '='))
-    print(format_line(widths))
-    print(format_line(widths, '='))
-    for i, d in enumerate(data):
-        print(format_line(widths, d))
-    print(format_line(widths, '='))
-
-
 def get_color(num_str, den_str):
     """
     >>> get_color('1', '2')
@@ -201,12 +96,20 @@ def merge_tres_tres_used(tres, tres_used):
 
 
 def main(filter='gpu'):
-    stdout = subprocess.run(
-        # f"sinfo --json",  # pre 23
-        f"scontrol show node --json",  # since 23
-        check=True, shell=True, stdout=subprocess.PIPE,
-        universal_newlines=True).stdout
-    data = json.loads(stdout)
+    nodes = snapshot.query('nodes')
+    if nodes is not None:
+        data = {'nodes': nodes}
+    elif os.environ.get('CBJ_SMON_BACKEND') == 'restd':
+        from cbj_smon import restd
+        data = {'nodes': restd.client().load('slurm/nodes', 'nodes')}
+    else:
+        stdout = timings.run(
+            # f"sinfo --json",  # pre 23
+            f"scontrol show node --json",  # since 23
+            check=True, shell=True, stdout=subprocess.PIPE,
+            universal_newlines=True).stdout
+        with timings.phase('json.loads'):
+            data = json.loads(stdout)
 
     delete = list({
         'architecture': 'x86_64',
@@ -323,9 +226,11 @@ def main(filter='gpu'):
             })
             # break
 
-    print_table(table)
-    print_table(table2)
+    with timings.phase('print_table'):
+        print_table(table, repeat_header=None)
+        print_table(table2, repeat_header=None)
 
 
 if __name__ == '__main__':
-    main(*sys.argv[1:])
+    with timings.session('soverview_gpus.py'):
+        main(*sys.argv[1:])
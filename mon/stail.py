@@ -10,6 +10,9 @@ import shlex
 from pathlib import Path
 import time
 
+from cbj_smon.timings import timings
+from cbj_smon import snapshot
+
 
 class c:  # noqa
     Color_Off = '\033[0m'  # Text Reset
@@ -30,9 +33,16 @@ class c:  # noqa
 
 @functools.lru_cache()
 def squeue():
+    jobs = snapshot.query('squeue', user=os.environ['USER'])
+    if jobs is not None:
+        return sorted([
+            f"{snapshot.squeue_job_id(job)} {job['name']} {','.join(job['job_state'])}"
+            for job in jobs
+        ])
+
     # %i %j %T == JobId JobName State
     cmd = '''squeue -u $USER --format='%i %j %T' --noheader'''
-    squeue_lines = sorted(subprocess.check_output(cmd, shell=True, universal_newlines=True).splitlines())
+    squeue_lines = sorted(timings.check_output(cmd, shell=True, universal_newlines=True).splitlines())
     return squeue_lines
 
 
@@ -52,9 +62,16 @@ def jobid_to_workdir():
      '2669263': '/scratch/hpc-prf-nt1/cord/models/dvectors/silver_desirable_puma/evaluation/3',
      '2669296': '/scratch/hpc-prf-nt2/cbj/deploy/css/egs/extract/77/eval/62000/76'}
     """
+    jobs = snapshot.query('squeue')
+    if jobs is not None:
+        return dict(sorted([
+            (snapshot.squeue_job_id(job), job['current_working_directory'])
+            for job in jobs
+        ]))
+
     # %i %Z == JobId WorkDir
     cmd = 'squeue --format "%i %Z" --noheader'
-    output = subprocess.check_output(
+    output = timings.check_output(
         cmd, shell=True, universal_newlines=True)
     return dict(sorted([line.split(maxsplit=1) for line in output.splitlines()]))
 
@@ -67,7 +84,7 @@ def find_workdir_from_SubmitLine(jobid, workdir='.'):
     # python -m fire /scratch/hpc-prf-nt2/cbj/deploy/cbj/bin/stail.py find_workdir_from_SubmitLine '"3103666_24"'
     """
     cmd = ['sacct', '--noheader', '-j', jobid, '-o', 'SubmitLine%-10000']
-    stdout = subprocess.check_output(cmd, universal_newlines=True)
+    stdout = timings.check_output(cmd, universal_newlines=True)
     stdout = stdout.splitlines()
 
     output = list({o.strip(): None for o in stdout if o.strip()}.keys())
@@ -120,11 +137,11 @@ def file_from_job_id(jobid):
     """
     cmd = f'scontrol show job {jobid}'
     try:
-        stdout = subprocess.check_output(cmd, shell=True, universal_newlines=True)
+        stdout = timings.check_output(cmd, shell=True, universal_newlines=True)
     except subprocess.CalledProcessError:
         c.print_info(f'Could not find stdout file with "{cmd}"')
         c.print_info(f'Try to find the workdir with sacct.')
-        output = subprocess.check_output(
+        output = timings.check_output(
             f'sacct -j {jobid} --format workdir%1000 --noheader -X'.split(),
             universal_newlines=True)
         dest = {l.strip() for l in output.splitlines() if l.strip()}
@@ -167,13 +184,20 @@ def file_from_job_id(jobid):
 
 
 def file_from_job_id_2(jobid):
-    cmd = ['scontrol', 'show', 'job', jobid, '--json']
-    try:
-        stdout = subprocess.check_output(cmd, universal_newlines=True)
-    except subprocess.CalledProcessError:
-        c.print_info(f'Could not find the job with "{shlex.join(cmd)}" (Reason: CalledProcessError)')
+    data = None
+    jobs = snapshot.query('squeue', job_ids=[jobid])
+    if jobs:
+        cmd = ['smond.py', 'squeue', jobid]
+        data = {'jobs': jobs}
     else:
-        data = json.loads(stdout)
+        cmd = ['scontrol', 'show', 'job', jobid, '--json']
+        try:
+            stdout = timings.check_output(cmd, universal_newlines=True)
+        except subprocess.CalledProcessError:
+            c.print_info(f'Could not find the job with "{shlex.join(cmd)}" (Reason: CalledProcessError)')
+        else:
+            data = json.loads(stdout)
+    if data is not None:
         if data['jobs']:
             assert len(data['jobs']) == 1, data
             job = data['jobs'][0]
@@ -198,13 +222,20 @@ def file_from_job_id_2(jobid):
         else:
             c.print_info(f'Could not find the job with "{shlex.join(cmd)}" (Reason: empty)')
 
-    cmd = ['sacct', '-j', jobid, '--json']
-    try:
-        stdout = subprocess.check_output(cmd, universal_newlines=True)
-    except subprocess.CalledProcessError:
-        c.print_info(f'Could not find the job with "{shlex.join(cmd)}"')
+    data = None
+    jobs = snapshot.query('sacct', job_ids=[jobid])
+    if jobs:
+        cmd = ['smond.py', 'sacct', jobid]
+        data = {'jobs': jobs}
     else:
-        data = json.loads(stdout)
+        cmd = ['sacct', '-j', jobid, '--json']
+        try:
+            stdout = timings.check_output(cmd, universal_newlines=True)
+        except subprocess.CalledProcessError:
+            c.print_info(f'Could not find the job with "{shlex.join(cmd)}"')
+        else:
+            data = json.loads(stdout)
+    if data is not None:
         if data['jobs']:
             assert len(data['jobs']) == 1, data
             job = data['jobs'][0]
@@ -347,8 +378,10 @@ def main(argv, _interactive=None):
     cmd = 'tail -F ' + file
 
     print(c.Yellow + '$ ' + cmd + c.Color_Off)
-    os.system(cmd)
+    with timings.phase('tail'):
+        os.system(cmd)
 
 
 if __name__ == '__main__':
-    main(sys.argv[1:])
+    with timings.session('stail.py'):
+        main(sys.argv[1:])
@@ -74,6 +74,21 @@ def which(cmd):
     return p
 
 
+def _run_path(path):
+    """
+    Like `python <path>`, i.e. the directory of the script is in sys.path
+    while it runs (e.g. the scripts in mon import cbj_smon).
+    """
+    import runpy
+
+    directory = os.path.dirname(os.path.realpath(path))
+    sys.path.insert(0, directory)
+    try:
+        return runpy.run_path(path, run_name='__main__')
+    finally:
+        sys.path.remove(directory)
+
+
 def _prepare_py_cmd(cmd_string):
     import runpy
 
@@ -86,7 +101,7 @@ def _prepare_py_cmd(cmd_string):
             if args[0] == '-m':
                 yield args[1:], lambda: runpy.run_module(args[1], run_name='__main__')
             elif which(args[0]):
-                yield args, lambda: runpy.run_path(args[0], run_name='__main__')
+                yield args, lambda: _run_path(args[0])
             else:
                 raise NotImplementedError(
                     f'{cmd_argv}\n'
@@ -94,7 +109,7 @@ def _prepare_py_cmd(cmd_string):
                 )
         else:
             cmd = which(cmd)
-            yield [cmd] + args, lambda: runpy.run_path(cmd, run_name='__main__')
+            yield [cmd] + args, lambda: _run_path(cmd)
 
 
 def get_msg(cmd, py):
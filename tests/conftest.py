@@ -0,0 +1,123 @@
+"""
+Fixtures for the tests of the scripts in mon against the synthetic cluster
+of benchmarks/fake_slurm, i.e. without Slurm:
+
+    python -m pytest -q tests
+
+The fake commands (sacct, squeue, ...) are first in PATH, the caches of the
+scripts are in a temporary directory per test and smond.py is not asked,
+unless a test starts it (see the smond fixture).
+"""
+import io
+import os
+import sys
+import time
+import threading
+import subprocess
+import contextlib
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+MON = ROOT / 'mon'
+FAKE_SLURM = ROOT / 'benchmarks' / 'fake_slurm'
+sys.path.insert(0, str(MON))
+sys.path.insert(0, str(FAKE_SLURM))
+
+# Fixed for the session, i.e. the fake cluster doesn't change at a full hour.
+NOW = int(time.time()) // 3600 * 3600
+
+
+@pytest.fixture(scope='session')
+def fake_slurm_cache(tmp_path_factory):
+    """The generated jobs are shared by all tests (see FAKE_SLURM_CACHE)."""
+    return tmp_path_factory.mktemp('fake_slurm_cache')
+
+
+@pytest.fixture
+def fake_slurm(monkeypatch, tmp_path, fake_slurm_cache):
+    """
+    The environment of the synthetic cluster: 300 jobs on 40 nodes and the
+    user cbj. Returns the cluster.Config.
+    """
+    import cluster
+
+    for name in [
+            'CBJ_SMON_SOCKET', 'CBJ_SMON_BACKEND', 'CBJ_SMON_SLURMRESTD',
+            'CBJ_SMON_TIMINGS', 'SLURM_TIME_FORMAT', 'SLURM_JWT']:
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv('PATH', f'{FAKE_SLURM / "bin"}{os.pathsep}{os.environ["PATH"]}')
+    monkeypatch.setenv('USER', 'cbj')
+    monkeypatch.setenv('FAKE_SLURM_JOBS', '300')
+    monkeypatch.setenv('FAKE_SLURM_NODES', '40')
+    monkeypatch.setenv('FAKE_SLURM_NOW', str(NOW))
+    monkeypatch.setenv('FAKE_SLURM_CACHE', str(fake_slurm_cache))
+    monkeypatch.setenv('FAKE_SLURM_WORKDIR', str(tmp_path / 'work'))
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmp_path / 'cache'))
+    monkeypatch.setenv('CBJ_SMON_SNAPSHOT', '0')
+
+    from cbj_smon.jobs import changes
+    monkeypatch.setattr(changes, '_last_fingerprints', {})
+    return cluster.Config()
+
+
+@pytest.fixture
+def smond(fake_slurm, monkeypatch, tmp_path):
+    """
+    A smond.py in this process: The snapshot is polled once and served at
+    a socket in tmp_path, i.e. the scripts take the jobs from the daemon.
+    """
+    import smond
+
+    snapshot = smond.Snapshot(retention=48 * 3600)
+    for name in ['squeue', 'sacct', 'nodes', 'reservations']:
+        snapshot.poll(name)
+        assert snapshot.stats[name]['error'] is None, snapshot.stats[name]
+
+    path = str(tmp_path / 'smond.sock')
+    server = smond.Server(path, smond.Handler)
+    server.snapshot = snapshot
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setenv('CBJ_SMON_SOCKET', path)
+    monkeypatch.delenv('CBJ_SMON_SNAPSHOT')
+    yield snapshot
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def slurmrestd(fake_slurm, monkeypatch):
+    """The fake slurmrestd of the cluster, used by the restd backend."""
+    p = subprocess.Popen(
+        [sys.executable, str(FAKE_SLURM / 'slurmrestd.py'), '--port', '0'],
+        stderr=subprocess.PIPE, universal_newlines=True)
+    try:
+        # Serving at http://127.0.0.1:<port>
+        line = p.stderr.readline()
+        assert line.startswith('Serving at '), line
+        monkeypatch.setenv('CBJ_SMON_SLURMRESTD', line.split()[-1])
+        monkeypatch.setenv('SLURM_JWT', 'token')
+        from cbj_smon import restd
+        monkeypatch.setattr(restd, '_client', None, raising=False)
+        yield
+    finally:
+        p.kill()
+        p.wait()
+
+
+def run_main(main, *argv):
+    """The stdout of main(*argv) of a script."""
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        main(*argv)
+    return out.getvalue()
+
+
+@pytest.fixture
+def sacct_py(fake_slurm):
+    """Run sacct.py in this process, returns the stdout."""
+    from cbj_smon.jobs.__main__ import main
+
+    return lambda *argv: run_main(main, *argv)
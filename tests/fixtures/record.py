@@ -0,0 +1,73 @@
+#!/usr/bin/env python
+"""
+Record the outputs of the fake cluster (benchmarks/fake_slurm), that
+test_parsable.py replays: The json of squeue and sacct (compressed) and the
+lines of the parsable backend (squeue --Format, sacct --parsable2) with all
+fields.
+
+    python tests/fixtures/record.py
+
+The cluster is fixed (NOW, seed, size), i.e. the files only change, when the
+fake cluster or the requested fields change.
+"""
+import os
+import sys
+import gzip
+import subprocess
+from pathlib import Path
+
+FIXTURES = Path(__file__).resolve().parent
+ROOT = FIXTURES.parent.parent
+sys.path.insert(0, str(ROOT / 'mon'))
+
+from cbj_smon.jobs.parsable import (  # noqa: E402
+    SACCT_PARSABLE_FIELDS, SQUEUE_PARSABLE_FIELDS, sacct_parsable_cmd,
+    squeue_parsable_cmd)
+
+# 2024-07-09 12:00 UTC
+NOW = 1720526400
+START = NOW - 86400
+
+ENV = {
+    'FAKE_SLURM_JOBS': '120',
+    'FAKE_SLURM_SPAN': '6',
+    'FAKE_SLURM_NODES': '40',
+    'FAKE_SLURM_NOW': str(NOW),
+    'FAKE_SLURM_SEED': '0',
+    'FAKE_SLURM_INDENT': '0',
+    'FAKE_SLURM_WORKDIR': '/tmp/fake_slurm',
+    'USER': 'cbj',
+    'TZ': 'UTC',
+}
+
+COMMANDS = {
+    'squeue.json.gz': 'squeue --json',
+    'sacct.json.gz': f'sacct --json -S {START} --allusers',
+    'squeue.txt': squeue_parsable_cmd('', SQUEUE_PARSABLE_FIELDS),
+    'sacct.txt': sacct_parsable_cmd(f'-S {START} --allusers', SACCT_PARSABLE_FIELDS),
+}
+
+
+def main():
+    env = {
+        k: v for k, v in os.environ.items()
+        if not k.startswith(('FAKE_SLURM_', 'SLURM_'))
+    }
+    env.update(ENV)
+    env['PATH'] = f'{ROOT / "benchmarks" / "fake_slurm" / "bin"}{os.pathsep}{env["PATH"]}'
+    env['SLURM_TIME_FORMAT'] = '%s'  # see parsable_env
+    for name, cmd in COMMANDS.items():
+        stdout = subprocess.run(
+            cmd, shell=True, env=env, check=True, stdout=subprocess.PIPE,
+            universal_newlines=True).stdout
+        if name.endswith('.gz'):
+            # mtime=0: The same output gives the same file.
+            with gzip.GzipFile(FIXTURES / name, 'wb', mtime=0) as f:
+                f.write(stdout.encode())
+        else:
+            (FIXTURES / name).write_text(stdout)
+        print(f'{name}: {cmd}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+"""
+Tests of cbj_smon.export and of the export of soverview.py.
+"""
+import csv
+import io
+import json
+
+import pytest
+
+from cbj_smon.export import Export
+
+from conftest import run_main
+
+RECORDS = [
+    {'JobID': 1, 'Name': 'a,"b"', 'Elapsed': (60, 120), 'gpu': 'a100:2'},
+    {'JobID': 2, 'Name': 'c', 'Elapsed': None, 'gpu': 0},
+]
+EXPORT = Export(['JobID', 'Name', 'Elapsed', 'gpu'], split={'Elapsed': ('Elapsed', 'Timelimit')})
+
+
+def test_ndjson_csv():
+    out = io.StringIO()
+    EXPORT.write(RECORDS, 'ndjson', out)
+    assert [json.loads(line) for line in out.getvalue().splitlines()] == [
+        {'JobID': 1, 'Name': 'a,"b"', 'Elapsed': 60, 'Timelimit': 120, 'gpu': 'a100:2'},
+        {'JobID': 2, 'Name': 'c', 'Elapsed': None, 'Timelimit': None, 'gpu': 0},
+    ]
+    out = io.StringIO()
+    EXPORT.write(RECORDS, 'csv', out)
+    assert list(csv.reader(io.StringIO(out.getvalue()))) == [
+        ['JobID', 'Name', 'Elapsed', 'Timelimit', 'gpu'],
+        ['1', 'a,"b"', '60', '120', 'a100:2'],
+        ['2', 'c', '', '', '0'],
+    ]
+    with pytest.raises(ValueError):
+        EXPORT.write(RECORDS, 'xml', out)
+
+
+def test_save_npz(tmp_path):
+    np = pytest.importorskip('numpy')
+    path = EXPORT.save(RECORDS, tmp_path / 'jobs.npz')
+    columns = np.load(path)
+    assert columns['JobID'].tolist() == [1, 2]
+    assert columns['Timelimit'][0] == 120 and np.isnan(columns['Timelimit'][1])
+    assert columns['gpu'].tolist() == ['a100:2', '0']
+    with pytest.raises(ValueError):
+        EXPORT.save(RECORDS, tmp_path / 'jobs.txt')
+
+
+def test_soverview(fake_slurm):
+    from soverview import main_v2
+
+    table = run_main(main_v2)
+    rows = list(csv.DictReader(io.StringIO(run_main(main_v2, '--format', 'csv'))))
+    assert rows
+    # Rules and header of the table.
+    assert len(table.splitlines()) == len(rows) + 4
+    for row in rows:
+        assert int(row['cpu used']) <= int(row['cpu total'])
+        assert row['Partition'] in table
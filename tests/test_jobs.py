@@ -0,0 +1,245 @@
+"""
+Tests of the parts of cbj_smon.jobs with the jobs of the fake cluster.
+"""
+import io
+import json
+import random
+import subprocess
+import time
+
+import pytest
+
+from cbj_smon.jobs.util import (
+    ALL_COLUMNS, BASE_COLUMNS, compile_fields, iter_json_array, slurm_nums_to_python)
+from cbj_smon.jobs.gather_sacct import (
+    SACCT_COLUMN_FIELDS, SACCT_JOB_FIELDS, gather_sacct, parse_sacct_job,
+    sacct_fields)
+from cbj_smon.jobs.gather_squeue import (
+    SQUEUE_COLUMN_FIELDS, SQUEUE_JOB_FIELDS, gather_squeue, parse_squeue_job,
+    squeue_fields)
+from cbj_smon.jobs.rows import JobRow
+from cbj_smon.jobs.store import SacctStore
+from cbj_smon.jobs.filters import JobFilter
+from cbj_smon.jobs.arrays import collapse_arrays
+from cbj_smon.jobs.changes import DeltaView
+from cbj_smon.jobs.columnar import JobTable
+
+from conftest import NOW
+
+
+def slurm_json(cmd):
+    return json.loads(subprocess.run(
+        cmd, shell=True, check=True, stdout=subprocess.PIPE,
+        universal_newlines=True).stdout)
+
+
+@pytest.fixture
+def sacct_json(fake_slurm):
+    return slurm_json('sacct --json -S now-2days --allusers')
+
+
+@pytest.fixture
+def squeue_json(fake_slurm):
+    return slurm_json('squeue --json')
+
+
+def test_iter_json_array(sacct_json):
+    text = json.dumps(sacct_json, indent=2)
+    for chunk_size in [1, 7, 2 ** 16]:
+        jobs = list(iter_json_array(io.StringIO(text), 'jobs', chunk_size=chunk_size))
+        assert jobs == sacct_json['jobs']
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO(text[:len(text) // 2]), 'jobs'))
+
+
+@pytest.mark.parametrize('kind', ['sacct', 'squeue'])
+def test_projection(kind, sacct_json, squeue_json):
+    """The rows of the projected jobs are the rows of the full jobs."""
+    jobs, parse_job, job_fields, column_fields, fields = {
+        'sacct': (sacct_json['jobs'], parse_sacct_job, SACCT_JOB_FIELDS,
+                  SACCT_COLUMN_FIELDS, sacct_fields),
+        'squeue': (squeue_json['jobs'], parse_squeue_job, SQUEUE_JOB_FIELDS,
+                   SQUEUE_COLUMN_FIELDS, squeue_fields),
+    }[kind]
+    assert set(column_fields) == ALL_COLUMNS | {'Array'}
+    full = [slurm_nums_to_python(job) for job in jobs]
+    project = compile_fields(job_fields)
+    assert [parse_job(project(job), 0) for job in jobs] == [
+        parse_job(job, 0) for job in full]
+
+    for columns in [{'JobID'}, {'JobID', 'State', 'mem'}, {'JobID', 'gpu', 'billing', 'Array'}]:
+        project = compile_fields(fields(columns))
+        assert [parse_job(project(job), 0, columns) for job in jobs] == [
+            {k: v for k, v in parse_job(job, 0, ALL_COLUMNS | {'Array'}).items() if k in columns}
+            for job in full]
+
+
+def test_shard(fake_slurm, monkeypatch):
+    """A job, that spans several windows, is only once in the table."""
+    # The windows are timestamps, hence the same now as the fake cluster,
+    # whose now-2days is relative to NOW and not to the clock.
+    monkeypatch.setattr(time, 'time', lambda: NOW)
+    table, submit = gather_sacct('now-2days')
+    for shard in [3600, 5 * 3600, 7200.5]:
+        sharded, sharded_submit = gather_sacct('now-2days', shard=shard, workers=3)
+        assert sharded.keys() == table.keys()
+        assert sharded_submit == submit
+        for job_id, row in table.items():
+            assert {k: v for k, v in sharded[job_id].items() if k != 'Elapsed'} == {
+                k: v for k, v in row.items() if k != 'Elapsed'}, job_id
+
+
+def test_parsable_backend(fake_slurm, monkeypatch):
+    """Without the store, CEff and MEff need the json of the jobs anyway."""
+    from cbj_smon.jobs import gather_sacct as module
+
+    backends = []
+    run_sacct = module._run_sacct
+    monkeypatch.setattr(
+        module, '_run_sacct',
+        lambda *args, **kwargs: backends.append(kwargs['backend']) or run_sacct(*args, **kwargs))
+    gather_sacct('now-2days', backend='parsable')
+    gather_sacct('now-2days', backend='parsable', columns=BASE_COLUMNS)
+    assert backends == ['json', 'parsable']
+
+
+def test_store(tmp_path):
+    store = SacctStore(str(tmp_path / 'sacct.sqlite'), scope='cbj')
+    rows = {
+        1: JobRow(JobID=1, State='COMPLETED', Elapsed=(60, 120), End=1500, gpu='a100:2'),
+        2: JobRow(JobID=2, State='RUNNING', Elapsed=(30, 120), End=0),
+    }
+    store.update(rows, finished={1}, covered_start=1000, now=2000)
+    # The pairs are lists after the round trip, like in the json of slurm.
+    assert store.load(1000) == {1: JobRow(rows[1], Elapsed=[60, 120])}
+    assert SacctStore(store.path, scope='allusers').load(1000) == {}
+    assert store.query_start(1000, now=3000) == 2000 - store.margin
+    assert store.query_start(500, now=3000) is None
+
+    store.update_seff({1: {'CEff': 50, 'MEff': 20}})
+    assert SacctStore(store.path).load_seff([1, 2]) == {1: {'CEff': 50, 'MEff': 20}}
+
+    # A shorter window (e.g. another terminal) keeps the longer one.
+    store.update({}, finished=set(), covered_start=1600, now=4000)
+    assert store.load(1000) == {1: JobRow(rows[1], Elapsed=[60, 120])}
+    assert store.query_start(1000, now=5000) == 4000 - store.margin
+
+    # Old jobs are pruned, and their efficiency.
+    now = 1500 + store.max_age + 1
+    store.update({}, finished=set(), covered_start=now - 3600, now=now)
+    assert store.load(0) == {}
+    assert store.load_seff([1]) == {}
+    assert store.query_start(1000, now=now) is None
+
+
+def test_job_filter(fake_slurm):
+    """slurm and the matching of the parsed jobs select the same jobs."""
+    table, _ = gather_sacct('now-2days')
+    squeue, _ = gather_squeue()
+    for job_filter, match in [
+            (JobFilter(states=['CD']), lambda row: row['State'] == 'COMPLETED'),
+            (JobFilter(users=['cbj', 'alice'], partitions=['gpu']),
+             lambda row: row['User'] in ['cbj', 'alice'] and row['Partition'] == 'gpu'),
+            (JobFilter(names=['train', 'eval']), lambda row: row['Name'] in ['train', 'eval']),
+            # The short name of the column Acc.
+            (JobFilter(accounts=['cbj']), lambda row: row['Acc'] == 'cbj'),
+    ]:
+        filtered, _ = gather_sacct('now-2days', job_filter=job_filter)
+        assert filtered
+        assert filtered.keys() == {k for k, row in table.items() if match(row)}
+        filtered, _ = gather_sacct(
+            'now-2days', job_filter=job_filter, columns=job_filter.columns | BASE_COLUMNS)
+        assert filtered.keys() == {k for k, row in table.items() if match(row)}
+        filtered, _ = gather_squeue(job_filter=job_filter)
+        assert filtered.keys() == {k for k, row in squeue.items() if match(row)}
+        filtered, _ = gather_squeue(job_filter=job_filter, columns=job_filter.columns | BASE_COLUMNS)
+        assert filtered.keys() == {k for k, row in squeue.items() if match(row)}
+
+
+def test_collapse_arrays(fake_slurm):
+    table, _ = gather_sacct('now-2days', columns=ALL_COLUMNS | {'Array'})
+    tasks = [row for row in table.values() if row['Array'] is not None]
+    assert tasks
+    collapsed = collapse_arrays({k: JobRow(v) for k, v in table.items()})
+    arrays = {k: row for k, row in collapsed.items() if str(row['JobID']).endswith('_*')}
+    assert len(arrays) < len(tasks)
+    assert len(collapsed) == len(table) - len(tasks) + len(arrays)
+    for array_id, row in arrays.items():
+        array_tasks = [r for r in tasks if r['Array'][0] == array_id]
+        assert sum(row['State'].values()) == sum(r['Array'][1] for r in array_tasks)
+        assert row['Elapsed'][2] == min(r['Elapsed'][0] for r in array_tasks)
+
+    expanded = collapse_arrays(
+        {k: JobRow(v) for k, v in table.items()}, expand=list(arrays)[:1])
+    assert len(expanded) > len(collapsed)
+
+
+def test_job_row(fake_slurm):
+    table, _ = gather_sacct('now-2days')
+    for job_id, row in table.items():
+        assert isinstance(row, JobRow)
+        assert JobRow(json.loads(json.dumps(dict(row.items())))) == json.loads(json.dumps(dict(row.items())))
+        assert list(row) == [c for c in JobRow.__slots__ if c in row]
+    users = {id(row['User']) for row in table.values()}
+    assert len(users) == len({row['User'] for row in table.values()})
+
+
+@pytest.mark.parametrize('limit,page', [(None, 1), (1, 1), (7, 1), (7, 3), (1000, 1), (50, 5)])
+def test_job_table(limit, page):
+    pytest.importorskip('numpy')
+    rng = random.Random(limit)
+    # Many equal keys, to check the order of the ties.
+    table = {
+        i: {'Submit': rng.randrange(20), 'User': rng.choice('abc')}
+        for i in range(500)
+    }
+    key = lambda row: row['Submit']
+    numpy, python = JobTable(table, use_numpy=True), JobTable(table, use_numpy=False)
+    order = numpy.argsort(key, limit, page)
+    assert order == python.argsort(key, limit, page)
+    expected = sorted(table, key=lambda i: table[i]['Submit'])
+    if limit is not None:
+        expected = expected[max(0, len(expected) - limit * page):len(expected) - limit * (page - 1)]
+    assert order == expected
+
+    by = lambda row: row['User']
+    assert numpy.group_sum(by, [key]) == python.group_sum(by, [key])
+    mask = numpy.isin(by, {'a'})
+    assert list(mask) == python.isin(by, {'a'})
+    assert numpy.filter(mask).to_dict() == python.filter(python.isin(by, {'a'})).to_dict()
+
+
+def test_delta_view(fake_slurm, tmp_path):
+    table, _ = gather_squeue()
+    view = DeltaView('test', cache_dir=str(tmp_path))
+    changed, gone = view.update({k: dict(v) for k, v in table.items()})
+    assert len(changed) == len(table) and gone == {}
+    assert {row['Change'] for row in changed.values()} == {'new'}
+
+    later = {k: dict(v) for k, v in table.items()}
+    first, second = list(later)[:2]
+    later[first]['State'] = 'COMPLETED'
+    del later[second]
+    changed, gone = view.update(later)
+    assert list(changed) == [first] and changed[first]['Change'] == 'changed'
+    assert list(gone) == [str(second)]
+
+
+def test_collapse_arrays_snapshot(smond):
+    """The squeue jobs of a snapshot of smond.py, also without array fields."""
+    from cbj_smon import snapshot
+
+    columns = ALL_COLUMNS | {'Array'}
+    jobs = snapshot.query('squeue')
+    assert jobs
+    table = {job['job_id']: parse_squeue_job(job, 0, columns) for job in jobs}
+    arrays = {row['Array'][0] for row in table.values() if row['Array'] is not None}
+    assert arrays
+    collapsed = collapse_arrays(table)
+    assert arrays <= collapsed.keys()
+
+    for job in jobs:
+        for k in ['array_job_id', 'array_task_id', 'array_task_string']:
+            job.pop(k, None)
+    table = {job['job_id']: parse_squeue_job(job, 0, columns) for job in jobs}
+    assert collapse_arrays(table).keys() == table.keys()
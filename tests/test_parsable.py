@@ -0,0 +1,129 @@
+"""
+The parsable backend has to show the same table as the json backend. The
+outputs are recorded from the fake cluster, see fixtures/record.py.
+"""
+import io
+import gzip
+import json
+from pathlib import Path
+
+import pytest
+
+from cbj_smon.table import print_table
+from cbj_smon.jobs import gather_sacct
+from cbj_smon.jobs.util import colorize_table, compile_fields
+from cbj_smon.jobs.gather_sacct import SACCT_JOB_FIELDS, _add_seff, _sacct_table
+from cbj_smon.jobs.store import SacctStore
+from cbj_smon.jobs.gather_squeue import SQUEUE_JOB_FIELDS, parse_squeue_job
+from cbj_smon.jobs.parsable import (
+    SACCT_PARSABLE_FIELDS, SQUEUE_PARSABLE_FIELDS, parsable_to_sacct_jobs,
+    parsable_to_squeue_job)
+
+FIXTURES = Path(__file__).resolve().parent / 'fixtures'
+NOW = 1720526400  # see fixtures/record.py
+
+
+def load_json(name):
+    with gzip.open(FIXTURES / name, 'rt') as f:
+        return json.load(f)['jobs']
+
+
+def load_parsable(name, fields):
+    return [
+        dict(zip(fields, line.split('|', len(fields) - 1)))
+        for line in (FIXTURES / name).read_text().splitlines()
+    ]
+
+
+@pytest.fixture
+def recorded(monkeypatch):
+    """The jobs of the recorded outputs, the steps are taken from sacct.json."""
+    monkeypatch.setenv('USER', 'cbj')
+    sacct_jobs = load_json('sacct.json.gz')
+    by_id = {job['job_id']: job for job in map(compile_fields(SACCT_JOB_FIELDS), sacct_jobs)}
+    monkeypatch.setattr(
+        gather_sacct, '_sacct_jobs_json',
+        lambda job_ids, mine: [by_id[job_id] for job_id in job_ids])
+    return sacct_jobs, load_json('squeue.json.gz')
+
+
+def render(table, columns=None):
+    out = io.StringIO()
+    print_table(list(colorize_table(table, columns).values()), file=out)
+    return out.getvalue()
+
+
+def json_table(sacct_jobs, squeue_jobs, columns=None):
+    project = compile_fields(SACCT_JOB_FIELDS)
+    table, finished, need_steps = _sacct_table(map(project, sacct_jobs), columns=columns)
+    project = compile_fields(SQUEUE_JOB_FIELDS)
+    return {**table, **{
+        job['job_id']: parse_squeue_job(project(job), NOW, columns)
+        for job in squeue_jobs
+    }}
+
+
+def parsable_table(columns=None):
+    jobs = parsable_to_sacct_jobs(load_parsable('sacct.txt', SACCT_PARSABLE_FIELDS))
+    table, finished, need_steps = _sacct_table(jobs, 'parsable', columns=columns)
+    _add_seff(table, need_steps, finished, mine=False)
+    return {**table, **{
+        job['job_id']: parse_squeue_job(job, NOW, columns)
+        for job in map(
+            parsable_to_squeue_job,
+            load_parsable('squeue.txt', SQUEUE_PARSABLE_FIELDS))
+    }}
+
+
+def test_recorded_jobs(recorded):
+    sacct_jobs, squeue_jobs = recorded
+    table = json_table(sacct_jobs, squeue_jobs)
+    assert len(table) > 50
+    states = {row['State'].split(' ')[0] for row in table.values()}
+    assert {'RUNNING', 'PENDING', 'COMPLETED', 'CANCELLED'} <= states
+    assert any(row['gpu'] not in ('0', None) for row in table.values())
+
+
+@pytest.mark.parametrize('columns', [None, {'JobID', 'User', 'Submit', 'End', 'Tool', 'State', 'gpu', 'mem'}])
+def test_same_table(recorded, columns):
+    sacct_jobs, squeue_jobs = recorded
+    expected = json_table(sacct_jobs, squeue_jobs, columns)
+    table = parsable_table(columns)
+    assert list(table) == list(expected)
+    for job_id, row in expected.items():
+        assert dict(table[job_id].items()) == dict(row.items()), job_id
+    assert render(table, columns) == render(expected, columns)
+
+
+def test_memoized_steps(recorded, tmp_path, monkeypatch):
+    """
+    With the store, only the jobs, whose efficiency is not memoized, are
+    fetched with json: Newly finished jobs and running jobs, whose steps
+    changed since the last call.
+    """
+    store = SacctStore(str(tmp_path / 'sacct.sqlite'))
+    fetched = []
+    fetch = gather_sacct._sacct_jobs_json
+    monkeypatch.setattr(
+        gather_sacct, '_sacct_jobs_json',
+        lambda job_ids, mine: fetched.append(list(job_ids)) or fetch(job_ids, mine))
+    records = load_parsable('sacct.txt', SACCT_PARSABLE_FIELDS)
+
+    def run():
+        table, finished, need_steps = _sacct_table(
+            parsable_to_sacct_jobs(records), 'parsable')
+        _add_seff(table, need_steps, finished, mine=False, store=store)
+        return table, need_steps
+
+    table, need_steps = run()
+    running = [job_id for job_id, job in need_steps.items() if job is not None]
+    assert running and len(running) < len(need_steps)
+    assert fetched == [sorted(need_steps)]
+    assert run()[0] == table
+    assert fetched[1] == []
+
+    # A step of a running job started.
+    record = next(r for r in records if r['JobIDRaw'] == str(running[0]))
+    records.insert(records.index(record) + 1, {**record, 'JobIDRaw': f'{running[0]}.7', 'State': 'RUNNING'})
+    assert run()[0] == table
+    assert fetched[2] == [running[0]]
@@ -0,0 +1,164 @@
+"""
+End-to-end tests of sacct.py (cbj_smon.jobs) against the fake cluster.
+"""
+import csv
+import io
+import json
+import os
+import time
+
+import pytest
+
+def parse_csv(text):
+    return {row['JobID']: row for row in csv.DictReader(io.StringIO(text))}
+
+
+def test_table(sacct_py, fake_slurm):
+    out = sacct_py('now-2days', '--no-cache')
+    lines = out.splitlines()
+    assert lines[1].split()[:4] == ['User', 'JobID', 'Name', 'State']
+    assert len(lines) > 100
+    assert 'RUNNING' in out and 'COMPLETED' in out and 'PENDING' in out
+
+
+def test_mine(sacct_py, fake_slurm):
+    rows = parse_csv(sacct_py('now-2days', '--no-cache', '--mine', '--format', 'csv'))
+    assert rows
+    assert {row['User'] for row in rows.values()} == {'cbj'}
+
+
+def test_backends(sacct_py, fake_slurm, slurmrestd):
+    columns = 'User,JobID,Name,Submit,Start,End,cpu,N,Partition,Acc,QoS,Nodes'
+    json_rows = parse_csv(sacct_py('now-2days', '--no-cache', '--columns', columns, '--format', 'csv'))
+    assert len(json_rows) > 100
+    for backend in ['parsable', 'restd']:
+        rows = parse_csv(sacct_py(
+            'now-2days', '--no-cache', '--columns', columns, '--format', 'csv',
+            '--backend', backend))
+        assert rows == json_rows, backend
+
+
+def test_cache(sacct_py, fake_slurm):
+    """The second call takes the finished jobs from the SacctStore."""
+    def run(*argv):
+        rows = parse_csv(sacct_py('now-2days', '--format', 'csv', *argv))
+        for row in rows.values():
+            # Changes between the calls for running jobs.
+            del row['Elapsed'], row['billing']
+        return rows
+
+    uncached = run('--no-cache')
+    first = run()
+    second = run()
+    assert first == uncached
+    assert second == uncached
+    # The same order, also of the ties (e.g. array tasks with the same submit).
+    assert list(first) == list(second) == list(uncached)
+
+
+def test_cache_scope(sacct_py, fake_slurm):
+    """-X and the backend have their own rows in the SacctStore."""
+    def n(*argv):
+        rows = parse_csv(sacct_py('now-2days', '--format', 'csv', '--columns', 'JobID,State,n', *argv))
+        return {k: row['n'] for k, row in rows.items() if row['State'] == 'COMPLETED'}
+
+    steps = n()
+    assert set(steps.values()) - {'-'}
+    assert set(n('-X').values()) == {'-'}
+    assert n() == steps
+    assert n('--backend', 'parsable') == steps
+
+
+def test_columns(sacct_py, fake_slurm):
+    out = sacct_py('now-2days', '--no-cache', '--columns', 'JobID,State,Nodes')
+    assert out.splitlines()[1].split() == ['JobID', 'State', 'Nodes']
+    with pytest.raises(SystemExit):
+        sacct_py('--columns', 'JobID,Unknown')
+
+
+def test_filter(sacct_py, fake_slurm):
+    rows = parse_csv(sacct_py('now-2days', '--no-cache', '--format', 'csv'))
+    failed = parse_csv(sacct_py('now-2days', '--no-cache', '--format', 'csv', '--state', 'F,TO'))
+    assert failed
+    assert failed == {
+        k: row for k, row in rows.items()
+        if row['State'].split(' ')[0] in ['FAILED', 'TIMEOUT']}
+
+
+def test_limit_page(sacct_py, fake_slurm):
+    def job_ids(*argv):
+        return list(parse_csv(sacct_py(
+            'now-2days', '--no-cache', '--format', 'csv', '--columns', 'JobID,Start',
+            *argv)))
+
+    all_ids = job_ids('--sort', 'start')
+    assert job_ids('--sort', 'start', '--limit', '10') == all_ids[-10:]
+    assert job_ids('--sort', 'start', '--limit', '10', '--page', '3') == all_ids[-30:-20]
+
+
+def test_ndjson(sacct_py, fake_slurm):
+    out = sacct_py('now-2days', '--no-cache', '--format', 'ndjson', '--columns', 'JobID,Elapsed,mem')
+    records = [json.loads(line) for line in out.splitlines()]
+    assert records
+    assert list(records[0]) == ['JobID', 'Elapsed', 'Timelimit', 'mem']
+    assert all(isinstance(r['Timelimit'], int) for r in records)
+
+
+def test_export_npz(sacct_py, fake_slurm, tmp_path):
+    np = pytest.importorskip('numpy')
+    path = tmp_path / 'jobs.npz'
+    assert sacct_py('now-2days', '--no-cache', '--export', str(path)) == ''
+    columns = np.load(path)
+    rows = parse_csv(sacct_py('now-2days', '--no-cache', '--format', 'csv'))
+    assert [str(i) for i in columns['JobID']] == list(rows)
+    assert columns['Submit'].dtype == np.int64
+
+
+def test_group_by(sacct_py, fake_slurm):
+    lines = sacct_py('now-2days', '--no-cache', '--group-by', 'User').splitlines()
+    assert lines[1].split() == ['User', 'jobs', 'elapsed', 'h', 'cpu', 'h', 'billing']
+    rows = parse_csv(sacct_py('now-2days', '--no-cache', '--format', 'csv'))
+    jobs = sum(int(line.split()[1]) for line in lines[3:-1])
+    assert jobs == len(rows)
+
+
+def test_changes(sacct_py, fake_slurm):
+    argv = ('now-2days', '--no-cache', '--changes', '--summary')
+    first = sacct_py(*argv).splitlines()
+    assert first[-1].endswith('0 changed, 0 gone, 0 unchanged')
+    second = sacct_py(*argv).splitlines()
+    # Only the summary, the empty table has not even a rule.
+    assert len(second) == 1
+    assert second[-1].startswith('0 new, 0 changed, 0 gone')
+
+
+def test_follow(sacct_py, fake_slurm, monkeypatch):
+    """
+    The jobs of the fake cluster are relative to its now, hence another
+    workload (seed) changes the states of the jobs between the polls.
+    """
+    polls = []
+
+    def sleep(seconds):
+        if len(polls) == 2:
+            raise KeyboardInterrupt
+        polls.append(seconds)
+        monkeypatch.setenv('FAKE_SLURM_SEED', str(len(polls)))
+
+    monkeypatch.setattr(time, 'sleep', sleep)
+    lines = sacct_py('now-2days', '--no-cache', '--follow', '--interval', '5').splitlines()
+    # The first poll has no transitions, the second has, i.e. both sleep
+    # --interval.
+    assert polls == [5, 5]
+    assert lines
+    assert all(' -> ' in line for line in lines)
+
+
+@pytest.mark.parametrize('backend', ['json', 'parsable'])
+def test_smond(sacct_py, fake_slurm, smond, backend, monkeypatch):
+    """With smond.py, the jobs are taken from its snapshot, i.e. no slurm call."""
+    monkeypatch.setenv('PATH', os.defpath)
+    rows = parse_csv(sacct_py('now-2days', '--no-cache', '--format', 'csv', '--backend', backend))
+    assert len(rows) > 100
+    out = sacct_py('now-2days', '--no-cache', '--collapse-arrays', '--backend', backend)
+    assert '_*' in out
@@ -0,0 +1,25 @@
+"""
+Tests of sjobwait.py.
+"""
+from cbj_smon import snapshot
+
+import sjobwait
+
+
+def test_squeue_jobs_snapshot(monkeypatch):
+    """The pending tasks of an array have only the task string, like %K."""
+    jobs = [
+        {'job_id': 4000290, 'array_job_id': 4000290, 'array_task_id': None,
+         'array_task_string': '7-10%2', 'job_state': ['PENDING'],
+         'time_limit': 60, 'start_time': 0},
+        {'job_id': 4000291, 'array_job_id': 4000290, 'array_task_id': 6,
+         'array_task_string': '', 'job_state': ['RUNNING'],
+         'time_limit': None, 'start_time': 0},
+    ]
+    monkeypatch.setattr(snapshot, 'query', lambda name: jobs)
+    assert sjobwait.squeue_jobs({'4000290_7'}) == [
+        (4000290, 4000290, '7-10%2', 'PENDING', None)]
+    assert sjobwait.squeue_jobs({'4000290_6'}) == [
+        (4000291, 4000290, 6, 'RUNNING', None)]
+    assert len(sjobwait.squeue_jobs({'4000290'})) == 2
+    assert sjobwait.squeue_jobs({'4000290_11'}) == []